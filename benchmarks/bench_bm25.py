@@ -0,0 +1,121 @@
+"""Build, update, cold-open and query benchmarks for the BM25 index.
+
+Generates a synthetic corpus of log- and code-like files. At the default
+``--files 400 --lines 6000`` it is roughly 100k+ chunks of ~1500 chars.
+The run then measures:
+
+* a full build;
+* a no-op update, which only stats the files;
+* an incremental update after rewriting 1% of the files;
+* a cold open, i.e. a new process mapping the index;
+* query latency (p50/p95) over random 2-6 term queries.
+
+Prints one JSON object.
+
+    python benchmarks/bench_bm25.py --files 400 --lines 6000
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from empyrean_ai.curator.inference.retrieval.bm25 import BM25Index  # noqa: E402
+
+_VOCAB_SIZE = 20_000
+
+
+def _vocab(rnd: random.Random) -> list[str]:
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    words = {"".join(rnd.choice(letters) for _ in range(rnd.randint(3, 10))) for _ in range(_VOCAB_SIZE * 2)}
+    return sorted(words)[:_VOCAB_SIZE]
+
+
+def _zipf_pick(rnd: random.Random, vocab: list[str]) -> str:
+    # heavy head, long tail: roughly Zipfian term frequencies
+    return vocab[min(len(vocab) - 1, int(rnd.paretovariate(1.1)) - 1)]
+
+
+def make_corpus(root: Path, files: int, lines: int, seed: int = 0) -> list[str]:
+    rnd = random.Random(seed)
+    vocab = _vocab(rnd)
+    rnd.shuffle(vocab)
+    root.mkdir(parents=True, exist_ok=True)
+    for i in range(files):
+        with (root / f"file_{i:05d}.log").open("w", encoding="utf-8") as f:
+            for _ in range(lines):
+                f.write(" ".join(_zipf_pick(rnd, vocab) for _ in range(rnd.randint(6, 30))) + "\n")
+    return vocab
+
+
+def _timed(fn):
+    t0 = time.perf_counter()
+    out = fn()
+    return out, time.perf_counter() - t0
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--files", type=int, default=400)
+    ap.add_argument("--lines", type=int, default=6000)
+    ap.add_argument("--queries", type=int, default=500)
+    ap.add_argument("--k", type=int, default=5)
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        corpus, index_dir = Path(tmp) / "corpus", Path(tmp) / "index"
+        vocab, gen_s = _timed(lambda: make_corpus(corpus, args.files, args.lines))
+        idx = BM25Index(index_dir)
+        build, build_s = _timed(lambda: idx.update([corpus]))
+        noop, noop_s = _timed(lambda: idx.update([corpus]))
+        rnd = random.Random(1)
+        for p in rnd.sample(sorted(corpus.iterdir()), max(1, args.files // 100)):
+            with p.open("a", encoding="utf-8") as f:
+                f.write("appended line for the incremental update\n")
+        incr, incr_s = _timed(lambda: idx.update([corpus]))
+        stats = idx.stats()
+
+        queries = [" ".join(rnd.choice(vocab[:5000]) for _ in range(rnd.randint(2, 6))) for _ in range(args.queries)]
+        lat = []
+        for q in queries:
+            t0 = time.perf_counter()
+            idx.retrieve(q, args.k)
+            lat.append(time.perf_counter() - t0)
+        idx.close()
+
+        cold = subprocess.run(
+            [sys.executable, "-c",
+             "import sys, time; sys.path.insert(0, sys.argv[1]); t = time.perf_counter();"
+             "from empyrean_ai.curator.inference.retrieval.bm25 import BM25Index;"
+             "i = BM25Index(sys.argv[2]); i.retrieve(sys.argv[3], 5); print(time.perf_counter() - t)",
+             str(Path(__file__).resolve().parents[1] / "src"), str(index_dir), queries[0]],
+            check=True, capture_output=True, text=True,
+        )
+        size_mb = sum(p.stat().st_size for p in index_dir.iterdir()) / (1 << 20)
+        lat.sort()
+        print(json.dumps({
+            "corpus": {"files": args.files, "generate_s": round(gen_s, 2)},
+            "index": {**stats, "size_mb": round(size_mb, 1)},
+            "build_s": round(build_s, 2),
+            "noop_update_s": round(noop_s, 3),
+            "incremental_update": {"files": incr["files_indexed"], "seconds": round(incr_s, 2)},
+            "cold_open_and_first_query_s": round(float(cold.stdout.strip()), 3),
+            "query_ms": {"p50": round(1000 * statistics.median(lat), 2),
+                         "p95": round(1000 * lat[int(0.95 * (len(lat) - 1))], 2),
+                         "mean": round(1000 * statistics.fmean(lat), 2)},
+            "docs_built": build["docs_added"],
+            "noop_files_unchanged": noop["files_unchanged"],
+        }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
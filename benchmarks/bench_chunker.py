@@ -0,0 +1,92 @@
+"""Compare the list-based chunk_file with the streaming iter_chunks.
+
+Generates a synthetic UTF-8 log file (mostly ASCII with some multi-byte
+characters), then chunks it with each implementation in a fresh subprocess.
+Wall time and peak RSS are measured per run. Prints one JSON object.
+
+    python benchmarks/bench_chunker.py --size-mb 1024 --mode lines --chunk 2000
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import multiprocessing as mp
+import random
+import resource
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from empyrean_ai.curator.inference.retrieval.fs_chunks import chunk_file, iter_chunks  # noqa: E402
+
+_WORDS = ["GET", "POST", "/api/v1/items", "200", "404", "latency_ms=12", "user=ünïcødé", "✓", "trace",
+          "worker-3", "retrying", "timeout", "ok", "cache_hit", "𝄞"]
+
+
+def make_file(path: Path, size_mb: int, seed: int = 0) -> None:
+    rnd = random.Random(seed)
+    target = size_mb * (1 << 20)
+    lines = [" ".join(rnd.choice(_WORDS) for _ in range(rnd.randint(4, 30))) for _ in range(4096)]
+    block = ("\n".join(lines) + "\n").encode("utf-8")
+    with path.open("wb") as f:
+        written = 0
+        while written < target:
+            piece = block[: target - written]
+            # keep the file valid UTF-8 when the last block is cut short
+            piece = piece.decode("utf-8", "ignore").encode("utf-8")
+            f.write(piece)
+            written += len(piece) or target
+    return None
+
+
+def _run(impl: str, path: str, mode: str, chunk: int, overlap: int, out: "mp.Queue[dict]") -> None:
+    t0 = time.perf_counter()
+    n = chars = 0
+    if impl == "chunk_file":
+        for c in chunk_file(Path(path), mode, chunk, overlap):  # type: ignore[arg-type]
+            n += 1
+            chars += len(c)
+    else:
+        for ch in iter_chunks(Path(path), mode, chunk, overlap):  # type: ignore[arg-type]
+            n += 1
+            chars += len(ch.text)
+    elapsed = time.perf_counter() - t0
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    out.put({"impl": impl, "chunks": n, "chars": chars, "seconds": round(elapsed, 3),
+             "peak_rss_mb": round(peak_kb / 1024, 1)})
+
+
+def measure(impl: str, path: Path, mode: str, chunk: int, overlap: int) -> dict:
+    ctx = mp.get_context("spawn")  # fresh interpreter: peak RSS is per implementation
+    q: "mp.Queue[dict]" = ctx.Queue()
+    p = ctx.Process(target=_run, args=(impl, str(path), mode, chunk, overlap, q))
+    p.start()
+    res = q.get()
+    p.join()
+    return res
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--size-mb", type=int, default=1024)
+    ap.add_argument("--mode", choices=["chars", "lines"], default="lines")
+    ap.add_argument("--chunk", type=int, default=2000)
+    ap.add_argument("--overlap", type=int, default=0)
+    ap.add_argument("--file", type=Path, help="existing file to chunk instead of a synthetic one")
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = args.file or Path(tmp) / "synthetic.log"
+        if args.file is None:
+            make_file(path, args.size_mb)
+        results = [measure(impl, path, args.mode, args.chunk, args.overlap) for impl in ("chunk_file", "iter_chunks")]
+        print(json.dumps({"file_mb": round(path.stat().st_size / (1 << 20), 1), "mode": args.mode,
+                          "chunk": args.chunk, "overlap": args.overlap, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""Exact vs IVF search over the memory-mapped float16 embedding matrix.
+
+Writes ``--rows`` synthetic clustered unit vectors straight into a dense
+index directory, so no lexical index or embedder is needed. Then it times
+the IVF build and measures query latency (p50/p95) for an exact scan and
+for each ``--nprobe``, with recall@k against the exact results. Prints
+one JSON object.
+
+    python benchmarks/bench_dense.py --rows 1000000 --dim 384 --nprobe 8 32
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from empyrean_ai.curator.inference.retrieval.dense import DenseIndex  # noqa: E402
+
+
+def make_index(root: Path, rows: int, dim: int, clusters: int, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centres = rng.normal(size=(clusters, dim)).astype(np.float32)
+    root.mkdir(parents=True)
+    with (root / "embeddings.f16").open("wb") as f:
+        for start in range(0, rows, 65536):
+            n = min(65536, rows - start)
+            block = centres[rng.integers(0, clusters, n)] + 0.5 * rng.normal(size=(n, dim)).astype(np.float32)
+            block /= np.linalg.norm(block, axis=1, keepdims=True)
+            f.write(block.astype(np.float16).tobytes())
+    meta = {"format": 1, "model": "synthetic", "dim": dim, "rows": rows, "generation": 0}
+    (root / "meta.json").write_text(json.dumps(meta), encoding="utf-8")
+    queries = centres[rng.integers(0, clusters, 200)] + 0.5 * rng.normal(size=(200, dim)).astype(np.float32)
+    return queries
+
+
+def _latency(fn, queries) -> tuple[list, dict]:
+    out, lat = [], []
+    for q in queries:
+        t0 = time.perf_counter()
+        out.append({d for d, _ in fn(q)})
+        lat.append(time.perf_counter() - t0)
+    lat.sort()
+    return out, {"p50_ms": round(1000 * statistics.median(lat), 2),
+                 "p95_ms": round(1000 * lat[int(0.95 * (len(lat) - 1))], 2)}
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--rows", type=int, default=200_000)
+    ap.add_argument("--dim", type=int, default=384)
+    ap.add_argument("--clusters", type=int, default=256)
+    ap.add_argument("--queries", type=int, default=100)
+    ap.add_argument("--k", type=int, default=10)
+    ap.add_argument("--nlist", type=int, default=None)
+    ap.add_argument("--nprobe", type=int, nargs="+", default=[8, 32])
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp) / "dense"
+        t0 = time.perf_counter()
+        queries = make_index(root, args.rows, args.dim, args.clusters)[: args.queries]
+        gen_s = time.perf_counter() - t0
+        idx = DenseIndex(root)
+        exact, exact_lat = _latency(lambda q: idx.search(q, args.k, nprobe=None), queries)
+        t0 = time.perf_counter()
+        idx.build_ivf(args.nlist)
+        build_s = time.perf_counter() - t0
+        ivf = {}
+        for nprobe in args.nprobe:
+            found, lat = _latency(lambda q, n=nprobe: idx.search(q, args.k, nprobe=n), queries)
+            recall = statistics.fmean(len(a & b) / args.k for a, b in zip(found, exact))
+            ivf[str(nprobe)] = {**lat, f"recall@{args.k}": round(recall, 3)}
+        size_mb = (root / "embeddings.f16").stat().st_size / (1 << 20)
+        print(json.dumps({
+            "rows": args.rows, "dim": args.dim, "matrix_mb": round(size_mb, 1), "generate_s": round(gen_s, 2),
+            "exact": exact_lat, "ivf_build_s": round(build_s, 2), "ivf_lists": idx.stats()["ivf_lists"],
+            "ivf_nprobe": ivf,
+        }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""Compare the first-match router classifier with the compiled keyword classifier.
+
+``legacy`` is the previous ``Router.classify``: lowercase the whole input,
+then run up to twenty ``in`` scans in family order. ``compiled`` is
+``KeywordClassifier`` configured from ``configs/routing.yml``. Agreement with
+``data/golden/tasks.jsonl`` is reported as a regression check only. That
+fixture was written together with the keyword configuration, so it shows when
+a config change moves a labelled example, not how well either classifier does
+on real traffic. Speed is measured with ``timeit``
+on golden inputs and on inputs padded to ``--sizes`` characters with log
+lines. In the ``head`` case a bug-triage keyword opens the text, which is
+the best case for the legacy scans. In the ``absent`` case there is no
+keyword, so the legacy classifier runs every scan over the whole text.
+Prints one JSON object.
+
+    python benchmarks/bench_router.py --sizes 1000,100000,1000000
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import timeit
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "src"))
+
+from empyrean_ai.config import load_configs  # noqa: E402
+from empyrean_ai.curator.router import Router  # noqa: E402
+
+FILLER = "2024-05-01 12:00:00 worker-3 GET /api/v1/items 200 latency_ms=12\n"
+
+
+def legacy_classify(text: str) -> str:
+    t = text.lower()
+    if any(k in t for k in ["bug", "stack trace", "traceback", "exception"]):
+        return "bug_triage"
+    if any(k in t for k in ["diff", "implement", "code", "function", "class "]):
+        return "code_assist"
+    if any(k in t for k in ["design", "rfc", "architecture", "trade-off", "tradeoff"]):
+        return "design_rfc"
+    if any(k in t for k in ["extract", "fields", "json only", "key:"]):
+        return "extraction"
+    if any(k in t for k in ["story", "blog", "creative"]):
+        return "creative"
+    return "analytical"
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--sizes", default="1000,100000,1000000")
+    ap.add_argument("--number", type=int, default=200)
+    args = ap.parse_args()
+
+    router = Router(load_configs(ROOT / "configs")["routing"])
+    golden = [json.loads(ln) for ln in (ROOT / "data" / "golden" / "tasks.jsonl").read_text(encoding="utf-8").splitlines()
+              if ln.strip()]
+    agreement = {}
+    misses = {}
+    for impl, fn in (("legacy", legacy_classify), ("compiled", router.classify)):
+        wrong = [(g["id"], g["task_family"], fn(g["input"])) for g in golden if fn(g["input"]) != g["task_family"]]
+        agreement[impl] = round(1 - len(wrong) / len(golden), 3) if golden else None
+        misses[impl] = [{"id": i, "expected": e, "got": got} for i, e, got in wrong]
+
+    texts = [g["input"] for g in golden]
+    golden_us = {}
+    for impl, fn in (("legacy", legacy_classify), ("compiled", router.classify)):
+        seconds = min(timeit.repeat(lambda fn=fn: [fn(t) for t in texts], number=args.number, repeat=3))
+        golden_us[impl] = round(1e6 * seconds / (args.number * max(1, len(texts))), 3)
+
+    large = {}
+    for size in (int(s) for s in args.sizes.split(",")):
+        large[str(size)] = {}
+        for case, head in (("head", "Traceback in the nightly import job; logs follow.\n"),
+                           ("absent", "Nightly import job logs follow.\n")):
+            text = head + FILLER * (max(0, size - len(head)) // len(FILLER) + 1)
+            text = text[:size]
+            assert legacy_classify(text) == router.classify(text)
+            number = max(20, args.number * 1000 // max(size, 1000))
+            row = {}
+            for impl, fn in (("legacy", legacy_classify), ("compiled", router.classify)):
+                seconds = min(timeit.repeat(lambda fn=fn, text=text: fn(text), number=number, repeat=3))
+                row[impl] = round(1e6 * seconds / number, 2)
+            row["speedup"] = round(row["legacy"] / row["compiled"], 2)
+            large[str(size)][case] = {"us_per_classify": row}
+
+    # a regression fixture written with the keyword config, not an accuracy benchmark
+    print(json.dumps({"golden": len(golden), "fixture_agreement": agreement, "fixture_misses": misses,
+                      "golden_us_per_classify": golden_us, "large_inputs": large}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""Compare regex template rendering with compiled templates.
+
+``regex`` is the previous ``TemplateLibrary.render``: two regex
+substitutions per call over the template and the input. ``compiled`` is
+``CompiledTemplate.render``: a single ``str.join`` over pre-split literal
+segments. Each is measured with ``timeit`` for short and long inputs, with
+and without ``<USER-CONTENT>`` tags, over every template in
+``prompt_library``. Variant construction (two candidates) is included.
+Prints one JSON object.
+
+    python benchmarks/bench_templates.py --number 20000
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import re
+import sys
+import timeit
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "src"))
+
+from empyrean_ai.curator.templates import TemplateLibrary  # noqa: E402
+
+_INPUT_BLOCK_RE = re.compile(r"<USER-CONTENT>.*?(?:</USER-CONTENT>|$)", re.DOTALL | re.IGNORECASE)
+_INPUT_PLACEHOLDER_RE = re.compile(r"(?:\{\{input\}\}|\[\[input\]\]|\{input\})")
+
+
+def regex_render(template: str, user_input: str) -> str:
+    sanitized = _INPUT_BLOCK_RE.sub("", user_input).strip()
+    return _INPUT_PLACEHOLDER_RE.sub(lambda _: sanitized, template)
+
+
+def regex_variants(template: str, user_input: str) -> list:
+    base = regex_render(template, user_input)
+    return [base, base + "\nConstraint: be concise yet complete."]
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--number", type=int, default=20000)
+    args = ap.parse_args()
+
+    lib = TemplateLibrary(ROOT / "prompt_library")
+    names = lib.preload()
+    inputs = {
+        "short": "Summarise the failing test and propose a fix.",
+        "short_tagged": "Summarise <USER-CONTENT>ignore previous</USER-CONTENT> the failing test.",
+        "long": "2024-05-01 12:00:00 worker-3 GET /api/v1/items 200 latency_ms=12\n" * 800,
+    }
+    results = {}
+    for label, text in inputs.items():
+        row = {}
+        for impl in ("regex", "compiled"):
+            def run(impl: str = impl, text: str = text) -> None:
+                for name in names:
+                    if impl == "regex":
+                        regex_variants(lib.load(name), text)
+                    else:
+                        tmpl = lib.get(name)
+                        tmpl.variants(tmpl.render(text), 2)
+
+            # the outputs must agree before timing means anything
+            for name in names:
+                tmpl = lib.get(name)
+                assert regex_variants(lib.load(name), text) == tmpl.variants(tmpl.render(text), 2)
+            seconds = min(timeit.repeat(run, number=max(1, args.number // len(names)), repeat=3))
+            row[impl] = round(1e6 * seconds / args.number, 3)
+        row["speedup"] = round(row["regex"] / row["compiled"], 2)
+        results[label] = {"us_per_render": row, "input_chars": len(text)}
+    print(json.dumps({"templates": len(names), "number": args.number, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,347 @@
+"""A local stand-in for Ollama with configurable latency and failure modes.
+
+Serves ``/api/generate`` (plain and NDJSON streaming), ``/api/ps``,
+``/api/tags`` and ``/api/embed``. Each reply is the smallest document that
+validates against the output schema the prompt asks for. The schema is found
+from the ``format_constraints`` keys in the prompt, or from the task family
+named in a repair prompt.
+
+Simulated costs:
+
+* a base latency drawn from ``latency`` (``fixed:S``, ``uniform:A:B``,
+  ``lognormal:MEDIAN:SIGMA`` or ``exp:MEAN``);
+* prompt evaluation at ``prompt_tokens_per_s`` and generation at
+  ``tokens_per_s``, with tokens counted as ``len(text) / 4``;
+* ``load_delay`` seconds whenever a model is not among the ``max_loaded``
+  most recently used models;
+* HTTP 500 on a ``fail_rate`` fraction of requests, and output that is not
+  valid JSON on an ``invalid_rate`` fraction.
+
+Like Ollama, each loaded model keeps ``kv_slots`` prompt caches. Only the
+part of a prompt (after any ``context`` sent with it) that does not share a
+prefix with a cached sequence is evaluated and counted in
+``prompt_eval_count``. Replies return ``context`` token ids that can be sent
+back. A negative ``keep_alive`` pins a model against eviction and ``0``
+unloads it after the request. Every request's shape is kept in ``requests``.
+
+The raw counters (``eval_count``, ``eval_duration``, ``load_duration``, ...)
+follow Ollama's response format, so token metrics work against it.
+
+    python benchmarks/fake_ollama.py --port 11434 --latency lognormal:0.05:0.5 --fail-rate 0.01
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import math
+import random
+import re
+import socket
+import sys
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, List, Tuple
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "src"))
+
+from fastapi import FastAPI, Request  # noqa: E402
+from fastapi.responses import JSONResponse, StreamingResponse  # noqa: E402
+
+from empyrean_ai.loop_thread import LoopThread  # noqa: E402
+
+_REPAIR_RE = re.compile(r"for task '([\w-]+)'")
+_KEY_RE = re.compile(r'"([A-Za-z_]\w*)"\s*:')
+
+
+def parse_latency(spec: str) -> Tuple[str, Tuple[float, ...]]:
+    """``"lognormal:0.05:0.5"`` -> ``("lognormal", (0.05, 0.5))``; raises ValueError on a bad spec."""
+    kind, *params = spec.split(":")
+    arity = {"fixed": 1, "uniform": 2, "lognormal": 2, "exp": 1}
+    if kind not in arity or len(params) != arity[kind]:
+        raise ValueError(f"bad latency spec {spec!r}; use fixed:S, uniform:A:B, lognormal:MEDIAN:SIGMA or exp:MEAN")
+    return kind, tuple(float(p) for p in params)
+
+
+@dataclass
+class FakeOllamaConfig:
+    latency: str = "fixed:0.0"
+    tokens_per_s: float = 200.0
+    prompt_tokens_per_s: float = 5000.0
+    stream_chunk_chars: int = 16
+    fail_rate: float = 0.0
+    invalid_rate: float = 0.0
+    load_delay: float = 0.0
+    max_loaded: int = 1
+    kv_slots: int = 1
+    seed: int = 0
+    schema_dir: Path = field(default_factory=lambda: ROOT / "schemas" / "outputs")
+
+
+def _minimal(schema: Dict[str, Any]) -> Any:
+    kind = schema.get("type")
+    if kind == "object":
+        return {k: _minimal(schema.get("properties", {}).get(k, {})) for k in schema.get("required", [])}
+    if kind == "array":
+        return [_minimal(schema.get("items", {}))]
+    if kind in ("number", "integer"):
+        lo, hi = schema.get("minimum", 0), schema.get("maximum", 1)
+        return (lo + hi) / 2 if kind == "number" else int(lo)
+    if kind == "boolean":
+        return True
+    return "ok"
+
+
+class FakeOllama:
+    """The fake's state (loaded models, counters) and its FastAPI ``app``."""
+
+    def __init__(self, config: FakeOllamaConfig | None = None):
+        self.config = config or FakeOllamaConfig()
+        self._latency = parse_latency(self.config.latency)
+        self._rng = random.Random(self.config.seed)
+        self._loaded: OrderedDict[str, None] = OrderedDict()
+        self._pinned: set[str] = set()
+        self._kv: Dict[str, List[List[int]]] = {}  # model -> cached token sequences, most recent last
+        self._vocab: Dict[str, int] = {}
+        self._words: List[str] = []
+        self.requests: List[Dict[str, Any]] = []
+        self.replies: Dict[str, Tuple[frozenset, str]] = {}
+        for path in sorted(Path(self.config.schema_dir).glob("*.schema.json")):
+            schema = json.loads(path.read_text(encoding="utf-8"))
+            family = path.name.split(".")[0]
+            self.replies[family] = (frozenset(schema.get("required", [])), json.dumps(_minimal(schema)))
+        self.stats: Dict[str, int] = {"requests": 0, "streamed": 0, "failed": 0, "invalid": 0, "loads": 0,
+                                      "prompt_tokens": 0, "cached_tokens": 0}
+        self.app = self._build_app()
+        self._thread: LoopThread | None = None
+        self._server: Any = None
+
+    # ------------------------------------------------------------------
+    def _base_latency(self) -> float:
+        kind, p = self._latency
+        if kind == "fixed":
+            return p[0]
+        if kind == "uniform":
+            return self._rng.uniform(p[0], p[1])
+        if kind == "lognormal":
+            return self._rng.lognormvariate(math.log(p[0]), p[1]) if p[0] > 0 else 0.0
+        return self._rng.expovariate(1.0 / p[0]) if p[0] > 0 else 0.0
+
+    def _load(self, model: str) -> float:
+        """Seconds to make ``model`` resident, evicting the least recently used beyond ``max_loaded``."""
+        if model in self._loaded:
+            self._loaded.move_to_end(model)
+            return 0.0
+        self._loaded[model] = None
+        while len(self._loaded) > max(1, self.config.max_loaded):
+            victim = next((m for m in self._loaded if m not in self._pinned and m != model), None)
+            if victim is None:
+                break
+            self._unload(victim)
+        self.stats["loads"] += 1
+        return self.config.load_delay
+
+    def _unload(self, model: str) -> None:
+        self._loaded.pop(model, None)
+        self._kv.pop(model, None)
+
+    def _keep_alive(self, model: str, keep_alive: Any) -> None:
+        if keep_alive is None:
+            return
+        if str(keep_alive).strip().startswith("-"):
+            self._pinned.add(model)
+        else:
+            self._pinned.discard(model)
+
+    def tokenize(self, text: str) -> List[int]:
+        """Four-character pieces as token ids (stable for the fake's lifetime)."""
+        ids = []
+        for i in range(0, len(text), 4):
+            piece = text[i:i + 4]
+            tid = self._vocab.get(piece)
+            if tid is None:
+                tid = self._vocab[piece] = len(self._words)
+                self._words.append(piece)
+            ids.append(tid)
+        return ids
+
+    def _prefill(self, model: str, seq: List[int], reply: List[int]) -> int:
+        """Tokens of ``seq`` to evaluate after the longest cached prefix; caches ``seq + reply``."""
+        slots = self._kv.setdefault(model, [])
+        best, best_i = 0, None
+        for i, cached in enumerate(slots):
+            n = 0
+            for a, b in zip(cached, seq):
+                if a != b:
+                    break
+                n += 1
+            if n > best or best_i is None:
+                best, best_i = n, i
+        if best_i is not None and (best > 0 or len(slots) >= max(1, self.config.kv_slots)):
+            slots.pop(best_i)  # the slot is reused for this sequence
+        slots.append(seq + reply)
+        self.stats["prompt_tokens"] += len(seq)
+        self.stats["cached_tokens"] += best
+        return len(seq) - best
+
+    def reply_for(self, prompt: str) -> str:
+        """A schema-valid document for the family the prompt asks for."""
+        m = _REPAIR_RE.search(prompt)
+        if m and m.group(1) in self.replies:
+            return self.replies[m.group(1)][1]
+        keys = set(_KEY_RE.findall(prompt))
+        best = max(self.replies.values(), key=lambda r: (r[0] <= keys, len(r[0] & keys)), default=None)
+        return best[1] if best is not None else "{}"
+
+    def _plan(self, model: str, prompt: str, context: List[int]) -> Tuple[str, float, float, float, Dict[str, Any]]:
+        """``(text, load_s, prompt_s, eval_s, counters)`` for one request."""
+        text = self.reply_for(prompt if not context else prompt + "".join(self._words[t] for t in context))
+        if self._rng.random() < self.config.invalid_rate:
+            self.stats["invalid"] += 1
+            text = "Sure! " + text[: max(1, len(text) // 2)]
+        load_s = self._load(model)
+        seq = list(context) + self.tokenize(prompt)
+        reply = self.tokenize(text)
+        prompt_tokens = self._prefill(model, seq, reply)
+        prompt_s = prompt_tokens / self.config.prompt_tokens_per_s
+        eval_s = len(reply) / self.config.tokens_per_s + self._base_latency()
+        counters: Dict[str, Any] = {"prompt_eval_count": prompt_tokens, "eval_count": len(reply), "context": seq + reply}
+        if not prompt_tokens:
+            del counters["prompt_eval_count"]  # Ollama omits it when the whole prompt was cached
+        return text, load_s, prompt_s, eval_s, counters
+
+    @staticmethod
+    def _done(model: str, load_s: float, prompt_s: float, eval_s: float, counts: Dict[str, Any]) -> Dict[str, Any]:
+        ns = 1_000_000_000
+        return {"model": model, "done": True, "done_reason": "stop",
+                "total_duration": int((load_s + prompt_s + eval_s) * ns), "load_duration": int(load_s * ns),
+                "prompt_eval_duration": int(prompt_s * ns), "eval_duration": int(eval_s * ns), **counts}
+
+    def _build_app(self) -> FastAPI:
+        app = FastAPI()
+
+        @app.post("/api/generate")
+        async def generate(request: Request):
+            body = await request.json()
+            model, prompt, context = body.get("model", ""), body.get("prompt", ""), body.get("context") or []
+            self.stats["requests"] += 1
+            self.requests.append({"model": model, "prompt_chars": len(prompt), "context_tokens": len(context),
+                                  **{k: body[k] for k in ("stream", "keep_alive", "options") if k in body}})
+            if self._rng.random() < self.config.fail_rate:
+                self.stats["failed"] += 1
+                return JSONResponse(status_code=500, content={"error": "simulated failure"})
+            self._keep_alive(model, body.get("keep_alive"))
+            text, load_s, prompt_s, eval_s, counts = self._plan(model, prompt, context)
+            done = self._done(model, load_s, prompt_s, eval_s, counts)
+            if str(body.get("keep_alive", "")).strip() in ("0", "0s", "0m"):
+                self._unload(model)  # keep_alive 0: unload once the reply is computed
+            if not body.get("stream", True):
+                await asyncio.sleep(load_s + prompt_s + eval_s)
+                return {**done, "response": text}
+
+            self.stats["streamed"] += 1
+            size = max(1, self.config.stream_chunk_chars)
+            pieces = [text[i:i + size] for i in range(0, len(text), size)]
+
+            async def _body() -> AsyncIterator[bytes]:
+                await asyncio.sleep(load_s + prompt_s)
+                for piece in pieces:
+                    await asyncio.sleep(eval_s / len(pieces))
+                    yield (json.dumps({"model": model, "response": piece, "done": False}) + "\n").encode()
+                yield (json.dumps({**done, "response": ""}) + "\n").encode()
+
+            return StreamingResponse(_body(), media_type="application/x-ndjson")
+
+        @app.get("/api/ps")
+        async def ps():
+            return {"models": [{"name": m, "model": m} for m in self._loaded]}
+
+        @app.get("/api/tags")
+        async def tags():
+            return {"models": [{"name": m, "model": m} for m in self._loaded]}
+
+        @app.post("/api/embed")
+        async def embed(request: Request):
+            body = await request.json()
+            inputs = body.get("input", [])
+            inputs = [inputs] if isinstance(inputs, str) else inputs
+            vectors: List[List[float]] = []
+            for text in inputs:
+                rng = random.Random(text)
+                vectors.append([rng.uniform(-1.0, 1.0) for _ in range(32)])
+            return {"model": body.get("model"), "embeddings": vectors}
+
+        return app
+
+    # ------------------------------------------------------------------
+    def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """Serve on a background loop thread; returns the base URL."""
+        import uvicorn
+
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((host, port))
+        self._server = uvicorn.Server(uvicorn.Config(self.app, log_level="warning", access_log=False, lifespan="off"))
+        self._thread = LoopThread(name="fake-ollama")
+        self._thread.submit(self._server.serve(sockets=[sock]))
+        deadline = time.monotonic() + 10.0
+        while not self._server.started:
+            if time.monotonic() > deadline:
+                raise RuntimeError("fake Ollama did not start")
+            time.sleep(0.01)
+        return f"http://{host}:{sock.getsockname()[1]}"
+
+    def close(self) -> None:
+        if self._server is not None:
+            self._server.should_exit = True
+            time.sleep(0.2)  # let serve() finish its shutdown on the loop
+        if self._thread is not None:
+            self._thread.close()
+        self._server = self._thread = None
+
+    def __enter__(self) -> FakeOllama:
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.close()
+
+
+def add_arguments(ap: argparse.ArgumentParser) -> None:
+    """The fake's options, shared with ``loadtest.py``."""
+    ap.add_argument("--latency", default="fixed:0.0", help="fixed:S | uniform:A:B | lognormal:MEDIAN:SIGMA | exp:MEAN")
+    ap.add_argument("--tokens-per-s", type=float, default=200.0)
+    ap.add_argument("--prompt-tokens-per-s", type=float, default=5000.0)
+    ap.add_argument("--fail-rate", type=float, default=0.0)
+    ap.add_argument("--invalid-rate", type=float, default=0.0)
+    ap.add_argument("--load-delay", type=float, default=0.0)
+    ap.add_argument("--max-loaded", type=int, default=1)
+    ap.add_argument("--kv-slots", type=int, default=1, help="prompt caches per loaded model (OLLAMA_NUM_PARALLEL)")
+    ap.add_argument("--seed", type=int, default=0)
+
+
+def config_from_args(args: argparse.Namespace) -> FakeOllamaConfig:
+    parse_latency(args.latency)
+    return FakeOllamaConfig(latency=args.latency, tokens_per_s=args.tokens_per_s,
+                            prompt_tokens_per_s=args.prompt_tokens_per_s, fail_rate=args.fail_rate,
+                            invalid_rate=args.invalid_rate, load_delay=args.load_delay,
+                            max_loaded=args.max_loaded, kv_slots=args.kv_slots, seed=args.seed)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=11434)
+    add_arguments(ap)
+    args = ap.parse_args()
+
+    import uvicorn
+
+    uvicorn.run(FakeOllama(config_from_args(args)).app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
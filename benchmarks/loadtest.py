@@ -0,0 +1,293 @@
+"""Load-test /v1/curate or CuratorEngine against the fake Ollama.
+
+Starts ``fake_ollama.FakeOllama`` on a background thread. It then drives
+either the engine directly (``--target engine``) or the FastAPI app in
+process over ASGI (``--target server``). Requests run at ``--concurrency``
+in flight and draw task families from ``--mix``.
+
+Reports requests/s, latency percentiles, outcome counts, event-loop lag and
+memory. The output is one JSON object. ``--out`` writes it to a file;
+``--baseline`` compares it with an earlier result and exits 1 when
+throughput, tail latency or loop lag regress by more than ``--tolerance``.
+
+    python benchmarks/loadtest.py --target server --requests 500 --concurrency 32 \\
+        --mix extraction=3,code_assist=1 --latency lognormal:0.05:0.5 --out results/head.json
+    python benchmarks/loadtest.py ... --baseline results/main.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import platform
+import random
+import resource
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Tuple
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "src"))
+sys.path.insert(0, str(ROOT / "benchmarks"))
+
+import httpx  # noqa: E402
+
+from fake_ollama import FakeOllama, add_arguments, config_from_args  # noqa: E402
+
+INPUTS = {
+    "extraction": "name: Ada Lovelace\nrole: analyst\nteam: engines\nlocation: London",
+    "code_assist": "Please implement a function that merges two sorted lists in Python.",
+    "bug_triage": "Traceback (most recent call last):\n  File \"app.py\", line 3\nKeyError: 'user'",
+    "design_rfc": "Design an architecture for a rate limiter shared by three services.",
+    "analytical": "Compare the cost of batch and streaming ingestion for 10 GB/day.",
+    "creative": "Write a short poem about a lighthouse keeper.",
+}
+
+# metric -> direction that counts as worse
+REGRESSION_KEYS = {
+    "req_per_s": "lower",
+    "latency_ms.p95": "higher",
+    "latency_ms.p99": "higher",
+    "loop_lag_ms.p99": "higher",
+}
+
+
+def parse_mix(spec: str) -> List[Tuple[str, float]]:
+    """``"extraction=3,code_assist=1"`` -> weighted task families."""
+    mix = []
+    for part in filter(None, (p.strip() for p in spec.split(","))):
+        name, _, weight = part.partition("=")
+        if name not in INPUTS:
+            raise ValueError(f"unknown task family {name!r}; choose from {', '.join(INPUTS)}")
+        mix.append((name, float(weight or 1)))
+    if not mix:
+        raise ValueError("empty --mix")
+    return mix
+
+
+def percentile(sorted_values: List[float], q: float) -> float | None:
+    """Nearest-rank percentile of an ascending list."""
+    if not sorted_values:
+        return None
+    i = min(len(sorted_values) - 1, max(0, int(round(q / 100.0 * len(sorted_values))) - 1))
+    return sorted_values[i]
+
+
+def _summary(values: List[float], scale: float = 1000.0) -> Dict[str, float | None]:
+    s = sorted(values)
+    out: Dict[str, float | None] = {}
+    for q in (50, 95, 99):
+        v = percentile(s, q)
+        out[f"p{q}"] = round(v * scale, 3) if v is not None else None
+    out["max"] = round(s[-1] * scale, 3) if s else None
+    out["mean"] = round(sum(s) / len(s) * scale, 3) if s else None
+    return out
+
+
+def _rss_mb() -> float | None:
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return None
+    return round(pages * resource.getpagesize() / 2**20, 1)
+
+
+class LoopLag:
+    """Samples how late ``asyncio.sleep(interval)`` wakes up on the running loop."""
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.samples: List[float] = []
+        self._task: asyncio.Task | None = None
+
+    async def _run(self) -> None:
+        while True:
+            t0 = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(0.0, time.perf_counter() - t0 - self.interval))
+
+    def start(self) -> None:
+        self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+
+
+Call = Callable[[str, str], Awaitable[str]]
+
+
+async def drive(call: Call, mix: List[Tuple[str, float]], requests: int, concurrency: int,
+                seed: int = 0) -> Dict[str, Any]:
+    """Issue ``requests`` calls with ``concurrency`` in flight; ``call`` returns an outcome label."""
+    rng = random.Random(seed)
+    families = rng.choices([m[0] for m in mix], weights=[m[1] for m in mix], k=requests)
+    latencies: List[float] = []
+    outcomes: Dict[str, int] = {}
+    by_family: Dict[str, List[float]] = {}
+    queue = iter(enumerate(families))
+    lag = LoopLag()
+
+    async def worker() -> None:
+        for i, family in queue:
+            t0 = time.perf_counter()
+            try:
+                outcome = await call(family, f"{INPUTS[family]}\n(request {i})")
+            except Exception as exc:  # the report counts failures instead of stopping
+                outcome = f"error:{type(exc).__name__}"
+            elapsed = time.perf_counter() - t0
+            outcomes[outcome] = outcomes.get(outcome, 0) + 1
+            if outcome == "ok":
+                latencies.append(elapsed)
+                by_family.setdefault(family, []).append(elapsed)
+
+    rss_before = _rss_mb()
+    lag.start()
+    t0 = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(max(1, concurrency))))
+    wall = time.perf_counter() - t0
+    await lag.stop()
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "wall_s": round(wall, 3),
+        "req_per_s": round(requests / wall, 2) if wall > 0 else None,
+        "ok_per_s": round(len(latencies) / wall, 2) if wall > 0 else None,
+        "outcomes": dict(sorted(outcomes.items())),
+        "latency_ms": _summary(latencies),
+        "latency_ms_by_family": {f: _summary(v) for f, v in sorted(by_family.items())},
+        "loop_lag_ms": _summary(lag.samples),
+        "memory_mb": {"rss_before": rss_before, "rss_after": _rss_mb(),
+                      "max_rss": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)},
+    }
+
+
+async def run_engine(base_url: str, args: argparse.Namespace, mix: List[Tuple[str, float]]) -> Dict[str, Any]:
+    from empyrean_ai.config import load_configs
+    from empyrean_ai.curator.engine import CuratorEngine
+    from empyrean_ai.curator.inference.ollama_client import OllamaClient
+
+    cfg = load_configs(ROOT / "configs")
+    eng = CuratorEngine(cfg, ROOT, client=OllamaClient.from_config(cfg.get("runtime"), base_url=base_url))
+    models = args.models.split(",")
+    counter = iter(range(args.requests))
+
+    async def call(family: str, text: str) -> str:
+        model = models[next(counter) % len(models)]
+        out = await eng.curate(family, text, model, n_candidates=args.candidates, stream=args.stream,
+                               use_cache=args.cache)
+        return "ok" if out["validation"]["ok"] else "invalid"
+
+    await eng.start()
+    try:
+        report = await drive(call, mix, args.requests, args.concurrency, args.seed)
+    finally:
+        await eng.aclose()
+    report["engine"] = eng.stats()
+    return report
+
+
+async def run_server(base_url: str, args: argparse.Namespace, mix: List[Tuple[str, float]]) -> Dict[str, Any]:
+    from empyrean_ai import server
+    from empyrean_ai.curator.inference.ollama_client import OllamaClient
+
+    server.engine.client = OllamaClient.from_config(server.cfg.get("runtime"), base_url=base_url)
+    transport = httpx.ASGITransport(app=server.app)
+
+    async def call(family: str, text: str) -> str:
+        body = {"task_family": family, "input": text, "n_candidates": args.candidates,
+                "bypass_cache": not args.cache}
+        r = await http.post("/v1/curate", json=body)
+        if r.status_code != 200:
+            return f"http_{r.status_code}"
+        return "ok" if r.json()["validation"]["ok"] else "invalid"
+
+    async with server.app.router.lifespan_context(server.app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as http:
+            report = await drive(call, mix, args.requests, args.concurrency, args.seed)
+    report["engine"] = server.engine.stats()
+    return report
+
+
+def _get(d: Dict[str, Any], dotted: str) -> Any:
+    for part in dotted.split("."):
+        d = d.get(part) if isinstance(d, dict) else None
+    return d
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> Dict[str, Any]:
+    """Relative change of the regression metrics; ``regressions`` lists those worse than ``tolerance``."""
+    changes: Dict[str, Any] = {}
+    regressions = []
+    for key, worse in REGRESSION_KEYS.items():
+        new, old = _get(current, key), _get(baseline, key)
+        if not isinstance(new, (int, float)) or not isinstance(old, (int, float)) or old == 0:
+            continue
+        change = (new - old) / old
+        changes[key] = {"baseline": old, "current": new, "change": round(change, 4)}
+        if (change < -tolerance) if worse == "lower" else (change > tolerance):
+            regressions.append(key)
+    return {"tolerance": tolerance, "changes": changes, "regressions": regressions}
+
+
+def _commit() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--target", choices=("engine", "server"), default="engine")
+    ap.add_argument("--requests", type=int, default=200)
+    ap.add_argument("--concurrency", type=int, default=16)
+    ap.add_argument("--mix", default="extraction=1")
+    ap.add_argument("--models", default="bench-small", help="comma-separated models (engine target, round robin)")
+    ap.add_argument("--candidates", type=int, default=1)
+    ap.add_argument("--stream", action="store_true", help="stream generations (engine target)")
+    ap.add_argument("--cache", action="store_true", help="allow response cache hits")
+    ap.add_argument("--out", type=Path, default=None)
+    ap.add_argument("--baseline", type=Path, default=None)
+    ap.add_argument("--tolerance", type=float, default=0.10)
+    add_arguments(ap)
+    args = ap.parse_args()
+    mix = parse_mix(args.mix)
+
+    fake = FakeOllama(config_from_args(args))
+    base_url = fake.start()
+    try:
+        runner = run_engine if args.target == "engine" else run_server
+        report = asyncio.run(runner(base_url, args, mix))
+    finally:
+        fake.close()
+
+    result = {
+        "commit": _commit(),
+        "python": platform.python_version(),
+        "ts": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "params": {k: (str(v) if isinstance(v, Path) else v) for k, v in vars(args).items()
+                   if k not in ("out", "baseline")},
+        **report,
+        "fake_ollama": fake.stats,
+    }
+    if args.baseline is not None:
+        result["comparison"] = compare(result, json.loads(args.baseline.read_text(encoding="utf-8")),
+                                       args.tolerance)
+    text = json.dumps(result, indent=2)
+    if args.out is not None:
+        args.out.parent.mkdir(parents=True, exist_ok=True)
+        args.out.write_text(text + "\n", encoding="utf-8")
+    print(text)
+    if args.baseline is not None and result["comparison"]["regressions"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,54 @@
-import yaml, json
+"""Prompt assembly from the services prompt library.
+
+Templates are parsed once and cached until their file changes (mtime), so
+:func:`craft_prompt` costs one ``stat`` instead of a read and a YAML parse;
+it joins precomputed text around the user input.
+"""
+
+from __future__ import annotations
+
+import threading
 from pathlib import Path
+from typing import Dict, Tuple
+
+import yaml
 
 LIB = (Path(__file__).resolve().parent / "library")
 
-def _load(pid): return yaml.safe_load((LIB/pid).read_text())
+_cache: Dict[str, Tuple[int, str, str]] = {}  # prompt id -> (mtime_ns, prefix, suffix)
+_lock = threading.Lock()
 
-def craft_prompt(task, user_text, model_cfg):
-    pid = model_cfg.get("prompt_id") or f"{task}.v1.yaml"
-    T   = _load(pid)
+
+def _compile(T: dict) -> Tuple[str, str]:
     sys = T["system"]
-    inst= T["instructions"]
-    fmt = T.get("format_constraints","")
+    inst = T["instructions"]
+    fmt = T.get("format_constraints", "")
     # Optional stakes/role cues when flagged (Evidence: EmotionPrompts). :contentReference[oaicite:11]{index=11}
-    cues = T.get("cues","")
-    return f"[SYSTEM]\n{sys}\n\n[INSTRUCTIONS]\n{inst}\n\n[CUES]\n{cues}\n\n[USER]\n{user_text}\n\n[OUTPUT]\n{fmt}".strip()
+    cues = T.get("cues", "")
+    return f"[SYSTEM]\n{sys}\n\n[INSTRUCTIONS]\n{inst}\n\n[CUES]\n{cues}\n\n[USER]\n", f"\n\n[OUTPUT]\n{fmt}"
+
+
+def _load(pid: str) -> Tuple[str, str]:
+    path = LIB / pid
+    mtime_ns = path.stat().st_mtime_ns
+    hit = _cache.get(pid)
+    if hit is not None and hit[0] == mtime_ns:
+        return hit[1], hit[2]
+    prefix, suffix = _compile(yaml.safe_load(path.read_text()))
+    with _lock:
+        _cache[pid] = (mtime_ns, prefix, suffix)
+    return prefix, suffix
+
+
+def preload() -> list[str]:
+    """Parse every template in the library ahead of the first request."""
+    names = sorted(p.name for p in LIB.iterdir() if p.suffix in (".yml", ".yaml"))
+    for name in names:
+        _load(name)
+    return names
+
+
+def craft_prompt(task, user_text, model_cfg):
+    pid = model_cfg.get("prompt_id") or f"{task}.v1.yaml"
+    prefix, suffix = _load(pid)
+    return (prefix + user_text + suffix).strip()
@@ -1,10 +1,48 @@
-import requests, json
+"""Blocking Ollama generation for the services, backed by one pooled async client.
 
-OLLAMA="http://localhost:11434/api/generate"
+:func:`arun` is the async entry point. :func:`run` keeps the old blocking
+signature and runs :func:`arun` on the shared loop thread, so concurrent
+callers share the client's connection pool instead of opening a new
+connection per request. The client lives on the shared loop only; calls
+from any other loop are forwarded to it. Its timeout is
+``ollama.service_timeout`` (default 120 s), longer than the engine's,
+because these callers do not stream.
+"""
 
-def run(model, prompt, options=None):
-    body = {"model": model, "prompt": prompt, "stream": False}
-    if options: body["options"] = options
-    r = requests.post(OLLAMA, json=body, timeout=120)
-    r.raise_for_status()
-    return r.json()["response"]
+from __future__ import annotations
+
+import threading
+from pathlib import Path
+
+from empyrean_ai.config import load_configs
+from empyrean_ai.curator.inference.ollama_client import OllamaClient
+from empyrean_ai.loop_thread import shared_loop
+
+BASE = Path(__file__).resolve().parents[2]
+
+_client: OllamaClient | None = None
+_lock = threading.Lock()
+
+
+def client() -> OllamaClient:
+    """The shared client, configured from configs/runtime.yml and closed at exit."""
+    global _client
+    with _lock:
+        if _client is None:
+            runtime = load_configs(BASE / "configs").get("runtime") or {}
+            timeout = float((runtime.get("ollama") or {}).get("service_timeout", 120.0))
+            _client = OllamaClient.from_config(runtime, timeout=timeout)
+            shared_loop().add_closer(_client.aclose)
+        return _client
+
+
+async def _generate(model: str, prompt: str, options: dict | None) -> str:
+    return (await client().generate(model, prompt, options))["text"]
+
+
+async def arun(model: str, prompt: str, options: dict | None = None) -> str:
+    return await shared_loop().forward(_generate(model, prompt, options))
+
+
+def run(model: str, prompt: str, options: dict | None = None) -> str:
+    return shared_loop().run(_generate(model, prompt, options))
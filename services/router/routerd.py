@@ -1,14 +1,29 @@
+"""Classify, route and escalate a request on the shared loop thread.
+
+Prompts come from the services prompt library (:func:`craft_prompt`) and
+generations go through the gateway's pooled client. :func:`ahandle` is the
+async entry point. It always runs on the shared loop, where the client
+lives, and is forwarded there when awaited from any other loop.
+:func:`handle` is the blocking facade. It runs on the same loop, so a slow
+model no longer blocks other callers and every call reuses the same
+connections.
+"""
+
+from __future__ import annotations
+
+import logging
 import time
 from pathlib import Path
-import logging
 
-from services.gateway.infer import run as llm
 from services.curator.curatord import craft_prompt
+from services.gateway.infer import arun as llm
 from empyrean_ai.config import load_configs
+from empyrean_ai.curator.engine import _decoding_for
+from empyrean_ai.curator.escalation import run_chain
 from empyrean_ai.curator.router import Router
 from empyrean_ai.curator.registry import ModelRegistry
-from empyrean_ai.curator.engine import _decoding_for
-from empyrean_ai.post_validators import validate_output
+from empyrean_ai.loop_thread import shared_loop
+from empyrean_ai.post_validators import ValidationResult, validate_output
 
 
 BASE = Path(__file__).resolve().parents[2]
@@ -17,33 +32,48 @@ REG = ModelRegistry(CFG); REG.set_routing(CFG["routing"])
 ROUTER = Router(CFG["routing"], aliases=CFG["models"].get("aliases", {}))
 
 
-def handle(user_input: str) -> dict:
+async def _handle(user_input: str, strategy: str | None) -> dict:
     task = ROUTER.classify(user_input)
     initial = CFG["routing"]["task_map"][task]["initial"]
     chain = [initial] + list(CFG["routing"]["task_map"][task]["chain"])
     opts = _decoding_for(task, CFG["decoding"]) if CFG.get("decoding") else {}
     schema_dir = BASE / "schemas" / "outputs"
+    prompt = craft_prompt(task, user_input, {"prompt_id": f"{task}_v1.yml"})
 
-    last_out = None
-    t_start = time.time()
-    for key in chain:
+    async def attempt(key: str, _depth: int) -> tuple[str, ValidationResult]:
         model_info = REG.resolve(ROUTER.alias(key))
-        prompt = craft_prompt(task, user_input, {"prompt_id": f"{task}_v1.yml"})
-        out = llm(model_info.ollama_name, prompt, options=opts)
-        last_out = out
-        vr = validate_output(task, out, schema_dir)
-        if vr.ok:
-            return {
-                "task": task,
-                "model": key,
-                "latency_ms": int(1000 * (time.time() - t_start)),
-                "output": out,
-                "validation": {"ok": True, "signals": vr.signals},
-            }
+        out = await llm(model_info.ollama_name, prompt, opts)
+        return out, validate_output(task, out, schema_dir)
+
+    def acceptable(r: tuple[str, ValidationResult]) -> bool:
+        return r[1].ok and not ROUTER.needs_escalation(r[1].signals)
+
+    t_start = time.time()
+    (out, vr), key, trace = await run_chain(
+        chain, attempt, acceptable, ROUTER.escalation_policy(strategy),
+        rank=lambda r: (not r[1].ok, len(r[1].signals)),
+    )
+    if acceptable((out, vr)):
+        return {
+            "task": task,
+            "model": key,
+            "latency_ms": int(1000 * (time.time() - t_start)),
+            "output": out,
+            "validation": {"ok": True, "signals": vr.signals},
+        }
+    logging.getLogger(__name__).info("escalation exhausted for %s: %s", task, trace)
     return {
         "task": task,
-        "model": chain[-1],
-        "output": last_out,
+        "model": key,
+        "output": out,
         "warning": "low confidence; review",
         "validation": {"ok": False, "signals": ["escalation_exhausted"]},
     }
+
+
+async def ahandle(user_input: str, strategy: str | None = None) -> dict:
+    return await shared_loop().forward(_handle(user_input, strategy))
+
+
+def handle(user_input: str, strategy: str | None = None) -> dict:
+    return shared_loop().run(_handle(user_input, strategy))
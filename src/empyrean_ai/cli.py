@@ -1,45 +1,132 @@
 from __future__ import annotations
-import asyncio, json, sys
+import asyncio, json, random, sys, time
 from pathlib import Path
 import typer
 from .config import load_configs
+from .curator.adaptive import AdaptiveRouter
 from .curator.registry import ModelRegistry
 from .curator.router import Router
+from .curator.learned_classifier import LearnedClassifier, load_examples
 from .curator.engine import CuratorEngine
+from .curator.service import CurateService
+from .curator.batch import BatchProgress, Checkpoint, count_lines, read_items
 from .logging_utils import setup_logging
+from .runlog import iter_runs, run_dir_from_config
+from .curator.inference.retrieval.fs_chunks import chunk_text, is_chunk_mode, is_stream_mode, iter_chunks
+from .curator.inference.retrieval.bm25 import BM25Index
+from .curator.inference.retrieval.dense import DenseIndex, reciprocal_rank_fusion
+from .curator.inference.ollama_client import OllamaClient
 
 app = typer.Typer(add_completion=False, no_args_is_help=True, help="Empyrean AI CLI")
+router_app = typer.Typer(add_completion=False, no_args_is_help=True, help="Task classifier and adaptive routing tools")
+app.add_typer(router_app, name="router")
 
 
 @app.command()
 def curate(task: str = typer.Option(None, "--task", help="task family"),
            model: str = typer.Option("auto", "--model", help="model key|auto"),
            user_input: str = typer.Option(..., "--input", help="text or @/path/to/file"),
-           candidates: int = typer.Option(2, "--candidates", min=1, max=4)):
+           candidates: int = typer.Option(2, "--candidates", min=1, max=4),
+           early_stop: bool = typer.Option(None, "--early-stop/--no-early-stop", help="return first clean candidate"),
+           concurrency: int = typer.Option(None, "--concurrency", min=1, help="max concurrent generations"),
+           no_cache: bool = typer.Option(False, "--no-cache", help="bypass the response cache"),
+           map_reduce: bool = typer.Option(False, "--map-reduce", help="chunk the input, curate chunks concurrently, merge"),
+           chunk_mode: str = typer.Option(None, "--chunk-mode", help="chars|lines|tokens, or bytes for @file (map-reduce)"),
+           chunk_size: int = typer.Option(None, "--chunk-size", min=1, help="chunk size in chunk-mode units"),
+           chunk_overlap: int = typer.Option(None, "--chunk-overlap", min=0, help="overlap between chunks"),
+           retrieve: bool = typer.Option(None, "--retrieve/--no-retrieve", help="ground the prompt in the local index")) -> None:
     setup_logging()
     base = Path(__file__).resolve().parents[2]
     cfg = load_configs(base / "configs")
     registry = ModelRegistry(cfg); registry.set_routing(cfg["routing"])
-    router = Router(cfg["routing"], aliases=cfg["models"].get("aliases", {}))
-    engine = CuratorEngine(cfg, base)
+    router = Router(cfg["routing"], aliases=cfg["models"].get("aliases", {}), base_dir=base)
+    engine = CuratorEngine(cfg, base, max_concurrency=concurrency, early_stop=early_stop)
 
+    mr = cfg["runtime"].get("map_reduce") or {}
+    mode = chunk_mode or mr.get("chunk_mode", "tokens")
+    size = chunk_size or int(mr.get("chunk_size", 4000))
+    overlap = chunk_overlap if chunk_overlap is not None else int(mr.get("overlap", 200))
+    if map_reduce and not (is_chunk_mode(mode) or is_stream_mode(mode)):
+        raise typer.BadParameter(f"unknown chunk mode {mode!r}", param_hint="--chunk-mode")
+    if map_reduce and mode == "bytes" and not user_input.startswith("@"):
+        raise typer.BadParameter("bytes mode needs an @file input", param_hint="--chunk-mode")
+    chunks: list[str] | None = None
     if user_input.startswith("@"):
-        p = Path(user_input[1:]); text = p.read_text(encoding="utf-8")
+        p = Path(user_input[1:])
+        if map_reduce and is_stream_mode(mode):
+            # stream the file: only the chunks are held, never the whole document as one string
+            chunks = [c.text for c in iter_chunks(p, mode, size, overlap)]
+            text = chunks[0] if chunks else ""
+        else:
+            text = p.read_text(encoding="utf-8")
     else:
         text = user_input
 
     tf = task or router.classify(text)
     mk = registry.routing_initial(tf) if model == "auto" else model
     mi = registry.resolve(router.alias(mk))
+    if model == "auto" and not map_reduce:
+        # route oversized inputs to a model whose context window holds them
+        chosen = engine.pick_context_model(tf, text, [mi.ollama_name] + [m.ollama_name for m in registry.by_context()])
+        mi = next((m for m in registry.by_context() if m.ollama_name == chosen), mi)
+    if map_reduce and chunks is None and is_chunk_mode(mode):
+        # token estimates use the chosen model family's chars_per_token
+        chunks = chunk_text(text, mode, size, overlap, engine.packer.chars_per_token_for(mi.ollama_name))
+
+    async def _run() -> None:
+        await engine.start()
+        try:
+            if map_reduce:
+                out = await engine.curate_map_reduce(tf, chunks or [], mi.ollama_name, n_candidates=candidates, run_dir=run_dir_from_config(cfg["runtime"], base), use_cache=not no_cache)
+            else:
+                out = await engine.curate(tf, text, mi.ollama_name, n_candidates=candidates, run_dir=run_dir_from_config(cfg["runtime"], base), use_cache=not no_cache, retrieve=retrieve)
+        finally:
+            await engine.aclose()
+        result = {"task_family": tf, "model": mi.key, "output": out["text"], "validation": out["validation"]}
+        if map_reduce:
+            result["chunks"] = [{k: c[k] for k in ("index", "chars", "elapsed", "ok")} for c in out["meta"]["chunks"]]
+        print(json.dumps(result, ensure_ascii=False))
+    asyncio.run(_run())
+
+
+@app.command()
+def batch(source: Path = typer.Argument(..., help="JSONL of {id, input, task_family?, model?} items"),
+          out: Path = typer.Option(..., "--out", help="NDJSON results; also the checkpoint for resuming"),
+          candidates: int = typer.Option(1, "--candidates", min=1, max=4),
+          concurrency: int = typer.Option(None, "--concurrency", min=1, help="max concurrent generations"),
+          max_in_flight: int = typer.Option(None, "--max-in-flight", min=1, help="items in flight (default: runtime.yml batch)"),
+          resume: bool = typer.Option(True, "--resume/--restart", help="skip items already in --out"),
+          no_cache: bool = typer.Option(False, "--no-cache", help="bypass the response cache")) -> None:
+    """Curate a JSONL file concurrently, writing results in completion order."""
+    setup_logging()
+    base = Path(__file__).resolve().parents[2]
+    cfg = load_configs(base / "configs")
+    # the same classify/escalate path as POST /v1/curate/batch
+    service = CurateService(cfg, base, max_concurrency=concurrency)
+    interval = float((cfg["runtime"].get("batch") or {}).get("progress_interval_s", 5.0))
 
-    async def _run():
-        out = await engine.curate(tf, text, mi.ollama_name, n_candidates=candidates, run_dir=base / "data" / "runs")
-        print(json.dumps({"task_family": tf, "model": mi.key, "output": out["text"], "validation": out["validation"]}, ensure_ascii=False))
+    async def _run() -> None:
+        progress = BatchProgress(total=count_lines(source))
+        last = time.monotonic()
+        await service.start()
+        try:
+            with source.open(encoding="utf-8") as f, Checkpoint(out, resume=resume) as checkpoint:
+                lines = service.batch(read_items(f, errors="report"), max_in_flight=max_in_flight,
+                                      done=checkpoint.done, progress=progress,
+                                      defaults={"n_candidates": candidates, "bypass_cache": no_cache})
+                async for line in lines:
+                    checkpoint.record(line)
+                    if time.monotonic() - last >= interval:
+                        last = time.monotonic()
+                        print(json.dumps({"event": "progress", **progress.snapshot()}), file=sys.stderr)
+        finally:
+            await service.aclose()
+        print(json.dumps({"event": "done", "out": str(out), **progress.snapshot()}))
     asyncio.run(_run())
 
 
 @app.command()
-def eval(run: Path = typer.Option(None, "--run", help="unused placeholder for v1")):
+def eval(run: Path = typer.Option(None, "--run", help="unused placeholder for v1")) -> None:
     """Run tiny golden-set eval (local, offline)."""
     base = Path(__file__).resolve().parents[2]
     gfile = base / "data" / "golden" / "tasks.jsonl"
@@ -50,5 +137,158 @@ def eval(run: Path = typer.Option(None, "--run", help="unused placeholder for v1
         by_family[t["task_family"]] = by_family.get(t["task_family"], 0) + 1
     print(json.dumps({"golden_counts": by_family, "file": str(gfile)}, indent=2))
 
+@app.command()
+def index(path: list[Path] = typer.Argument(None, help="files or directories (default: runtime.yml retrieval.paths)"),
+          index_dir: Path = typer.Option(None, "--dir", help="index directory (default: runtime.yml retrieval.index_dir)"),
+          query: str = typer.Option(None, "--query", help="query the index instead of updating it"),
+          k: int = typer.Option(5, "--k", min=1, help="hits to show with --query"),
+          dense: bool = typer.Option(False, "--dense", help="also embed chunks (update) or fuse embedding hits (query)")) -> None:
+    """Build or incrementally update the local BM25 retrieval index."""
+    base = Path(__file__).resolve().parents[2]
+    runtime = load_configs(base / "configs")["runtime"]
+    node = runtime.get("retrieval") or {}
+    dense_cfg = node.get("dense") or {}
+    model = str(dense_cfg.get("model", "nomic-embed-text"))
+    target = index_dir or Path(node.get("index_dir", "data/index"))
+    target = target if target.is_absolute() else base / target
+
+    async def _dense(idx: BM25Index) -> dict | list:
+        client = OllamaClient.from_config(runtime)
+        try:
+            with DenseIndex(target / "dense") as vectors:
+                if query:
+                    qvec = (await client.embed(model, [query]))[0]
+                    semantic = vectors.retrieve(idx, qvec, 2 * k, dense_cfg.get("nprobe", 8))
+                    return reciprocal_rank_fusion([idx.retrieve(query, 2 * k), semantic], k,
+                                                  int(dense_cfg.get("rrf_k", 60)))
+                res = await vectors.sync(idx, lambda texts: client.embed(model, texts), model,
+                                         batch_size=int(dense_cfg.get("batch_size", 64)),
+                                         ivf_min_rows=dense_cfg.get("ivf_min_rows"))
+                return {"dense": {**res, **vectors.stats()}}
+        finally:
+            await client.aclose()
+
+    with BM25Index(target, max_size=int(node.get("chunk_size", 1500))) as idx:
+        if query:
+            hits = asyncio.run(_dense(idx)) if dense else idx.retrieve(query, k)
+            for h in hits:
+                print(json.dumps({"path": h.path, "start": h.start, "end": h.end, "score": round(h.score, 4),
+                                  "text": h.text}, ensure_ascii=False))
+            return
+        paths = path or [base / p for p in node.get("paths", ["docs", "src"])]
+        out = {**idx.update(paths), **idx.stats()}
+        if dense:
+            out.update(asyncio.run(_dense(idx)))
+        print(json.dumps(out))
+
+@app.command()
+def runs(day: list[str] = typer.Option(None, "--day", help="YYYYMMDD; repeatable"),
+         limit: int = typer.Option(0, "--limit", min=0, help="stop after N records (0 = all)")) -> None:
+    """Stream logged runs as NDJSON."""
+    base = Path(__file__).resolve().parents[2]
+    cfg = load_configs(base / "configs")
+    for i, rec in enumerate(iter_runs(run_dir_from_config(cfg["runtime"], base), set(day) if day else None)):
+        if limit and i >= limit:
+            break
+        print(json.dumps(rec, ensure_ascii=False))
+
+def _learned_path(base: Path, cfg: dict, path: Path | None) -> Path:
+    node = (cfg["routing"].get("classifier") or {}).get("learned") or {}
+    target = path or Path(node.get("path", "data/router/classifier.npz"))
+    return target if target.is_absolute() else base / target
+
+def _router_report(router: Router, examples: list) -> dict:
+    texts = [t for t, _, _ in examples]
+    labels = [label for _, label, _ in examples]
+    t0 = time.perf_counter()
+    routed = router.route_batch(texts)
+    batch_us = 1e6 * (time.perf_counter() - t0) / max(1, len(texts))
+    t0 = time.perf_counter()
+    learned = [router.learned.predict(t) for t in texts] if router.learned is not None else []
+    single_us = 1e6 * (time.perf_counter() - t0) / max(1, len(texts))
+    keywords = [router.classifier.classify(t) for t in texts]
+
+    def acc(pred: list) -> float | None:
+        return round(sum(p == y for p, y in zip(pred, labels)) / len(labels), 3) if pred and labels else None
+
+    per_family: dict[str, dict] = {}
+    for c, y in zip(routed, labels):
+        row = per_family.setdefault(y, {"n": 0, "correct": 0})
+        row["n"] += 1
+        row["correct"] += c.task_family == y
+    return {
+        "n": len(texts),
+        "accuracy": {"keywords": acc(keywords), "learned": acc([p[0] for p in learned]),
+                     "router": acc([c.task_family for c in routed])},
+        "min_confidence": router.min_confidence,
+        "fallback_rate": round(sum(c.source == "keywords" for c in routed) / max(1, len(routed)), 3),
+        "per_family": {f: {**r, "accuracy": round(r["correct"] / r["n"], 3)} for f, r in sorted(per_family.items())},
+        "us_per_text": {"learned_single": round(single_us, 1), "router_batch": round(batch_us, 1)},
+    }
+
+@router_app.command("train")
+def router_train(golden: Path = typer.Option(None, "--golden", help="labelled JSONL (default: data/golden/tasks.jsonl)"),
+                 runs: bool = typer.Option(True, "--runs/--no-runs", help="also learn from logged runs that recorded their input"),
+                 out: Path = typer.Option(None, "--out", help="artifact (default: routing.yml classifier.learned.path)"),
+                 holdout: float = typer.Option(0.0, "--holdout", min=0.0, max=0.9, help="fraction held out and evaluated"),
+                 epochs: int = typer.Option(200, "--epochs", min=1),
+                 dim_bits: int = typer.Option(17, "--dim-bits", min=8, max=24, help="2**N hashed feature buckets"),
+                 seed: int = typer.Option(0, "--seed")) -> None:
+    """Train the hashed n-gram task classifier and write its artifact."""
+    base = Path(__file__).resolve().parents[2]
+    cfg = load_configs(base / "configs")
+    examples = load_examples(golden or base / "data" / "golden" / "tasks.jsonl",
+                             iter_runs(run_dir_from_config(cfg["runtime"], base)) if runs else ())
+    if not examples:
+        raise typer.BadParameter("no labelled examples found")
+    random.Random(seed).shuffle(examples)
+    n_test = int(len(examples) * holdout)
+    test, train = examples[:n_test], examples[n_test:]
+    t0 = time.perf_counter()
+    model = LearnedClassifier.train(train, dim=1 << dim_bits, epochs=epochs, seed=seed)
+    train_s = time.perf_counter() - t0
+    target = _learned_path(base, cfg, out)
+    model.save(target)
+    report = {"examples": len(examples), "train": len(train), "classes": model.classes,
+              "train_s": round(train_s, 3), "out": str(target), "bytes": target.stat().st_size}
+    if test:
+        report["holdout"] = _router_report(Router(cfg["routing"], learned=model), test)
+    print(json.dumps(report, indent=2))
+
+@router_app.command("eval")
+def router_eval(data: Path = typer.Option(None, "--data", help="labelled JSONL (default: data/golden/tasks.jsonl)"),
+                model: Path = typer.Option(None, "--model", help="artifact (default: routing.yml classifier.learned.path)")) -> None:
+    """Compare the learned classifier, the keyword rules and the combined router on labelled data."""
+    base = Path(__file__).resolve().parents[2]
+    cfg = load_configs(base / "configs")
+    path = _learned_path(base, cfg, model)
+    if not path.is_file():
+        raise typer.BadParameter(f"no model at {path}; run 'aan router train'")
+    t0 = time.perf_counter()
+    learned = LearnedClassifier.load(path)
+    load_ms = 1e3 * (time.perf_counter() - t0)
+    examples = load_examples(data or base / "data" / "golden" / "tasks.jsonl")
+    report = _router_report(Router(cfg["routing"], learned=learned), examples)
+    print(json.dumps({"model": str(path), "load_ms": round(load_ms, 2), **report}, indent=2))
+
+@router_app.command("adaptive")
+def router_adaptive(days: int = typer.Option(None, "--days", min=1, help="run-log history (default: routing.yml adaptive.history_days)")) -> None:
+    """Show per-model outcome statistics from the run logs and the starting model each family would get."""
+    base = Path(__file__).resolve().parents[2]
+    cfg = load_configs(base / "configs")
+    registry = ModelRegistry(cfg); registry.set_routing(cfg["routing"])
+    router = Router(cfg["routing"], aliases=cfg["models"].get("aliases", {}))
+    adaptive = AdaptiveRouter.from_config(cfg["routing"])
+    history = days or int((cfg["routing"].get("adaptive") or {}).get("history_days", 14))
+    used = adaptive.load_runs(iter_runs(run_dir_from_config(cfg["runtime"], base), AdaptiveRouter.recent_days(history)))
+    plans = {}
+    for task in cfg["routing"]["task_map"]:
+        chain = [registry.resolve(router.alias(router.initial_model(task))).ollama_name]
+        chain += [n for n in (registry.resolve(router.alias(c)).ollama_name for c in router.escalation_chain(task))
+                  if n not in chain]
+        plans[task] = adaptive.plan(task, chain).explain(chain)
+    print(json.dumps({"runs": used, "history_days": history, "enabled": adaptive.enabled,
+                      "stats": adaptive.snapshot()["families"], "plans": plans}, indent=2))
+
 if __name__ == "__main__":
     app()
@@ -14,4 +14,6 @@ def load_configs(base_dir: Path | None = None) -> dict:
     models = load_yaml(base / "models.yml")
     routing = load_yaml(base / "routing.yml")
     decoding = load_yaml(base / "decoding.yml")
-    return {"models": models, "routing": routing, "decoding": decoding}
+    runtime_path = base / "runtime.yml"
+    runtime = (load_yaml(runtime_path) or {}) if runtime_path.is_file() else {}
+    return {"models": models, "routing": routing, "decoding": decoding, "runtime": runtime}
@@ -0,0 +1,214 @@
+"""Adaptive choice of the starting model from observed outcomes.
+
+The static ``task_map`` in configs/routing.yml always starts a family on its
+``initial`` model and escalates along ``chain``. :class:`AdaptiveRouter` keeps
+per ``(task_family, model)`` statistics and may start further down that chain
+when the earlier models rarely produce an acceptable result. The statistics
+are the acceptance rate (valid output with no escalation signal), the rate of
+each signal, latency and tokens. They are loaded from the run logs at startup
+and updated after every attempt.
+
+Starting at chain position ``i`` costs, in expectation::
+
+    E[i] = cost[i] + (1 - p[i]) * E[i + 1]        E[last] = cost[last]
+
+where ``p`` is the acceptance rate and ``cost`` is latency plus
+``token_cost_s`` seconds per token. The chain from ``i`` has quality
+``1 - prod(1 - p[j] for j >= i)``. The cheapest start whose quality reaches
+``quality_floor`` wins, considering only starts where every model from there on
+has ``min_samples`` observations and whose model can hold the input (the
+caller passes ``eligible``). Otherwise the static start is used.
+A model that is always skipped is never measured again. An ``explore``
+fraction of requests therefore starts at a random earlier position. This costs
+latency but never quality, because an earlier start runs a superset of the
+chain. Latency and tokens are exponentially weighted (``alpha``) so the
+estimates follow model or hardware changes.
+"""
+
+from __future__ import annotations
+
+import random
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Sequence, Tuple
+
+__all__ = ["ArmStats", "RouteDecision", "AdaptiveRouter"]
+
+
+@dataclass
+class ArmStats:
+    """Observed outcomes of one model on one task family."""
+
+    n: int = 0
+    accepted: int = 0
+    latency_s: float = 0.0  # exponentially weighted
+    tokens: float = 0.0  # exponentially weighted
+    signals: Dict[str, int] = field(default_factory=dict)
+
+    @property
+    def acceptance(self) -> float:
+        return self.accepted / self.n if self.n else 0.0
+
+    def observe(self, ok: bool, elapsed: float, tokens: int, signals: Iterable[str], alpha: float) -> None:
+        self.n += 1
+        self.accepted += bool(ok)
+        # the first samples are averaged plainly; afterwards older ones decay
+        w = max(alpha, 1.0 / self.n)
+        self.latency_s += w * (elapsed - self.latency_s)
+        self.tokens += w * (tokens - self.tokens)
+        for s in set(signals):
+            self.signals[s] = self.signals.get(s, 0) + 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"n": self.n, "acceptance": round(self.acceptance, 3), "latency_s": round(self.latency_s, 3),
+                "tokens": round(self.tokens, 1),
+                "signal_rates": {s: round(c / self.n, 3) for s, c in sorted(self.signals.items())}}
+
+
+@dataclass(frozen=True)
+class RouteDecision:
+    """Where to start in a chain and why; ``explain()`` goes into curate responses."""
+
+    start: int
+    mode: str  # static | adaptive | explore
+    reason: str
+    estimates: Tuple[Dict[str, Any], ...] = ()
+
+    def explain(self, chain: Sequence[str]) -> Dict[str, Any]:
+        return {"mode": self.mode, "start": chain[self.start] if chain else None, "skipped": list(chain[:self.start]),
+                "reason": self.reason, "estimates": list(self.estimates)}
+
+
+class AdaptiveRouter:
+    def __init__(self, escalate_on: Iterable[str] = (), *, enabled: bool = False, quality_floor: float = 0.9,
+                 min_samples: int = 20, explore: float = 0.05, token_cost_s: float = 0.0, alpha: float = 0.05,
+                 seed: int | None = None):
+        if not 0.0 <= explore <= 1.0:
+            raise ValueError("explore must be between 0 and 1")
+        self.escalate_on = frozenset(escalate_on)
+        self.enabled = enabled
+        self.quality_floor = float(quality_floor)
+        self.min_samples = max(1, int(min_samples))
+        self.explore = float(explore)
+        self.token_cost_s = float(token_cost_s)
+        self.alpha = float(alpha)
+        self._rng = random.Random(seed)
+        self.stats: Dict[Tuple[str, str], ArmStats] = {}
+        self.decisions: Dict[str, int] = {"static": 0, "adaptive": 0, "explore": 0}
+
+    @classmethod
+    def from_config(cls, routing_cfg: dict) -> AdaptiveRouter:
+        """Build from the ``adaptive`` section of configs/routing.yml (off when absent)."""
+        node = routing_cfg.get("adaptive") or {}
+        return cls((routing_cfg.get("defaults") or {}).get("escalate_on") or (),
+                   enabled=bool(node.get("enabled", False)),
+                   quality_floor=float(node.get("quality_floor", 0.9)),
+                   min_samples=int(node.get("min_samples", 20)),
+                   explore=float(node.get("explore", 0.05)),
+                   token_cost_s=float(node.get("token_cost_s", 0.0)),
+                   alpha=float(node.get("alpha", 0.05)),
+                   seed=node.get("seed"))
+
+    # ------------------------------------------------------------------
+    # statistics
+    def acceptable(self, ok: bool, signals: Iterable[str]) -> bool:
+        return bool(ok) and not any(s in self.escalate_on for s in signals)
+
+    def observe(self, task_family: str, model: str, ok: bool, signals: Sequence[str] = (),
+                elapsed: float = 0.0, tokens: int = 0) -> None:
+        """Record one attempt of ``model`` (Ollama name) on ``task_family``."""
+        arm = self.stats.setdefault((task_family, model), ArmStats())
+        arm.observe(self.acceptable(ok, signals), elapsed, tokens, signals, self.alpha)
+
+    def observe_run(self, record: dict) -> bool:
+        """Record a run-log entry, as :meth:`observe` would have seen it live.
+
+        Skipped: cache hits, coalesced followers (the leader's record already
+        counts the generation), map-reduce summaries (their chunks are logged
+        one by one) and records without timings.
+        """
+        family, model, winner = record.get("task_family"), record.get("model"), record.get("winner")
+        if not family or not model or not isinstance(winner, dict):
+            return False
+        if record.get("cache") == "hit" or record.get("coalesced") or record.get("mode") == "map_reduce":
+            return False
+        elapsed = record.get("elapsed")
+        if elapsed is None:  # older records: the slowest candidate bounds the call
+            elapsed = max((c.get("elapsed") or 0.0 for c in record.get("candidates") or ()), default=None)
+        if elapsed is None:
+            return False
+        signals = winner.get("signals") or []
+        self.observe(family, model, bool(winner.get("ok")), signals, float(elapsed), int(record.get("tokens") or 0))
+        return True
+
+    def load_runs(self, records: Iterable[dict]) -> int:
+        """Replay run-log records (oldest first); returns how many were used."""
+        return sum(self.observe_run(rec) for rec in records)
+
+    @staticmethod
+    def recent_days(days: int, now: datetime | None = None) -> set[str]:
+        """``YYYYMMDD`` names of the last ``days`` UTC days, for ``iter_runs(days=...)``."""
+        now = now or datetime.now(timezone.utc)
+        return {(now - timedelta(days=i)).strftime("%Y%m%d") for i in range(max(1, days))}
+
+    # ------------------------------------------------------------------
+    # decisions
+    def _cost(self, arm: ArmStats) -> float:
+        return arm.latency_s + self.token_cost_s * arm.tokens
+
+    def plan(self, task_family: str, chain: Sequence[str], eligible: Sequence[bool] | None = None) -> RouteDecision:
+        """The exploit decision for ``chain`` (Ollama names, initial model first).
+
+        ``eligible`` marks the positions that may be a start, e.g. the models
+        whose context window fits the input; position 0 always may.
+        """
+        if len(chain) < 2:
+            return RouteDecision(0, "static", "single-model chain")
+        arms = [self.stats.get((task_family, m)) for m in chain]
+        # expected cost and quality of starting at each position, computed from the end of the chain
+        expected: List[float | None] = [None] * len(chain)
+        quality: List[float | None] = [None] * len(chain)
+        tail_cost, tail_miss = 0.0, 1.0
+        for i in range(len(chain) - 1, -1, -1):
+            arm = arms[i]
+            if arm is None or arm.n < self.min_samples:
+                break
+            tail_cost = self._cost(arm) + (1.0 - arm.acceptance) * tail_cost
+            tail_miss *= 1.0 - arm.acceptance
+            expected[i], quality[i] = tail_cost, 1.0 - tail_miss
+        estimates = tuple(
+            {"model": m, "n": a.n if a else 0, "acceptance": round(a.acceptance, 3) if a else None,
+             "latency_s": round(a.latency_s, 3) if a else None,
+             "expected_s": round(e, 3) if e is not None else None, "quality": round(q, 3) if q is not None else None}
+            for m, a, e, q in zip(chain, arms, expected, quality))
+        if expected[0] is None:
+            thin = next(m for m, a in zip(chain, arms) if a is None or a.n < self.min_samples)
+            return RouteDecision(0, "static", f"fewer than {self.min_samples} samples for {thin}", estimates)
+        ok = {i: e for i, (e, q) in enumerate(zip(expected, quality))
+              if e is not None and q is not None and q >= self.quality_floor and (not i or eligible is None or eligible[i])}
+        if not ok:
+            return RouteDecision(0, "static", f"no start reaches quality floor {self.quality_floor}", estimates)
+        best = min(ok, key=lambda i: (ok[i], i))
+        if best == 0:
+            return RouteDecision(0, "static", "initial model has the lowest expected latency", estimates)
+        return RouteDecision(best, "adaptive",
+                             f"starting at {chain[best]}: expected {expected[best]:.2f}s vs {expected[0]:.2f}s "
+                             f"from {chain[0]} (quality {quality[best]:.3f} >= {self.quality_floor})", estimates)
+
+    def choose(self, task_family: str, chain: Sequence[str], eligible: Sequence[bool] | None = None) -> RouteDecision:
+        """:meth:`plan`, with an ``explore`` chance of starting earlier than planned (at an eligible position)."""
+        decision = (self.plan(task_family, chain, eligible) if self.enabled
+                    else RouteDecision(0, "static", "adaptive routing off"))
+        if decision.start > 0 and self._rng.random() < self.explore:
+            earlier = [i for i in range(decision.start) if not i or eligible is None or eligible[i]]
+            start = earlier[self._rng.randrange(len(earlier))]
+            decision = RouteDecision(start, "explore", f"exploring {chain[start]} (planned start {chain[decision.start]})",
+                                     decision.estimates)
+        self.decisions[decision.mode] += 1
+        return decision
+
+    def snapshot(self) -> Dict[str, Any]:
+        families: Dict[str, Dict[str, Any]] = {}
+        for (family, model), arm in sorted(self.stats.items()):
+            families.setdefault(family, {})[model] = arm.snapshot()
+        return {"enabled": self.enabled, "decisions": dict(self.decisions), "families": families}
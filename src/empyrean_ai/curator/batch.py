@@ -0,0 +1,276 @@
+"""Bulk curation of JSONL workloads.
+
+:func:`run_batch` pushes many items through an async ``process`` callable
+with a bounded number in flight. Results are yielded in completion order.
+Items are read in windows from a plain or async iterable, so an upload can
+be processed while it is still arriving. Within each window they are grouped
+by a key (task family and model) so runs of the same model reach the
+scheduler together. Per-model limits and queueing are still the scheduler's
+job.
+
+:class:`Checkpoint` appends every finished line to a JSONL file and lets a
+restarted job skip items whose results are already recorded.
+:class:`BatchProgress` tracks throughput and ETA.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import time
+from dataclasses import dataclass, field
+from itertools import islice
+from pathlib import Path
+from typing import (Any, AsyncIterable, AsyncIterator, Awaitable, Callable, Collection, Dict, Hashable, Iterable,
+                    Iterator, List)
+
+__all__ = ["BadLine", "BatchProgress", "Checkpoint", "aiter_lines", "aread_items", "count_lines", "item_id",
+           "read_items", "run_batch"]
+
+Process = Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]]
+
+
+@dataclass(frozen=True)
+class BadLine:
+    """A malformed input line; :func:`run_batch` reports it as an ``error`` line."""
+
+    id: Any
+    error: str
+
+
+Item = Dict[str, Any] | BadLine
+
+
+def item_id(item: Dict[str, Any]) -> str:
+    """The item's ``id`` (or ``request_id``) as a string; ``read_items`` fills in line numbers."""
+    return str(item.get("id", item.get("request_id")))
+
+
+def _parse(n: int, line: str | bytes) -> Dict[str, Any]:
+    try:
+        item = json.loads(line)
+    except json.JSONDecodeError as exc:
+        raise ValueError(f"line {n}: invalid JSON ({exc.msg})") from None
+    if not isinstance(item, dict) or not isinstance(item.get("input"), str):
+        raise ValueError(f"line {n}: expected an object with a string 'input'")
+    if "id" not in item and "request_id" not in item:
+        item["id"] = n
+    return item
+
+
+def _read_one(n: int, line: str | bytes, errors: str) -> Item:
+    try:
+        return _parse(n, line)
+    except ValueError as exc:
+        if errors != "report":
+            raise
+        try:  # keep the caller's id when the line is an object, just not a valid item
+            obj = json.loads(line)
+        except json.JSONDecodeError:
+            obj = None
+        ident = obj.get("id", obj.get("request_id", n)) if isinstance(obj, dict) else n
+        return BadLine(ident, str(exc))
+
+
+def read_items(lines: Iterable[str | bytes], errors: str = "raise") -> Iterator[Item]:
+    """Parse JSONL lines, skipping blanks. Items without an id get their 1-based line number.
+
+    A malformed line raises ``ValueError``, or with ``errors="report"`` is
+    yielded as a :class:`BadLine` so the rest of the batch still runs.
+    """
+    for n, line in enumerate(lines, start=1):
+        if line.strip():
+            yield _read_one(n, line, errors)
+
+
+async def aread_items(lines: AsyncIterable[str | bytes], errors: str = "raise") -> AsyncIterator[Item]:
+    """:func:`read_items` over an async iterable of lines."""
+    n = 0
+    async for line in lines:
+        n += 1
+        if line.strip():
+            yield _read_one(n, line, errors)
+
+
+async def aiter_lines(chunks: AsyncIterable[bytes]) -> AsyncIterator[bytes]:
+    """Split a byte stream (e.g. a request body) into lines without reading all of it first."""
+    buf = b""
+    async for chunk in chunks:
+        buf += chunk
+        *lines, buf = buf.split(b"\n")
+        for line in lines:
+            yield line
+    if buf:
+        yield buf
+
+
+@dataclass
+class BatchProgress:
+    """Counts and throughput for a running batch; ``total`` counts every item, including skipped ones."""
+
+    total: int | None = None
+    done: int = 0
+    failed: int = 0
+    skipped: int = 0
+    started: float = field(default_factory=time.monotonic)
+
+    def record(self, line: Dict[str, Any]) -> None:
+        if line.get("event") == "error":
+            self.failed += 1
+        else:
+            self.done += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        elapsed = time.monotonic() - self.started
+        finished = self.done + self.failed
+        rate = finished / elapsed if elapsed > 0 else 0.0
+        out: Dict[str, Any] = {"done": self.done, "failed": self.failed, "skipped": self.skipped,
+                               "elapsed_s": round(elapsed, 1), "items_per_s": round(rate, 3)}
+        if self.total is not None:
+            remaining = max(0, self.total - self.skipped - finished)
+            out["total"] = self.total
+            out["remaining"] = remaining
+            out["eta_s"] = round(remaining / rate, 1) if rate > 0 else None
+        return out
+
+
+class Checkpoint:
+    """Append-only JSONL record of finished items.
+
+    Items that ended in an ``error`` line are not counted as done, so a
+    restart retries them.
+    """
+
+    def __init__(self, path: Path, resume: bool = True):
+        self.path = Path(path)
+        self.done: set[str] = set()
+        if resume and self.path.is_file():
+            with self.path.open("rb") as f:
+                for raw in f:
+                    try:
+                        line = json.loads(raw)
+                    except json.JSONDecodeError:
+                        continue  # a line cut short by a crash; that item runs again
+                    if line.get("event") == "result":
+                        self.done.add(str(line.get("id")))
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        torn = False
+        if resume and self.path.is_file() and self.path.stat().st_size:
+            with self.path.open("rb") as f:
+                f.seek(-1, 2)
+                torn = f.read(1) != b"\n"
+        self._f = self.path.open("a" if resume else "w", encoding="utf-8")
+        if torn:
+            self._f.write("\n")  # terminate a line cut short by a crash
+
+    def record(self, line: Dict[str, Any]) -> None:
+        self._f.write(json.dumps(line, ensure_ascii=False) + "\n")
+        self._f.flush()  # a crash loses at most the line being written
+        if line.get("event") == "result":
+            self.done.add(str(line.get("id")))
+
+    def close(self) -> None:
+        self._f.close()
+
+    def __enter__(self) -> Checkpoint:
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.close()
+
+
+async def run_batch(items: Iterable[Item] | AsyncIterable[Item], process: Process, *,
+                    key: Callable[[Dict[str, Any]], Hashable] | None = None, max_in_flight: int = 16,
+                    window: int = 256, done: Collection[str] = (),
+                    progress: BatchProgress | None = None,
+                    prepare: Callable[[List[Dict[str, Any]]], None] | None = None) -> AsyncIterator[Dict[str, Any]]:
+    """Run ``process`` over ``items`` and yield one line per item as it finishes.
+
+    Lines are ``{"event": "result", "id": ..., **output}``, or
+    ``{"event": "error", "id": ..., "error": ...}`` when ``process`` raises
+    or the item is a :class:`BadLine`; one failing item never stops the
+    batch. Ids in ``done`` are skipped. ``items`` may be an async iterable;
+    it is read one window at a time. ``key`` groups each window of
+    ``window`` items, for example by ``(task_family, model)``. ``prepare``
+    is called with each window's items before they are keyed, e.g. to
+    classify them in one batch.
+    """
+    if max_in_flight < 1:
+        raise ValueError("max_in_flight must be >= 1")
+    source: Iterator[Item] | AsyncIterator[Item] = aiter(items) if isinstance(items, AsyncIterable) else iter(items)
+    queued: list[Item] = []
+    pending: set[asyncio.Task[Dict[str, Any]]] = set()
+
+    async def read_window() -> list[Item]:
+        if isinstance(source, Iterator):
+            return list(islice(source, window))
+        chunk: list[Item] = []
+        while len(chunk) < window:
+            try:
+                chunk.append(await anext(source))
+            except StopAsyncIteration:
+                break
+        return chunk
+
+    async def refill() -> bool:
+        chunk = await read_window()
+        bad = [it for it in chunk if isinstance(it, BadLine)]
+        fresh = [it for it in chunk if not isinstance(it, BadLine) and item_id(it) not in done]
+        if progress is not None:
+            progress.skipped += len(chunk) - len(bad) - len(fresh)
+        if prepare is not None and fresh:
+            prepare(fresh)
+        if key is not None:
+            groups: Dict[Hashable, list] = {}
+            for it in fresh:
+                try:
+                    k = key(it)
+                except Exception:  # e.g. an unknown model: process() reports it for this item
+                    k = None
+                groups.setdefault(k, []).append(it)
+            fresh = [it for group in groups.values() for it in group]  # first-seen group order
+        queued.extend(reversed([*bad, *fresh]))  # popped from the end
+        return bool(chunk)
+
+    async def one(item: Item) -> Dict[str, Any]:
+        if isinstance(item, BadLine):
+            return {"event": "error", "id": item.id, "error": item.error}
+        try:
+            return {"event": "result", "id": item.get("id", item.get("request_id")), **await process(item)}
+        except Exception as exc:
+            return {"event": "error", "id": item.get("id", item.get("request_id")),
+                    "error": f"{type(exc).__name__}: {exc}"}
+
+    more = True
+    try:
+        while True:
+            while len(pending) < max_in_flight and (queued or more):
+                if not queued:
+                    more = await refill()
+                    continue
+                pending.add(asyncio.create_task(one(queued.pop())))
+            if not pending:
+                return
+            finished, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in finished:
+                line = task.result()
+                if progress is not None:
+                    progress.record(line)
+                yield line
+    finally:
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+        aclose = getattr(source, "aclose", None)
+        if aclose is not None:
+            await aclose()
+
+
+def count_lines(path: Path) -> int:
+    """Number of non-blank lines in ``path`` (the item count of a JSONL file)."""
+    n = 0
+    with Path(path).open("rb") as f:
+        for line in f:
+            n += bool(line.strip())
+    return n
@@ -0,0 +1,237 @@
+"""Content-addressed cache for validated curate results.
+
+Entries are keyed by a SHA-256 over the task family, the rendered prompt, the
+Ollama model name and the resolved decoding options, so any change to the
+template, input, model or sampling parameters produces a new key. Only
+validated outputs are stored (the engine decides what qualifies).
+
+Two layers are available: an in-memory LRU with TTL, optionally backed by a
+SQLite file that survives restarts. Lookups try memory first and promote disk
+hits into memory. Async callers use :meth:`ResponseCache.aget` and
+:meth:`ResponseCache.aput`, which run the SQLite work on a worker thread so
+disk I/O never stalls the event loop.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Tuple
+
+__all__ = ["cache_key", "MemoryCache", "SQLiteCache", "ResponseCache"]
+
+
+def cache_key(task_family: str, prompt: str, model: str, options: dict) -> str:
+    """Stable hex digest for one curate call."""
+    h = hashlib.sha256()
+    for part in (task_family, model, json.dumps(options, sort_keys=True, separators=(",", ":"))):
+        h.update(part.encode("utf-8"))
+        h.update(b"\0")
+    h.update(prompt.encode("utf-8"))
+    return h.hexdigest()
+
+
+class MemoryCache:
+    """LRU mapping with a per-entry TTL (``ttl <= 0`` disables expiry)."""
+
+    def __init__(self, max_entries: int = 1024, ttl: float = 3600.0):
+        if max_entries < 1:
+            raise ValueError("max_entries must be >= 1")
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.evictions = 0
+        self.expirations = 0
+        self._data: OrderedDict[str, Tuple[float, Any]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: str) -> Any | None:
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        expires, value = entry
+        if expires and expires < time.time():
+            del self._data[key]
+            self.expirations += 1
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    def put(self, key: str, value: Any, expires: float | None = None) -> None:
+        if expires is None:
+            expires = time.time() + self.ttl if self.ttl > 0 else 0.0
+        self._data[key] = (expires, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self) -> None:
+        self._data.clear()
+
+
+class SQLiteCache:
+    """On-disk JSON values in a single SQLite table, LRU-trimmed by access time.
+
+    Safe to call from worker threads; one lock serializes use of the connection.
+    """
+
+    def __init__(self, path: Path, max_entries: int = 100_000, ttl: float = 86400.0):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.evictions = 0
+        self.expirations = 0
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY, value TEXT NOT NULL, expires REAL NOT NULL, accessed REAL NOT NULL)"
+        )
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._count()
+
+    def _count(self) -> int:
+        return int(self._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0])
+
+    def get(self, key: str) -> Tuple[float, Any] | None:
+        with self._lock:
+            return self._get(key)
+
+    def _get(self, key: str) -> Tuple[float, Any] | None:
+        row = self._db.execute("SELECT value, expires FROM responses WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        value, expires = row
+        now = time.time()
+        if expires and expires < now:
+            self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self.expirations += 1
+            return None
+        self._db.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+        return expires, json.loads(value)
+
+    def put(self, key: str, value: Any) -> float:
+        with self._lock:
+            return self._put(key, value)
+
+    def _put(self, key: str, value: Any) -> float:
+        now = time.time()
+        expires = now + self.ttl if self.ttl > 0 else 0.0
+        self._db.execute(
+            "INSERT OR REPLACE INTO responses (key, value, expires, accessed) VALUES (?, ?, ?, ?)",
+            (key, json.dumps(value, ensure_ascii=False), expires, now),
+        )
+        excess = self._count() - self.max_entries
+        if excess > 0:
+            self._db.execute(
+                "DELETE FROM responses WHERE key IN (SELECT key FROM responses ORDER BY accessed ASC LIMIT ?)",
+                (excess,),
+            )
+            self.evictions += excess
+        return expires
+
+    def clear(self) -> None:
+        with self._lock:
+            self._db.execute("DELETE FROM responses")
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+
+class ResponseCache:
+    """Memory LRU in front of an optional SQLite store, with hit/miss counters."""
+
+    def __init__(self, memory: MemoryCache, disk: SQLiteCache | None = None):
+        self.memory = memory
+        self.disk = disk
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+
+    @classmethod
+    def from_config(cls, runtime_cfg: dict | None, base_dir: Path) -> ResponseCache | None:
+        """Build the cache from the ``cache`` section of configs/runtime.yml (None if disabled)."""
+        node: Dict[str, Any] = (runtime_cfg or {}).get("cache") or {}
+        if not node.get("enabled", False):
+            return None
+        ttl = float(node.get("ttl_seconds", 3600))
+        memory = MemoryCache(int(node.get("max_entries", 1024)), ttl)
+        disk = None
+        if node.get("backend", "memory") == "sqlite":
+            path = Path(node.get("path", "data/cache/responses.sqlite3"))
+            disk = SQLiteCache(path if path.is_absolute() else base_dir / path,
+                               int(node.get("disk_max_entries", 100_000)), ttl)
+        return cls(memory, disk)
+
+    def get(self, key: str) -> Any | None:
+        value = self.memory.get(key)
+        if value is None and self.disk is not None:
+            value = self._promote(key, self.disk.get(key))
+        return self._counted(value)
+
+    async def aget(self, key: str) -> Any | None:
+        """:meth:`get` with the disk lookup on a worker thread."""
+        value = self.memory.get(key)
+        if value is None and self.disk is not None:
+            value = self._promote(key, await asyncio.to_thread(self.disk.get, key))
+        return self._counted(value)
+
+    def _promote(self, key: str, hit: Tuple[float, Any] | None) -> Any | None:
+        if hit is None:
+            return None
+        expires, value = hit
+        self.memory.put(key, value, expires)
+        return value
+
+    def _counted(self, value: Any | None) -> Any | None:
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def put(self, key: str, value: Any) -> None:
+        expires = self.disk.put(key, value) if self.disk is not None else None
+        self.memory.put(key, value, expires)
+        self.stores += 1
+
+    async def aput(self, key: str, value: Any) -> None:
+        """:meth:`put` with the disk write on a worker thread."""
+        expires = await asyncio.to_thread(self.disk.put, key, value) if self.disk is not None else None
+        self.memory.put(key, value, expires)
+        self.stores += 1
+
+    def clear(self) -> None:
+        self.memory.clear()
+        if self.disk is not None:
+            self.disk.clear()
+
+    def close(self) -> None:
+        if self.disk is not None:
+            self.disk.close()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": (self.hits / lookups) if lookups else 0.0,
+            "stores": self.stores,
+            "evictions": self.memory.evictions + (self.disk.evictions if self.disk else 0),
+            "expirations": self.memory.expirations + (self.disk.expirations if self.disk else 0),
+            "memory_entries": len(self.memory),
+            "disk_entries": len(self.disk) if self.disk is not None else None,
+        }
@@ -0,0 +1,140 @@
+"""Config-driven keyword classifier for task families.
+
+Every keyword of every family is compiled into one regex, factored as a
+trie so each position tries one branch per distinct first letter. A text is
+lowercased and scanned once, however many keywords are configured.
+Each family's score is the sum of the weights of its distinct keywords found
+in the text. The highest score wins; ties go to the family with the lower
+``priority``, and texts scoring below ``min_score`` get the ``default``
+family.
+
+Keywords match at the start of a word ("implement" also matches
+"implementation" but "bug" does not match "debug"). Long inputs are not
+scanned in full. Only the first and last ``window_chars`` characters are
+scanned, plus ``sample_blocks`` evenly spaced blocks of ``sample_chars``
+from the middle. The cost is therefore bounded whatever the input size.
+"""
+
+from __future__ import annotations
+
+import re
+from typing import Any, Dict, List, Mapping, Pattern, Tuple
+
+__all__ = ["KeywordClassifier", "DEFAULT_FAMILIES"]
+
+#: Used when configs/routing.yml has no ``classifier`` section; the keyword
+#: lists of the original first-match classifier, in its order.
+DEFAULT_FAMILIES: Mapping[str, Mapping[str, object]] = {
+    "bug_triage": {"priority": 0, "keywords": ["bug", "stack trace", "traceback", "exception"]},
+    "code_assist": {"priority": 1, "keywords": ["diff", "implement", "code", "function", "class "]},
+    "design_rfc": {"priority": 2, "keywords": ["design", "rfc", "architecture", "trade-off", "tradeoff"]},
+    "extraction": {"priority": 3, "keywords": ["extract", "fields", "json only", "key:"]},
+    "creative": {"priority": 4, "keywords": ["story", "blog", "creative"]},
+}
+
+
+def _trie_pattern(node: Dict[str, dict]) -> str:
+    """Regex source for a character trie; ``""`` marks the end of a keyword."""
+    alts = [re.escape(ch) + _trie_pattern(child) for ch, child in sorted(node.items()) if ch]
+    if not alts:
+        return ""
+    if "" in node:  # a keyword ends here and longer ones continue; greedy ``?`` prefers the longer
+        return "(?:" + "|".join(alts) + ")?"
+    return alts[0] if len(alts) == 1 else "(?:" + "|".join(alts) + ")"
+
+
+class KeywordClassifier:
+    """Weighted multi-keyword scoring over one compiled pattern."""
+
+    def __init__(self, families: Mapping[str, Mapping[str, object]], default: str = "analytical",
+                 min_score: float = 1.0, window_chars: int = 2048, sample_blocks: int = 8,
+                 sample_chars: int = 256):
+        self.default = default
+        self.min_score = float(min_score)
+        self.window_chars = int(window_chars)
+        self.sample_blocks = int(sample_blocks)
+        self.sample_chars = int(sample_chars)
+        self.priority: Dict[str, int] = {}
+        # lowercased keyword -> [(family, weight), ...]
+        self.weights: Dict[str, List[Tuple[str, float]]] = {}
+        for i, (family, node) in enumerate(families.items()):
+            self.priority[family] = int(node.get("priority", i))  # type: ignore[call-overload]
+            keywords = node.get("keywords") or {}
+            weighted: Mapping[Any, Any]
+            if isinstance(keywords, Mapping):
+                weighted = keywords
+            elif isinstance(keywords, (list, tuple, set)):
+                weighted = dict.fromkeys(keywords, 1.0)  # a plain list weighs 1.0 per keyword
+            else:
+                raise ValueError(f"keywords for {family!r} must be a mapping or a list")
+            for kw, weight in weighted.items():
+                kw = str(kw).lower()
+                if kw:
+                    self.weights.setdefault(kw, []).append((family, float(weight)))
+        trie: Dict[str, dict] = {}
+        for kw in self.weights:
+            node = trie
+            for ch in kw:
+                node = node.setdefault(ch, {})
+            node[""] = {}
+        self.pattern: Pattern[str] | None = re.compile(_trie_pattern(trie)) if trie else None
+
+    @classmethod
+    def from_config(cls, node: Mapping[str, object] | None) -> KeywordClassifier:
+        """Build from the ``classifier`` section of configs/routing.yml (defaults when absent)."""
+        node = node or {}
+        return cls(node.get("families") or DEFAULT_FAMILIES,  # type: ignore[arg-type]
+                   default=str(node.get("default", "analytical")),
+                   min_score=float(node.get("min_score", 1.0)),  # type: ignore[arg-type]
+                   window_chars=int(node.get("window_chars", 2048)),  # type: ignore[call-overload]
+                   sample_blocks=int(node.get("sample_blocks", 8)),  # type: ignore[call-overload]
+                   sample_chars=int(node.get("sample_chars", 256)))  # type: ignore[call-overload]
+
+    def spans(self, n: int) -> List[Tuple[int, int]]:
+        """``(start, end)`` ranges scanned in a text of length ``n``."""
+        w = self.window_chars
+        budget = 2 * w + self.sample_blocks * self.sample_chars
+        if w <= 0 or n <= budget:
+            return [(0, n)]
+        out = [(0, w)]
+        middle = n - 2 * w
+        if self.sample_blocks > 0 and self.sample_chars > 0:
+            step = middle / self.sample_blocks
+            for i in range(self.sample_blocks):
+                start = w + int(step * i + (step - self.sample_chars) / 2)
+                out.append((start, start + self.sample_chars))
+        out.append((n - w, n))
+        return out
+
+    def scores(self, text: str) -> Dict[str, float]:
+        """Score per family with at least one keyword in the scanned part of ``text``."""
+        if self.pattern is None:
+            return {}
+        found = set()
+        finditer = self.pattern.finditer
+        for start, end in self.spans(len(text)):
+            chunk = text[start:end].lower()
+            for m in finditer(chunk):
+                i = m.start()
+                # keywords match at word starts only; checked here because ``\b`` slows every position
+                if i and (chunk[i - 1].isalnum() or chunk[i - 1] == "_") and m.group(0)[0].isalnum():
+                    continue
+                found.add(m.group(0))
+        scores: Dict[str, float] = {}
+        for kw in found:
+            for family, weight in self.weights.get(kw, ()):
+                scores[family] = scores.get(family, 0.0) + weight
+        return scores
+
+    def predict(self, text: str) -> Tuple[str, float]:
+        """``(task_family, confidence)``; confidence is the winner's share of the total score."""
+        scores = self.scores(text)
+        if not scores:
+            return self.default, 0.0
+        best = min(scores, key=lambda f: (-scores[f], self.priority.get(f, len(self.priority))))
+        if scores[best] < self.min_score:
+            return self.default, 0.0
+        return best, scores[best] / sum(scores.values())
+
+    def classify(self, text: str) -> str:
+        return self.predict(text)[0]
@@ -0,0 +1,261 @@
+"""Token-budgeted prompt packing.
+
+Every model in configs/models.yml declares a ``context_max``; ``context_caps``
+in configs/decoding.yml caps it further unless long-context models are
+allowed. :class:`ContextPacker` keeps rendered prompts within that window,
+less the ``max_new_tokens`` reserved for the reply. Oversized input is trimmed
+on line boundaries, keeping its head and tail, or split into chunks. Both are
+deterministic.
+
+Token counts come from :class:`TokenEstimator`, a tokenizer-free
+approximation calibrated per model family (``context_caps.chars_per_token``).
+It is cheap enough to run on every request and errs on the high side for
+prose and code.
+"""
+
+from __future__ import annotations
+
+import math
+import re
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterator, List, Sequence, Tuple
+
+__all__ = ["TokenEstimator", "ContextPacker", "Packed"]
+
+_WORD_RE = re.compile(r"\w+|[^\w\s]")
+_PASSAGES_HEADER = "\n\nReference excerpts (retrieved from local files; may be partial):\n"
+_TRIM_MARKER = "\n[... {n} lines omitted to fit the context window ...]\n"
+
+
+class TokenEstimator:
+    """Approximate BPE token counts without loading a tokenizer.
+
+    A word counts as ``ceil(len / chars_per_token)`` tokens, with at least
+    one per word. Each punctuation character counts as one token.
+    """
+
+    def __init__(self, chars_per_token: float = 4.0):
+        if chars_per_token <= 0:
+            raise ValueError("chars_per_token must be > 0")
+        self.chars_per_token = chars_per_token
+
+    def count(self, text: str) -> int:
+        cpt = self.chars_per_token
+        return sum(math.ceil(len(w) / cpt) for w in _WORD_RE.findall(text))
+
+    def chars_for(self, tokens: int) -> int:
+        """A character count that stays within ``tokens`` for ordinary text."""
+        return max(1, int(tokens * self.chars_per_token * 0.8))
+
+
+@dataclass(frozen=True)
+class Packed:
+    """A prompt fitted to a model's window."""
+
+    prompt: str
+    input_tokens: int
+    prompt_tokens: int
+    budget: int
+    trimmed: bool = False
+    omitted_lines: int = 0
+    passages: int = 0
+
+
+class ContextPacker:
+    """Fit prompts into model context windows.
+
+    ``windows`` maps model keys and Ollama names to ``(context_max, family)``.
+    ``cap`` is the window used when ``long_context`` is off. ``margin`` tokens
+    are held back to absorb estimation error.
+    """
+
+    def __init__(self, windows: Dict[str, Tuple[int, str]], chars_per_token: Dict[str, float] | None = None,
+                 cap: int | None = None, long_context: bool = True, margin: int = 256, memo_size: int = 256):
+        self.windows = dict(windows)
+        self.chars_per_token = dict(chars_per_token or {})
+        self.cap = cap
+        self.long_context = long_context
+        self.margin = max(0, margin)
+        self._estimators: Dict[str, TokenEstimator] = {}
+        # template overheads repeat on every request; memoise their counts
+        self._memo: OrderedDict[Tuple[str, str], int] = OrderedDict()
+        self._memo_size = memo_size
+
+    @classmethod
+    def from_config(cls, cfg: dict) -> ContextPacker:
+        """Build from the ``models`` and ``decoding`` configs."""
+        windows: Dict[str, Tuple[int, str]] = {}
+        for key, m in (cfg["models"].get("models") or {}).items():
+            entry = (int(m["context_max"]), m.get("family", "default"))
+            windows[key] = windows[m["ollama_name"]] = entry
+        caps = cfg["decoding"].get("context_caps") or {}
+        cap = caps.get("default")
+        return cls(
+            windows,
+            caps.get("chars_per_token"),
+            int(cap) if cap is not None else None,
+            bool(caps.get("long_context_models", True)),
+            int(caps.get("margin_tokens", 256)),
+        )
+
+    # ------------------------------------------------------------------
+    def family(self, model: str) -> str:
+        return self.windows.get(model, (0, "default"))[1]
+
+    def chars_per_token_for(self, model: str) -> float:
+        """The token estimator's ratio for a model key or Ollama name (``context_caps.chars_per_token``)."""
+        return self.estimator(self.family(model)).chars_per_token
+
+    def estimator(self, family: str) -> TokenEstimator:
+        est = self._estimators.get(family)
+        if est is None:
+            ratio = self.chars_per_token.get(family, self.chars_per_token.get("default", 4.0))
+            est = self._estimators[family] = TokenEstimator(float(ratio))
+        return est
+
+    def count(self, text: str, family: str = "default") -> int:
+        return self.estimator(family).count(text)
+
+    def _count_memo(self, text: str, family: str) -> int:
+        key = (family, text)
+        n = self._memo.get(key)
+        if n is None:
+            n = self._memo[key] = self.count(text, family)
+            while len(self._memo) > self._memo_size:
+                self._memo.popitem(last=False)
+        else:
+            self._memo.move_to_end(key)
+        return n
+
+    def window(self, model: str) -> int:
+        """Usable context window for a model key or Ollama name."""
+        context_max = self.windows.get(model, (0, "default"))[0]
+        if not context_max:
+            # unknown model: assume the conservative default window
+            return self.cap if self.cap is not None else 1 << 30
+        if self.long_context or self.cap is None:
+            return context_max
+        return min(context_max, self.cap)
+
+    def budget(self, model: str, max_new_tokens: int = 0) -> int:
+        """Prompt tokens available on ``model`` after reserving the reply and margin."""
+        return max(0, self.window(model) - int(max_new_tokens) - self.margin)
+
+    def fits(self, model: str, tokens: int, max_new_tokens: int = 0) -> bool:
+        return tokens <= self.budget(model, max_new_tokens)
+
+    # ------------------------------------------------------------------
+    def pack(self, render: Callable[[str], str], user_input: str, model: str, max_new_tokens: int = 0,
+             passages: Sequence[str] = (), passage_tokens: int | None = None) -> Packed:
+        """Render ``user_input`` with ``render``, trimming it to fit ``model``.
+
+        ``render`` maps input text to the full prompt, e.g. a bound
+        ``TemplateLibrary.render``. ``passages`` (best first) are appended
+        after the input while they fit in the remaining budget. That budget is
+        capped at ``passage_tokens`` when given. The input is never trimmed to
+        make room for them.
+        """
+        family = self.family(model)
+        budget = self.budget(model, max_new_tokens)
+        overhead = self._count_memo(render(""), family)
+        tokens = self.count(user_input, family)
+        if overhead + tokens > budget:
+            text, omitted = self.trim(user_input, max(0, budget - overhead), family)
+            kept = self.count(text, family)
+            return Packed(render(text), kept, overhead + kept, budget, trimmed=True, omitted_lines=omitted)
+        room = budget - overhead - tokens
+        if passage_tokens is not None:
+            room = min(room, passage_tokens)
+        chosen: List[str] = []
+        extra = self.count(_PASSAGES_HEADER, family) if passages else 0
+        for passage in passages:
+            n = self.count(passage, family) + 1
+            if extra + n > room:
+                continue
+            chosen.append(passage)
+            extra += n
+        if not chosen:
+            return Packed(render(user_input), tokens, overhead + tokens, budget)
+        text = user_input + _PASSAGES_HEADER + "\n---\n".join(chosen)
+        return Packed(render(text), tokens + extra, overhead + tokens + extra, budget, passages=len(chosen))
+
+    def _segments(self, text: str, max_tokens: int, family: str) -> Iterator[Tuple[str, int]]:
+        """Lines with their token counts; lines over ``max_tokens`` are cut into pieces."""
+        est = self.estimator(family)
+        # quarter-window pieces keep trimming fine-grained on dense, punctuation-heavy text
+        step = max(1, est.chars_for(max_tokens) // 4)
+        for line in text.splitlines():
+            n = est.count(line)
+            if n <= max_tokens:
+                yield line, n
+                continue
+            stack = [line[i : i + step] for i in range(0, len(line), step)][::-1]
+            while stack:
+                piece = stack.pop()
+                n = est.count(piece)
+                if n > max_tokens and len(piece) > 1:
+                    half = len(piece) // 2
+                    stack += [piece[half:], piece[:half]]
+                    continue
+                yield piece, n
+
+    def trim(self, text: str, max_tokens: int, family: str = "default") -> Tuple[str, int]:
+        """Keep the head and tail of ``text`` within ``max_tokens``; returns ``(text, omitted_lines)``."""
+        if max_tokens <= 0:
+            return "", len(text.splitlines())
+        segs = list(self._segments(text, max_tokens, family))
+        marker_cost = self.count(_TRIM_MARKER.format(n=len(segs)), family)
+        room = max(0, max_tokens - marker_cost)
+        head: List[str] = []
+        tail: List[str] = []
+        used_head = used_tail = 0
+        lo, hi = 0, len(segs) - 1
+        # alternate head and tail so both ends of the document survive
+        while lo <= hi:
+            seg, n = segs[lo]
+            if used_head <= used_tail and used_head + used_tail + n <= room:
+                head.append(seg)
+                used_head += n
+                lo += 1
+                continue
+            seg, n = segs[hi]
+            if used_head + used_tail + n <= room:
+                tail.append(seg)
+                used_tail += n
+                hi -= 1
+                continue
+            break
+        omitted = hi - lo + 1
+        if omitted <= 0:
+            return "\n".join(head + tail[::-1]), 0
+        return "\n".join(head) + _TRIM_MARKER.format(n=omitted) + "\n".join(tail[::-1]), omitted
+
+    def split(self, text: str, max_tokens: int, family: str = "default", overlap: int = 0) -> List[str]:
+        """Cut ``text`` into chunks of at most ``max_tokens``, on line boundaries where possible.
+
+        ``overlap`` tokens' worth of trailing lines from each chunk are repeated
+        at the start of the next.
+        """
+        if max_tokens <= 0:
+            raise ValueError("max_tokens must be > 0")
+        overlap = min(max(0, overlap), max_tokens // 2)
+        chunks: List[str] = []
+        buf: List[Tuple[str, int]] = []
+        size = 0
+        for seg, n in self._segments(text, max_tokens, family):
+            if buf and size + n > max_tokens:
+                chunks.append("\n".join(s for s, _ in buf))
+                carry: List[Tuple[str, int]] = []
+                kept = 0
+                for s, m in reversed(buf):
+                    if kept + m > overlap or kept + m + n > max_tokens:
+                        break
+                    carry.append((s, m))
+                    kept += m
+                buf, size = carry[::-1], kept
+            buf.append((seg, n))
+            size += n
+        if buf:
+            chunks.append("\n".join(s for s, _ in buf))
+        return chunks
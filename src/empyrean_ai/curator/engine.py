@@ -1,10 +1,26 @@
 from __future__ import annotations
+import asyncio
+import functools
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
 from pathlib import Path
-from typing import Dict, Any, List, Tuple
+from typing import Dict, Any, Awaitable, Callable, List, Tuple, TypeVar
 from .templates import TemplateLibrary
-from empyrean_ai.post_validators import validate_output, ValidationResult
+from empyrean_ai.post_validators import validate_output, ValidationResult, IncrementalJSONValidator, get_schema_registry, parse_json_strict, salvage_json
 from empyrean_ai.evaluators import log_run, proxy_score, now_ts
+from empyrean_ai.runlog import RunLogWriter
 from .inference.ollama_client import OllamaClient
+from .cache import ResponseCache, cache_key
+from .singleflight import SingleFlight
+from .scheduler import DeadlineExceeded, ModelScheduler, Priority
+from .context import ContextPacker, Packed
+from .mapreduce import reduce_outputs
+from .inference.retrieval.bm25 import BM25Index, Hit
+from .inference.retrieval.dense import DenseIndex, reciprocal_rank_fusion
+from empyrean_ai import metrics
 
 def _decoding_for(task_family: str, decoding_cfg: dict) -> dict:
     """Resolve decoding parameters for a task family with clear errors.
@@ -49,6 +65,54 @@ def _decoding_for(task_family: str, decoding_cfg: dict) -> dict:
             base[k] = node[k]
     return base
 
+log = logging.getLogger(__name__)
+
+
+def _open_retriever(node: dict, base_dir: Path) -> BM25Index | None:
+    if not node.get("enabled", False):
+        return None
+    index_dir = Path(node.get("index_dir", "data/index"))
+    index_dir = index_dir if index_dir.is_absolute() else base_dir / index_dir
+    if not (index_dir / "meta.json").is_file():
+        log.warning("retrieval enabled but no index at %s; build one with 'aan index'", index_dir)
+        return None
+    return BM25Index(index_dir)
+
+
+def _open_dense(node: dict, retriever: BM25Index | None) -> DenseIndex | None:
+    if retriever is None or not (node.get("dense") or {}).get("enabled", False):
+        return None
+    dense_dir = retriever.dir / "dense"
+    if not (dense_dir / "meta.json").is_file():
+        log.warning("dense retrieval enabled but no embeddings at %s; run 'aan index --dense'", dense_dir)
+        return None
+    try:
+        return DenseIndex(dense_dir)
+    except RuntimeError as exc:  # numpy is optional
+        log.warning("dense retrieval disabled: %s", exc)
+        return None
+
+
+def _add_prefill(a: dict | None, b: dict | None) -> dict | None:
+    if a is None or b is None:
+        return a or b
+    return {k: a[k] + b[k] for k in a}
+
+
+def _record_tokens(model: str, raw: dict) -> None:
+    """Token counts and throughput from Ollama's raw counters (durations are in ns)."""
+    for kind, count_key, duration_key in (("prompt", "prompt_eval_count", "prompt_eval_duration"),
+                                          ("completion", "eval_count", "eval_duration")):
+        count, duration = raw.get(count_key), raw.get(duration_key)
+        if not count:
+            continue
+        metrics.TOKENS.inc(model, kind, amount=count)
+        if duration:
+            metrics.TOKENS_PER_SECOND.observe(count / (duration / 1e9), model, kind)
+    if raw.get("load_duration"):
+        metrics.LOAD_SECONDS.observe(raw["load_duration"] / 1e9, model)
+
+
 REPAIR_INSTR = """You output invalid or non-conforming JSON for task '{task_family}'. 
 Fix ONLY the JSON structure to conform to the expected schema. 
 Do not add commentary or fences. Here is your previous output:
@@ -58,46 +122,519 @@ Do not add commentary or fences. Here is your previous output:
 Return corrected JSON only.
 """
 
+# follow-up turn on the failed candidate's ``context``: its prompt and output are already in Ollama's cache
+REPAIR_FOLLOWUP = """Your JSON above is invalid or does not conform to the expected schema for task '{task_family}'.
+Fix ONLY the JSON structure. Do not add commentary or fences.
+Return corrected JSON only.
+"""
+
+# an aborted stream leaves only a fragment and no ``context``: ask again with the original prompt
+REPAIR_RETRY = """{prompt}
+
+Your previous reply to this request was stopped because it was not valid JSON for task '{task_family}'.
+Answer the request again. Return JSON only, with no commentary or fences.
+"""
+
+Candidate = Tuple[ValidationResult, str, dict]
+EventSink = Callable[[dict], None]
+T = TypeVar("T")
+
+
 class CuratorEngine:
-    def __init__(self, cfg: dict, base_dir: Path):
+    def __init__(self, cfg: dict, base_dir: Path, client: OllamaClient | None = None,
+                 max_concurrency: int | None = None, early_stop: bool | None = None,
+                 stream: bool | None = None, cache: ResponseCache | None = None,
+                 run_log: RunLogWriter | None = None, scheduler: ModelScheduler | None = None,
+                 retriever: BM25Index | None = None, dense: DenseIndex | None = None):
         self.cfg = cfg
+        self.base_dir = base_dir
         self.templates = TemplateLibrary(base_dir / "prompt_library")
+        # compile every prompt template up front; later changes are picked up by mtime
+        self.templates.preload()
         self.schema_dir = base_dir / "schemas" / "outputs"
-        self.client = OllamaClient()
+        # compile and check every output schema up front; validate_output reuses them
+        self.schemas = get_schema_registry(self.schema_dir)
+        self.schemas.load_all()
+        self.client = client or OllamaClient.from_config(cfg.get("runtime"))
+        engine_cfg = (cfg.get("runtime") or {}).get("engine") or {}
+        limit = max_concurrency if max_concurrency is not None else int(engine_cfg.get("max_concurrency", 4))
+        if limit < 1:
+            raise ValueError("max_concurrency must be >= 1")
+        self.max_concurrency = limit
+        self.early_stop = bool(engine_cfg.get("early_stop", False)) if early_stop is None else early_stop
+        self.stream = bool(engine_cfg.get("stream", False)) if stream is None else stream
+        # deterministic local JSON fixes before paying for an LLM repair round trip
+        self.salvage = bool(engine_cfg.get("salvage", True))
+        self.repair_stats: Dict[str, Any] = {"salvage_attempts": 0, "salvaged": 0, "llm_repairs": 0, "fixes": {}}
+        # repairs continue from the failed candidate's returned context instead of resending it
+        self.repair_context = bool(engine_cfg.get("repair_context", True))
+        self.prefill_stats: Dict[str, Any] = {"measured": 0, "prompt_tokens": 0, "reused_tokens": 0, "saved_s": 0.0}
+        self._prefill_rate: Dict[str, float] = {}  # seconds per evaluated prompt token, per model
+        # opt-in content-addressed cache of validated results (configs/runtime.yml 'cache')
+        self.cache = cache if cache is not None else ResponseCache.from_config(cfg.get("runtime"), base_dir)
+        # batched background run logging (configs/runtime.yml 'run_log'); None falls back to log_run
+        self.run_log = run_log if run_log is not None else RunLogWriter.from_config(cfg.get("runtime"), base_dir)
+        # leading input characters kept in run records, for training the learned router (0 = none)
+        self.log_input_chars = int(((cfg.get("runtime") or {}).get("run_log") or {}).get("input_chars", 0))
+        # decoding profiles deterministic enough to share results (cache and coalescing)
+        cache_cfg = (cfg.get("runtime") or {}).get("cache") or {}
+        self.keyed_profiles = frozenset(cache_cfg.get("profiles") or ("deterministic",))
+        # identical concurrent requests share one in-flight generation
+        self.flights = SingleFlight() if engine_cfg.get("coalesce", True) else None
+        self._flight_sinks: Dict[str, List[EventSink]] = {}  # event listeners of each in-flight generation
+        # per-model admission control and priority queueing (configs/models.yml)
+        self.scheduler = scheduler if scheduler is not None else ModelScheduler.from_config(cfg["models"])
+        self.ps_interval = float(((cfg["models"].get("scheduler") or {}).get("ps_interval_s", 10.0)))
+        self._ps_task: asyncio.Task[None] | None = None
+        # prompts are fitted to each model's context window (models.yml context_max, decoding.yml context_caps)
+        self.packer = ContextPacker.from_config(cfg)
+        # optional BM25 grounding from a local index (configs/runtime.yml 'retrieval')
+        retrieval_cfg = (cfg.get("runtime") or {}).get("retrieval") or {}
+        self.retrieval_families = frozenset(retrieval_cfg.get("families") or ())
+        self.retrieval_k = int(retrieval_cfg.get("k", 5))
+        max_tokens = retrieval_cfg.get("max_tokens")
+        self.retrieval_tokens = int(max_tokens) if max_tokens is not None else None
+        self.retriever = retriever if retriever is not None else _open_retriever(retrieval_cfg, base_dir)
+        # optional embedding search over the same chunks, fused with BM25 by reciprocal rank
+        dense_cfg = retrieval_cfg.get("dense") or {}
+        self.dense = dense if dense is not None else _open_dense(retrieval_cfg, self.retriever)
+        self.dense_model = str(dense_cfg.get("model", "nomic-embed-text"))
+        nprobe = dense_cfg.get("nprobe", 8)
+        self.dense_nprobe = int(nprobe) if nprobe is not None else None
+        self.rrf_k = int(dense_cfg.get("rrf_k", 60))
+        # escalation keys and the first curate call retrieve for the same input
+        self._retrieved: OrderedDict[Tuple, List[Hit]] = OrderedDict()
+        # Shared generation budget: every Ollama call (candidate or repair) holds one slot.
+        self._slots = asyncio.Semaphore(limit)
+
+    async def start(self) -> None:
+        """Warm shared resources (the Ollama connection pool) before serving."""
+        start = getattr(self.client, "start", None)
+        if start is not None:
+            await start()
+        if self.run_log is not None:
+            await self.run_log.start()
+        if self.scheduler.affinity and hasattr(self.client, "ps") and self._ps_task is None:
+            self._ps_task = asyncio.create_task(self._watch_resident(), name="ollama-ps")
+
+    async def refresh_resident(self) -> None:
+        """Update the scheduler's resident-model set from Ollama's /api/ps."""
+        self.scheduler.set_resident(await self.client.ps())
+
+    async def _watch_resident(self) -> None:
+        while True:
+            try:
+                await self.refresh_resident()
+            except Exception as exc:  # the host may be down; affinity falls back to local tracking
+                log.debug("ollama ps failed: %s", exc)
+            await asyncio.sleep(self.ps_interval)
+
+    async def aclose(self) -> None:
+        """Release shared resources; safe to call more than once."""
+        if self._ps_task is not None:
+            self._ps_task.cancel()
+            await asyncio.gather(self._ps_task, return_exceptions=True)
+            self._ps_task = None
+        close = getattr(self.client, "aclose", None)
+        if close is not None:
+            await close()
+        if self.cache is not None:
+            self.cache.close()
+        if self.run_log is not None:
+            await self.run_log.aclose()
+        if self.dense is not None:
+            self.dense.close()
+        if self.retriever is not None:
+            self.retriever.close()
+
+    def stats(self) -> dict:
+        pool_stats = getattr(self.client, "pool_stats", None)
+        return {
+            "ollama_pool": pool_stats() if pool_stats is not None else None,
+            "cache": self.cache.stats() if self.cache is not None else None,
+            "coalescing": self.flights.stats() if self.flights is not None else None,
+            "run_log": self.run_log.stats() if self.run_log is not None else None,
+            "scheduler": self.scheduler.stats(),
+            # "salvaged" counts LLM repair calls avoided
+            "repair": {**self.repair_stats, "fixes": dict(self.repair_stats["fixes"])},
+            "prefix_reuse": {**self.prefill_stats, "hit_ratio": round(
+                self.prefill_stats["reused_tokens"] / self.prefill_stats["prompt_tokens"], 4)
+                if self.prefill_stats["prompt_tokens"] else None},
+        }
+
+    def _record(self, meta: dict, user_input: str) -> dict:
+        """The run record for ``meta``; the input is logged only, never returned."""
+        if self.log_input_chars <= 0:
+            return meta
+        return {**meta, "input": user_input[: self.log_input_chars]}
+
+    async def _log(self, run_dir: Path | None, payload: dict) -> None:
+        if not run_dir:
+            return
+        if self.run_log is not None:
+            await self.run_log.log(payload, run_dir)
+        else:
+            log_run(run_dir, payload)
+
+    def _request_key(self, task_family: str, prompt: str, model: str, options: dict, scope: str = "curate") -> str | None:
+        """Content key for a call, or None when the task's decoding profile is not deterministic."""
+        profile = ((self.cfg["decoding"].get("per_task") or {}).get(task_family) or {}).get("profile")
+        if profile not in self.keyed_profiles:
+            return None
+        return cache_key(f"{scope}:{task_family}", prompt, model, options)
+
+    async def escalation_cache_key(self, task_family: str, user_input: str, model_ollama_name: str,
+                                   retrieve: bool | None = None) -> str | None:
+        """Key for the final result of an escalation loop that starts at ``model_ollama_name``."""
+        if self.cache is None:
+            return None
+        options = _decoding_for(task_family, self.cfg["decoding"])
+        hits = await self.retrieve(user_input) if self._wants_retrieval(task_family, retrieve) else []
+        prompt = self._pack(task_family, user_input, model_ollama_name, options, hits).prompt
+        return self._request_key(task_family, prompt, model_ollama_name, options, scope="escalation")
+
+    def _wants_retrieval(self, task_family: str, retrieve: bool | None) -> bool:
+        if self.retriever is None:
+            return False
+        return task_family in self.retrieval_families if retrieve is None else retrieve
 
-    async def _run_one(self, model_name: str, prompt: str, options: dict) -> Tuple[str, dict]:
-        res = await self.client.generate(model_name, prompt, options)
+    async def retrieve(self, query: str, k: int | None = None) -> List[Hit]:
+        """Top-k chunks from the local index for ``query`` (empty without an index).
+
+        With a dense index, BM25 and embedding hits are fused by reciprocal rank.
+        """
+        retriever = self.retriever
+        if retriever is None:
+            return []
+        k = k or self.retrieval_k
+        key = (query, k, retriever.generation, retriever.n_docs)
+        hits = self._retrieved.get(key)
+        if hits is not None:
+            self._retrieved.move_to_end(key)
+            return hits
+        dense = self.dense
+        if dense is None or dense.generation != retriever.generation:
+            hits = await asyncio.to_thread(retriever.retrieve, query, k)
+        else:
+            # each backend contributes a deeper list so fusion can reorder the top k
+            lexical_task = asyncio.to_thread(retriever.retrieve, query, 2 * k)
+            qvec, lexical = await asyncio.gather(self.client.embed(self.dense_model, [query]), lexical_task)
+            semantic = await asyncio.to_thread(dense.retrieve, retriever, qvec[0], 2 * k, self.dense_nprobe)
+            hits = reciprocal_rank_fusion([lexical, semantic], k, self.rrf_k)
+        self._retrieved[key] = hits
+        if len(self._retrieved) > 64:
+            self._retrieved.popitem(last=False)
+        return hits
+
+    def _passage(self, hit: Hit) -> str:
+        path = hit.path
+        if path.startswith(str(self.base_dir)):
+            path = os.path.relpath(path, self.base_dir)
+        return f"[{path}:{hit.start}-{hit.end}]\n{hit.text}"
+
+    def _pack(self, task_family: str, user_input: str, model: str, options: dict,
+              hits: List[Hit] | None = None) -> Packed:
+        with metrics.STAGE_SECONDS.time("render", task_family, model):
+            return self.packer.pack(self.templates.get(f"{task_family}_v1").render, user_input, model,
+                                    int(options.get("max_new_tokens", 0)),
+                                    [self._passage(h) for h in hits or ()], self.retrieval_tokens)
+
+    def context_fits(self, task_family: str, user_input: str, models: List[str]) -> List[bool]:
+        """Whether each of ``models`` holds the untrimmed prompt within its context budget."""
+        prompt = self.templates.get(f"{task_family}_v1").render(user_input)
+        max_new = int(_decoding_for(task_family, self.cfg["decoding"]).get("max_new_tokens", 0))
+        counts: Dict[str, int] = {}
+        fits = []
+        for m in models:
+            family = self.packer.family(m)
+            if family not in counts:
+                counts[family] = self.packer.count(prompt, family)
+            fits.append(self.packer.fits(m, counts[family], max_new))
+        return fits
+
+    def pick_context_model(self, task_family: str, user_input: str, models: List[str]) -> str:
+        """First of ``models`` whose context window holds the untrimmed prompt.
+
+        Falls back to the model with the largest window, where the prompt is
+        trimmed least.
+        """
+        if not models:
+            raise ValueError("no candidate models")
+        fits = self.context_fits(task_family, user_input, models)
+        return next((m for m, ok in zip(models, fits) if ok), max(models, key=self.packer.window))
+
+    async def _run_one(self, model_name: str, prompt: str, options: dict, stream: bool = False,
+                       on_chunk: Callable[[str], None] | None = None,
+                       priority: Priority = Priority.INITIAL, deadline: float | None = None,
+                       task_family: str = "", stage: str = "generate",
+                       context: List[int] | None = None) -> Tuple[str, dict]:
+        queued = time.perf_counter()
+        # model lane first, so a busy model does not hold global slots while it queues
+        async with self.scheduler.slot(model_name, priority, deadline), self._slots:
+            started = time.perf_counter()
+            metrics.QUEUE_WAIT_SECONDS.observe(started - queued, model_name, priority.name.lower())
+            metrics.STAGE_SECONDS.observe(started - queued, "queue", task_family, model_name)
+            extra = {"context": context} if context else {}
+            if stream:
+                # abort as soon as the output cannot become valid JSON or turns into a refusal
+                res = await self.client.generate_stream(model_name, prompt, options, on_chunk=on_chunk,
+                                                        check=IncrementalJSONValidator().feed, **extra)
+            else:
+                res = await self.client.generate(model_name, prompt, options, **extra)
+            metrics.STAGE_SECONDS.observe(time.perf_counter() - started, stage, task_family, model_name)
+        raw = res.get("raw") or {}
+        self.scheduler.record_load(model_name, raw.get("load_duration"))
+        _record_tokens(model_name, raw)
+        prefill = self._record_prefill(model_name, raw)
+        res = {**res, "queued_s": started - queued}
+        if prefill is not None:
+            res["prefill"] = prefill
         return res["text"], res
 
-    async def _attempt_repair(self, task_family: str, model: str, bad_text: str, options: dict) -> Tuple[ValidationResult, str, dict]:
-        prompt = REPAIR_INSTR.format(task_family=task_family, bad=bad_text)
-        fixed, raw = await self._run_one(model, prompt, options)
-        vr = validate_output(task_family, fixed, self.schema_dir)
+    def _record_prefill(self, model: str, raw: dict) -> dict | None:
+        """Prompt tokens Ollama served from its cache instead of evaluating.
+
+        The returned ``context`` holds the prompt and the reply, so
+        ``len(context) - eval_count`` is the exact prompt length, and
+        ``prompt_eval_count`` is the part that was evaluated.
+        """
+        ctx = raw.get("context")
+        if not isinstance(ctx, list):
+            return None
+        total = len(ctx) - int(raw.get("eval_count") or 0)
+        if total <= 0:
+            return None
+        evaluated = min(total, int(raw.get("prompt_eval_count") or 0))  # omitted when fully cached
+        reused = total - evaluated
+        if evaluated and raw.get("prompt_eval_duration"):
+            self._prefill_rate[model] = raw["prompt_eval_duration"] / 1e9 / evaluated
+        saved = reused * self._prefill_rate.get(model, 0.0)
+        stats = self.prefill_stats
+        stats["measured"] += 1
+        stats["prompt_tokens"] += total
+        stats["reused_tokens"] += reused
+        stats["saved_s"] += saved
+        metrics.PREFILL_TOKENS.inc(model, "evaluated", amount=evaluated)
+        metrics.PREFILL_TOKENS.inc(model, "reused", amount=reused)
+        metrics.PREFILL_SAVED_SECONDS.inc(model, amount=saved)
+        return {"prompt_tokens": total, "reused_tokens": reused, "saved_s": saved}
+
+    def _validate(self, task_family: str, text: str, raw: dict) -> ValidationResult:
+        aborted = raw.get("aborted")
+        if aborted:
+            return ValidationResult(False, [aborted], f"stream aborted: {aborted}")
+        with metrics.STAGE_SECONDS.time("validate", task_family, ""):
+            return validate_output(task_family, text, self.schema_dir)
+
+    def _salvage(self, task_family: str, text: str) -> Tuple[ValidationResult, str, List[str]] | None:
+        """Locally fixed, schema-valid JSON for ``text``, or None when an LLM repair is needed."""
+        self.repair_stats["salvage_attempts"] += 1
+        with metrics.STAGE_SECONDS.time("salvage", task_family, ""):
+            data, fixes = salvage_json(text)
+            if data is None:
+                return None
+            fixed = json.dumps(data, ensure_ascii=False)
+            vr = validate_output(task_family, fixed, self.schema_dir)
+        if not vr.ok:
+            return None
+        self.repair_stats["salvaged"] += 1
+        metrics.REPAIRS.inc(task_family, "salvage")
+        counts = self.repair_stats["fixes"]
+        for fix in fixes:
+            counts[fix] = counts.get(fix, 0) + 1
+        return vr, fixed, fixes
+
+    async def _attempt_repair(self, task_family: str, model: str, bad_text: str, options: dict,
+                              stream: bool = False, deadline: float | None = None,
+                              context: List[int] | None = None, prompt: str | None = None,
+                              aborted: bool = False) -> Tuple[ValidationResult, str, dict]:
+        """One LLM repair of ``bad_text``.
+
+        Continues the candidate's ``context`` when there is one. An aborted
+        stream is re-asked with its original ``prompt``, since the fragment it
+        left carries none of the input.
+        """
+        self.repair_stats["llm_repairs"] += 1
+        metrics.REPAIRS.inc(task_family, "llm")
+        if aborted and prompt is not None:
+            prompt, context = REPAIR_RETRY.format(prompt=prompt, task_family=task_family), None
+        elif context and self.repair_context:
+            prompt = REPAIR_FOLLOWUP.format(task_family=task_family)
+        else:
+            prompt, context = REPAIR_INSTR.format(task_family=task_family, bad=bad_text), None
+        fixed, raw = await self._run_one(model, prompt, options, stream=stream, priority=Priority.REPAIR, deadline=deadline,
+                                         task_family=task_family, stage="repair", context=context)
+        vr = self._validate(task_family, fixed, raw)
         return vr, fixed, raw
 
-    async def curate(self, task_family: str, user_input: str, model_ollama_name: str, n_candidates: int = 2, run_dir: Path | None = None) -> dict:
-        tmpl = self.templates.load(f"{task_family}_v1")
-        base_prompt = self.templates.render(tmpl, user_input)
+    async def _candidate(self, task_family: str, model: str, prompt: str, options: dict,
+                         stream: bool = False, index: int = 0, emit: EventSink | None = None,
+                         priority: Priority = Priority.INITIAL, deadline: float | None = None) -> Candidate:
+        t0 = time.perf_counter()
+        on_chunk = None
+        if emit is not None:
+            def on_chunk(piece: str) -> None:
+                emit({"event": "token", "candidate": index, "text": piece})
+        text, raw = await self._run_one(model, prompt, options, stream=stream, on_chunk=on_chunk,
+                                        priority=priority, deadline=deadline, task_family=task_family)
+        vr = self._validate(task_family, text, raw)
+        if raw.get("aborted") and emit is not None:
+            emit({"event": "abort", "candidate": index, "reason": raw["aborted"]})
+        queued = raw.get("queued_s", 0.0)
+        if "refusal_detected" in vr.signals and not vr.ok:
+            # a refusal will not be fixed by a JSON repair; leave it to escalation
+            return vr, text, {**raw, "generation_s": time.perf_counter() - t0 - queued}
+        if not vr.ok and self.salvage and "invalid_json" in vr.signals:
+            salvaged = self._salvage(task_family, text)
+            if salvaged is not None:
+                vr, text, fixes = salvaged
+                raw = {**raw, "salvaged": fixes}
+                if emit is not None:
+                    emit({"event": "salvage", "candidate": index, "fixes": fixes})
+        if not vr.ok:
+            # one-shot auto-repair; keep the original failure if it does not help
+            if emit is not None:
+                emit({"event": "repair", "candidate": index})
+            vr2, text2, raw2 = await self._attempt_repair(task_family, model, text, options, stream=stream, deadline=deadline,
+                                                          context=(raw.get("raw") or {}).get("context"),
+                                                          prompt=prompt, aborted=bool(raw.get("aborted")))
+            prefill = _add_prefill(raw.get("prefill"), raw2.get("prefill"))
+            queued += raw2.get("queued_s", 0.0)
+            if vr2.ok:
+                vr, text, raw = vr2, text2, raw2
+            if prefill is not None:
+                raw = {**raw, "prefill": prefill}
+        # time spent generating, validating and repairing; scheduler queue waits are left out
+        return vr, text, {**raw, "generation_s": time.perf_counter() - t0 - queued}
+
+    def _is_clean(self, vr: ValidationResult) -> bool:
+        """True when a candidate is valid and carries no escalation signal."""
+        if not vr.ok:
+            return False
+        escalate_on = ((self.cfg.get("routing") or {}).get("defaults") or {}).get("escalate_on")
+        if not escalate_on:
+            return not vr.signals
+        return not any(s in escalate_on for s in vr.signals)
+
+    @staticmethod
+    async def _gather(coros: List[Awaitable[T]],
+                      stop_when: Callable[[T], bool] | None) -> Tuple[List[T], bool]:
+        """Run coroutines concurrently, preserving submission order.
+
+        When ``stop_when`` accepts a finished candidate the remaining tasks are
+        cancelled and only completed candidates are returned. The first
+        exception raised by any candidate cancels the rest and propagates.
+        """
+        tasks = [asyncio.ensure_future(c) for c in coros]
+        order = {t: i for i, t in enumerate(tasks)}
+        done_results: Dict[int, T] = {}
+        stopped = False
+        try:
+            pending = set(tasks)
+            while pending and not stopped:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for t in sorted(done, key=order.__getitem__):
+                    res = t.result()
+                    done_results[order[t]] = res
+                    if stop_when is not None and stop_when(res):
+                        stopped = True
+                        break
+        finally:
+            leftovers = [t for t in tasks if not t.done()]
+            for t in leftovers:
+                t.cancel()
+            if leftovers:
+                await asyncio.gather(*leftovers, return_exceptions=True)
+        return [done_results[i] for i in sorted(done_results)], stopped
 
-        # simple prompt variants: add minor directive toggles
-        variants = [base_prompt]
-        if n_candidates > 1:
-            variants.append(base_prompt + "\nConstraint: be concise yet complete.")
+    async def curate(self, task_family: str, user_input: str, model_ollama_name: str, n_candidates: int = 2,
+                     run_dir: Path | None = None, early_stop: bool | None = None,
+                     stream: bool | None = None, on_event: EventSink | None = None,
+                     use_cache: bool = True, priority: Priority = Priority.INITIAL,
+                     deadline: float | None = None, retrieve: bool | None = None) -> dict:
+        started = time.perf_counter()
         options = _decoding_for(task_family, self.cfg["decoding"])
-        results: List[Tuple[ValidationResult, str, dict]] = []
-
-        for v in variants[:n_candidates]:
-            text, raw = await self._run_one(model_ollama_name, v, options)
-            vr = validate_output(task_family, text, self.schema_dir)
-            if not vr.ok:
-                # one-shot auto-repair
-                vr2, text2, raw2 = await self._attempt_repair(task_family, model_ollama_name, text, options)
-                if vr2.ok:
-                    vr, text, raw = vr2, text2, raw2
-                else:
-                    # keep the original failure
-                    pass
-            results.append((vr, text, raw))
+        hits = await self.retrieve(user_input) if self._wants_retrieval(task_family, retrieve) else []
+        packed = self._pack(task_family, user_input, model_ollama_name, options, hits)
+        base_prompt = packed.prompt
+        context = {"prompt_tokens": packed.prompt_tokens, "budget": packed.budget,
+                   "trimmed": packed.trimmed, "omitted_lines": packed.omitted_lines,
+                   "retrieved": len(hits), "passages": packed.passages}
+
+        # prompt variants: the template's directive table appended to the packed prompt
+        variants = self.templates.get(f"{task_family}_v1").variants(base_prompt, n_candidates)
+        key = self._request_key(task_family, base_prompt, model_ollama_name, options) if use_cache else None
+        cache = self.cache if key is not None else None
+        if cache is not None and key is not None:
+            hit = await cache.aget(key)
+            metrics.CACHE_REQUESTS.inc(task_family, "miss" if hit is None else "hit")
+            if hit is not None:
+                meta = {**hit["meta"], "ts": now_ts(), "cache": "hit"}
+                if on_event is not None:
+                    on_event({"event": "cache_hit"})
+                await self._log(run_dir, self._record(meta, user_input))
+                return {"text": hit["text"], "meta": meta, "validation": dict(hit["validation"])}
+        stop = self.early_stop if early_stop is None else early_stop
+        streaming = self.stream if stream is None else stream
+
+        async def _generate(emit: EventSink | None) -> dict:
+            out = await self._generate(task_family, model_ollama_name, variants, options, stop, streaming, emit,
+                                       priority, deadline)
+            clean = out.pop("clean")
+            out["meta"]["context"] = context
+            out["meta"]["cache"] = "miss" if cache is not None else "off"
+            if cache is not None and key is not None and clean:
+                await cache.aput(key, out)
+            return out
+
+        if self.flights is not None and key is not None:
+            # streaming and priority change how the generation runs, so they are part of the key
+            flight_key = f"{n_candidates}:{int(stop)}:{int(streaming)}:{int(priority)}:{key}"
+            leader = flight_key not in self.flights
+            sinks = self._flight_sinks.setdefault(flight_key, [])
+            if on_event is not None:
+                sinks.append(on_event)
+
+            async def _lead() -> dict:
+                def emit(event: dict) -> None:  # every waiter sees the shared generation's events
+                    for sink in list(sinks):
+                        sink(event)
+                try:
+                    return await _generate(emit)
+                finally:
+                    if self._flight_sinks.get(flight_key) is sinks:
+                        del self._flight_sinks[flight_key]
+
+            try:
+                shared, joined = await self.flights.do(flight_key, _lead)
+            except DeadlineExceeded:
+                if leader:
+                    raise
+                # the leader's queueing deadline ran out; this caller's own budget decides for it
+                shared, joined = await _generate(on_event), False
+            finally:
+                if on_event is not None and on_event in sinks:
+                    sinks.remove(on_event)
+        else:
+            shared, joined = await _generate(on_event), False
+        meta = {**shared["meta"], "coalesced": joined}
+        if joined:
+            metrics.CACHE_REQUESTS.inc(task_family, "coalesced")
+        metrics.REQUESTS.inc(task_family, "ok" if shared["validation"]["ok"] else "invalid")
+        metrics.STAGE_SECONDS.observe(time.perf_counter() - started, "curate", task_family, model_ollama_name)
+        await self._log(run_dir, self._record(meta, user_input))
+        return {"text": shared["text"], "meta": meta, "validation": dict(shared["validation"])}
+
+    async def _generate(self, task_family: str, model_ollama_name: str, variants: List[str], options: dict,
+                        stop: bool, streaming: bool, on_event: EventSink | None,
+                        priority: Priority = Priority.INITIAL, deadline: float | None = None) -> dict:
+        started = time.perf_counter()
+        results, stopped = await self._gather(
+            [self._candidate(task_family, model_ollama_name, v, options, stream=streaming, index=i, emit=on_event,
+                             priority=priority, deadline=deadline)
+             for i, v in enumerate(variants)],
+            (lambda r: self._is_clean(r[0])) if stop else None,
+        )
 
         # ranking: prefer valid JSON and fewer signals; fallback to first
         ranked = sorted(results, key=lambda r: (not r[0].ok, len(r[0].signals)))
@@ -107,10 +644,74 @@ class CuratorEngine:
             "task_family": task_family,
             "model": model_ollama_name,
             "options": options,
-            "candidates": [ {"ok": r[0].ok, "signals": r[0].signals, "elapsed": r[2].get("elapsed")} for r in results ],
+            "candidates": [ {"ok": r[0].ok, "signals": r[0].signals, "elapsed": r[2].get("elapsed"), "aborted": r[2].get("aborted"), "salvaged": r[2].get("salvaged")} for r in results ],
             "winner": {"ok": best[0].ok, "signals": best[0].signals},
             "score": proxy_score(best[0].ok, best[0].signals),
+            "early_stopped": stopped,
+            "cancelled": len(variants) - len(results),
+            # generation time (without queue waits) and token cost, read back by the adaptive router
+            "elapsed": max((r[2].get("generation_s", 0.0) for r in results), default=0.0),
+            "wall_s": time.perf_counter() - started,
+            "tokens": sum(int((r[2].get("raw") or {}).get(k) or 0) for r in results
+                          for k in ("prompt_eval_count", "eval_count")),
+            # prompt tokens Ollama reused from its cache (None when it returned no context)
+            "prefill": functools.reduce(_add_prefill, (r[2].get("prefill") for r in results), None),
         }
-        if run_dir:
-            log_run(run_dir, payload)
-        return {"text": best[1], "meta": payload, "validation": {"ok": best[0].ok, "signals": best[0].signals, "errors": best[0].errors}}
+        return {"text": best[1], "meta": payload, "validation": {"ok": best[0].ok, "signals": best[0].signals, "errors": best[0].errors},
+                "clean": self._is_clean(best[0])}
+
+    async def curate_map_reduce(self, task_family: str, chunks: List[str], model_ollama_name: str,
+                                n_candidates: int = 1, run_dir: Path | None = None, early_stop: bool | None = None,
+                                use_cache: bool = True, priority: Priority = Priority.INITIAL,
+                                deadline: float | None = None) -> dict:
+        """Curate each chunk concurrently and merge the outputs with the family's reducer.
+
+        Chunks share the engine's generation slots and the model's scheduler
+        lane, so a large document cannot exceed the configured concurrency.
+        Chunks whose output fails validation are reported but left out of the
+        merge.
+        """
+        if not chunks:
+            raise ValueError("no chunks to curate")
+        t0 = time.perf_counter()
+
+        async def _one(chunk: str) -> Tuple[dict, float]:
+            started = time.perf_counter()
+            out = await self.curate(task_family, chunk, model_ollama_name, n_candidates=n_candidates,
+                                    early_stop=early_stop, use_cache=use_cache, priority=priority, deadline=deadline,
+                                    retrieve=False)  # the document is the context
+            return out, time.perf_counter() - started
+
+        # an error in any chunk cancels the rest
+        results, _ = await self._gather([_one(c) for c in chunks], None)
+        parts: List[dict] = []
+        report = []
+        for i, ((out, elapsed), chunk) in enumerate(zip(results, chunks)):
+            data = parse_json_strict(out["text"])[0] if out["validation"]["ok"] else None
+            if isinstance(data, dict):
+                parts.append(data)
+            report.append({"index": i, "chars": len(chunk), "elapsed": elapsed, "ok": out["validation"]["ok"],
+                           "signals": out["validation"]["signals"], "cache": out["meta"].get("cache"),
+                           "merged": isinstance(data, dict)})
+        if parts:
+            text = json.dumps(reduce_outputs(task_family, parts), ensure_ascii=False)
+        else:
+            # nothing mergeable: surface the first chunk's output and its failure
+            text = results[0][0]["text"]
+        vr = validate_output(task_family, text, self.schema_dir)
+        latencies = sorted(r["elapsed"] for r in report)
+        meta = {
+            "ts": now_ts(),
+            "task_family": task_family,
+            "model": model_ollama_name,
+            "mode": "map_reduce",
+            "chunks": report,
+            "merged": len(parts),
+            "elapsed": time.perf_counter() - t0,
+            "chunk_latency": {"max": latencies[-1], "p50": latencies[len(latencies) // 2],
+                              "mean": sum(latencies) / len(latencies)},
+            "winner": {"ok": vr.ok, "signals": vr.signals},
+            "score": proxy_score(vr.ok, vr.signals),
+        }
+        await self._log(run_dir, meta)
+        return {"text": text, "meta": meta, "validation": {"ok": vr.ok, "signals": vr.signals, "errors": vr.errors}}
@@ -0,0 +1,126 @@
+"""Escalation strategies across a model chain.
+
+A chain is the initial model followed by ``task_map[...].chain`` from
+configs/routing.yml. :func:`run_chain` walks it with one of three strategies:
+
+``sequential``
+    Try one model at a time; move on only when a result is not acceptable.
+``hedged``
+    Like sequential, but also start the next model when the current one has
+    not finished within ``hedge_after_s`` seconds.
+``speculative``
+    Start the first ``speculative_width`` models at once and keep the first
+    acceptable result; the rest of the chain continues sequentially.
+
+Whatever strategy is used, the first acceptable result wins and every other
+attempt still running is cancelled.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Sequence, Tuple
+
+__all__ = ["EscalationPolicy", "run_chain", "STRATEGIES"]
+
+STRATEGIES = ("sequential", "hedged", "speculative")
+
+
+@dataclass(frozen=True)
+class EscalationPolicy:
+    strategy: str = "sequential"
+    hedge_after_s: float = 20.0
+    speculative_width: int = 2
+
+    def __post_init__(self) -> None:
+        if self.strategy not in STRATEGIES:
+            raise ValueError(f"Unknown escalation strategy {self.strategy!r}. Known: {', '.join(STRATEGIES)}")
+
+    @classmethod
+    def from_config(cls, routing_cfg: dict, strategy: str | None = None) -> EscalationPolicy:
+        node = routing_cfg.get("escalation") or {}
+        return cls(
+            strategy=strategy or node.get("strategy", "sequential"),
+            hedge_after_s=float(node.get("hedge_after_s", 20.0)),
+            speculative_width=max(1, int(node.get("speculative_width", 2))),
+        )
+
+
+async def run_chain(
+    chain: Sequence[str],
+    attempt: Callable[[str, int], Awaitable[Any]],
+    acceptable: Callable[[Any], bool],
+    policy: EscalationPolicy,
+    rank: Callable[[Any], Any] | None = None,
+) -> Tuple[Any, str, List[Dict[str, Any]]]:
+    """Run ``attempt(model_key, depth)`` over ``chain`` according to ``policy``.
+
+    Returns ``(result, model_key, trace)``. When no result is acceptable the
+    best one by ``rank`` (lower sorts first; ties go to the deeper model) is
+    returned. Exceptions from individual attempts are recorded in the trace;
+    if every attempt failed, the first exception is raised.
+    """
+    if not chain:
+        raise ValueError("escalation chain is empty")
+    width = policy.speculative_width if policy.strategy == "speculative" else 1
+    hedge = policy.hedge_after_s if policy.strategy == "hedged" else None
+
+    running: Dict[asyncio.Task[Any], int] = {}
+    started: Dict[int, float] = {}
+    trace: List[Dict[str, Any]] = [{"model": key, "status": "skipped"} for key in chain]
+    finished: List[Tuple[int, Any]] = []
+    errors: List[BaseException] = []
+    next_i = 0
+    last_launch = 0.0
+
+    def launch() -> None:
+        nonlocal next_i, last_launch
+        depth = next_i
+        next_i += 1
+        last_launch = started[depth] = time.perf_counter()
+        trace[depth]["status"] = "running"
+        running[asyncio.ensure_future(attempt(chain[depth], depth))] = depth
+
+    try:
+        while next_i < min(width, len(chain)):
+            launch()
+        while running:
+            timeout = None
+            if hedge is not None and next_i < len(chain):
+                timeout = max(0.0, last_launch + hedge - time.perf_counter())
+            done, _ = await asyncio.wait(running, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                trace[next_i]["hedged"] = True
+                launch()
+                continue
+            for task in sorted(done, key=running.__getitem__):
+                depth = running.pop(task)
+                trace[depth]["elapsed"] = time.perf_counter() - started[depth]
+                exc = task.exception()
+                if exc is not None:
+                    trace[depth]["status"] = "error"
+                    trace[depth]["error"] = f"{type(exc).__name__}: {exc}"
+                    errors.append(exc)
+                    continue
+                result = task.result()
+                if acceptable(result):
+                    trace[depth]["status"] = "accepted"
+                    return result, chain[depth], trace
+                trace[depth]["status"] = "rejected"
+                finished.append((depth, result))
+            if not running and next_i < len(chain):
+                launch()
+    finally:
+        for task, depth in running.items():
+            task.cancel()
+            trace[depth]["status"] = "cancelled"
+        if running:
+            await asyncio.gather(*running, return_exceptions=True)
+
+    if not finished:
+        raise errors[0]
+    key_fn = rank or (lambda _r: 0)
+    depth, result = min(finished, key=lambda dr: (key_fn(dr[1]), -dr[0]))
+    return result, chain[depth], trace
@@ -1,47 +1,291 @@
 from __future__ import annotations
 
+import json
+import logging
 import os
 import time
 import uuid
-from typing import Any
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable
 
 import httpx
 
 from .retries import with_retry
 
+log = logging.getLogger(__name__)
+
+
+def _h2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+class StreamInterrupted(RuntimeError):
+    """A streamed generation failed after tokens were already delivered (not retried)."""
+
 
 class OllamaClient:
     """Thin async client for Ollama's /api/generate endpoint.
 
+    Owns one long-lived ``httpx.AsyncClient`` (and thus one connection pool)
+    for its whole lifetime unless a client is injected. Call :meth:`start`
+    at startup (optional, the pool is also created lazily) and
+    :meth:`aclose` at shutdown.
+
+    ``keep_alive`` (and per-model ``keep_alive_models``) is sent with every
+    generation so hot models and their prompt caches stay resident. A
+    ``context`` from an earlier reply continues that conversation, so Ollama
+    does not prefill it again.
+
     Returns a dict compatible with CuratorEngine expectations.
     """
 
-    def __init__(self, base_url: str | None = None, timeout: float = 30.0, client: httpx.AsyncClient | None = None):
+    def __init__(
+        self,
+        base_url: str | None = None,
+        timeout: float = 30.0,
+        client: httpx.AsyncClient | None = None,
+        *,
+        max_connections: int = 10,
+        max_keepalive: int = 5,
+        keepalive_expiry: float = 30.0,
+        http2: bool = False,
+        keep_alive: str | int | float | None = None,
+        keep_alive_models: dict[str, str | int | float] | None = None,
+    ):
         base = base_url or os.environ.get("OLLAMA_HOST", "http://localhost:11434")
         self.base_url = base.rstrip("/")
         self.timeout = timeout
+        self.max_connections = max_connections
+        self.max_keepalive = max_keepalive
+        self.keepalive_expiry = keepalive_expiry
+        if http2 and not _h2_available():
+            log.warning("http2 requested but the 'h2' package is missing; falling back to HTTP/1.1")
+            http2 = False
+        self.http2 = http2
+        self.keep_alive = keep_alive
+        self.keep_alive_models = dict(keep_alive_models or {})
         self._client = client
+        self._owns_client = client is None
+        self._in_flight = 0
+        self._requests = 0
+        self._pool_waits = 0
+
+    @classmethod
+    def from_config(cls, runtime_cfg: dict | None, **overrides: Any) -> OllamaClient:
+        """Build a client from the ``ollama`` section of configs/runtime.yml."""
+        node = dict((runtime_cfg or {}).get("ollama") or {})
+        node.update(overrides)
+        return cls(
+            base_url=node.get("base_url"),
+            timeout=float(node.get("timeout", 30.0)),
+            max_connections=int(node.get("max_connections", 10)),
+            max_keepalive=int(node.get("max_keepalive", 5)),
+            keepalive_expiry=float(node.get("keepalive_expiry", 30.0)),
+            http2=bool(node.get("http2", False)),
+            keep_alive=node.get("keep_alive"),
+            keep_alive_models=node.get("keep_alive_models"),
+        )
+
+    # ------------------------------------------------------------------
+    # lifecycle
+    def _ensure_client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            limits = httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_keepalive,
+                keepalive_expiry=self.keepalive_expiry,
+            )
+            self._client = httpx.AsyncClient(timeout=self.timeout, limits=limits, http2=self.http2)
+            self._owns_client = True
+        return self._client
+
+    async def start(self) -> None:
+        """Create the shared connection pool ahead of the first request."""
+        self._ensure_client()
+
+    async def aclose(self) -> None:
+        """Close the pool if this client owns it; injected clients are left open."""
+        if self._client is not None and self._owns_client:
+            client, self._client = self._client, None
+            await client.aclose()
+
+    async def __aenter__(self) -> OllamaClient:
+        await self.start()
+        return self
 
-    async def generate(self, model: str, prompt: str, options: dict | None = None) -> dict:
-        body: dict[str, Any] = {"model": model, "prompt": prompt, "stream": False}
+    async def __aexit__(self, *exc: object) -> None:
+        await self.aclose()
+
+    # ------------------------------------------------------------------
+    def pool_stats(self) -> dict:
+        """Snapshot of pool usage: in-flight requests, open/idle connections, waits."""
+        open_conns = idle = None
+        pool = getattr(getattr(self._client, "_transport", None), "_pool", None)
+        conns = getattr(pool, "connections", None)
+        if conns is not None:
+            open_conns = len(conns)
+            idle = sum(1 for c in conns if c.is_idle())
+        return {
+            "in_flight": self._in_flight,
+            "requests": self._requests,
+            "pool_waits": self._pool_waits,
+            "open_connections": open_conns,
+            "idle_connections": idle,
+            "max_connections": self.max_connections,
+            "http2": self.http2,
+        }
+
+    def _body(self, model: str, prompt: str, options: dict | None, stream: bool,
+              context: list[int] | None) -> dict[str, Any]:
+        body: dict[str, Any] = {"model": model, "prompt": prompt, "stream": stream}
         if options:
             body["options"] = options
-        url = f"{self.base_url}/api/generate"
+        keep_alive = self.keep_alive_models.get(model, self.keep_alive)
+        if keep_alive is not None:
+            body["keep_alive"] = keep_alive
+        if context:
+            body["context"] = context
+        return body
 
-        async def _once() -> httpx.Response:
-            if self._client is not None:
-                r = await self._client.post(url, json=body, timeout=self.timeout)
-                r.raise_for_status()
-                return r
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
-                r = await client.post(url, json=body)
+    async def _post(self, url: str, body: dict) -> httpx.Response:
+        client = self._ensure_client()
+        if self._in_flight >= self.max_connections:
+            # every connection is busy: this request will queue inside the pool
+            self._pool_waits += 1
+        self._in_flight += 1
+        self._requests += 1
+        try:
+            r = await client.post(url, json=body, timeout=self.timeout)
+        finally:
+            self._in_flight -= 1
+        r.raise_for_status()
+        return r
+
+    @asynccontextmanager
+    async def _stream(self, url: str, body: dict) -> AsyncIterator[httpx.Response]:
+        client = self._ensure_client()
+        if self._in_flight >= self.max_connections:
+            self._pool_waits += 1
+        self._in_flight += 1
+        self._requests += 1
+        try:
+            async with client.stream("POST", url, json=body, timeout=self.timeout) as r:
                 r.raise_for_status()
-                return r
+                yield r
+        finally:
+            self._in_flight -= 1
+
+    async def generate_stream(
+        self,
+        model: str,
+        prompt: str,
+        options: dict | None = None,
+        *,
+        on_chunk: Callable[[str], None] | None = None,
+        check: Callable[[str], str | None] | None = None,
+        context: list[int] | None = None,
+    ) -> dict:
+        """Stream /api/generate NDJSON and stop as soon as ``check`` objects.
+
+        ``on_chunk`` receives every token piece as it arrives. ``check`` is
+        called with the same piece and returns an abort reason (or ``None``);
+        on abort the response is closed, which makes Ollama stop generating.
+        The result matches :meth:`generate` plus an ``aborted`` field.
+        Connection errors are retried only until the first token arrives.
+        """
+        body = self._body(model, prompt, options, True, context)
+        url = f"{self.base_url}/api/generate"
+        parts: list[str] = []
+        state: dict[str, Any] = {"raw": {}, "aborted": None, "request_id": None}
+
+        async def _once() -> None:
+            try:
+                async with self._stream(url, body) as r:
+                    state["request_id"] = r.headers.get("X-Request-ID")
+                    async for line in r.aiter_lines():
+                        if not line.strip():
+                            continue
+                        msg = json.loads(line)
+                        piece = msg.get("response", "")
+                        if piece:
+                            parts.append(piece)
+                            if on_chunk is not None:
+                                on_chunk(piece)
+                            if check is not None:
+                                reason = check(piece)
+                                if reason:
+                                    state["aborted"] = reason
+                                    state["raw"] = msg
+                                    return
+                        if msg.get("done"):
+                            state["raw"] = msg
+                            return
+            except httpx.RequestError as exc:
+                if parts:
+                    raise StreamInterrupted(f"stream from {model} broke after {len(parts)} chunks") from exc
+                raise
+
+        t0 = time.perf_counter()
+        await with_retry(
+            _once,
+            retries=2,
+            backoff=0.25,
+            retry_on=(httpx.RequestError, httpx.TimeoutException),
+        )
+        return {
+            "text": "".join(parts),
+            "elapsed": time.perf_counter() - t0,
+            "raw": state["raw"],
+            "model": model,
+            "request_id": state["request_id"] or uuid.uuid4().hex,
+            "aborted": state["aborted"],
+        }
+
+    async def ps(self) -> list[str]:
+        """Names of the models currently loaded on the Ollama host (GET /api/ps)."""
+        client = self._ensure_client()
+        r = await client.get(f"{self.base_url}/api/ps", timeout=self.timeout)
+        r.raise_for_status()
+        return [m.get("name") or m.get("model") for m in r.json().get("models", [])]
+
+    async def embed(self, model: str, inputs: list[str]) -> list[list[float]]:
+        """Embeddings for a batch of ``inputs`` in one request (POST /api/embed).
+
+        Raises ``ValueError`` when the reply does not hold one embedding per
+        input, e.g. because ``model`` is not an embedding model.
+        """
+        r = await with_retry(
+            self._post,
+            f"{self.base_url}/api/embed",
+            {"model": model, "input": inputs},
+            retries=2,
+            backoff=0.25,
+            retry_on=(httpx.RequestError, httpx.TimeoutException),
+        )
+        data = r.json()
+        embeddings = data.get("embeddings") if isinstance(data, dict) else None
+        if not isinstance(embeddings, list) or len(embeddings) != len(inputs):
+            detail = data.get("error") if isinstance(data, dict) else None
+            got = len(embeddings) if isinstance(embeddings, list) else "no"
+            raise ValueError(f"{model} returned {got} embeddings for {len(inputs)} inputs"
+                             + (f": {detail}" if detail else ""))
+        return embeddings
+
+    async def generate(self, model: str, prompt: str, options: dict | None = None, *,
+                       context: list[int] | None = None) -> dict:
+        body = self._body(model, prompt, options, False, context)
+        url = f"{self.base_url}/api/generate"
 
         t0 = time.perf_counter()
         # Only retry network exceptions by default
         r = await with_retry(
-            _once,
+            self._post,
+            url,
+            body,
             retries=2,
             backoff=0.25,
             retry_on=(httpx.RequestError, httpx.TimeoutException),
@@ -55,5 +299,3 @@ class OllamaClient:
             "model": model,
             "request_id": req_id,
         }
-
-
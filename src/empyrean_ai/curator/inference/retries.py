@@ -4,6 +4,8 @@ import asyncio
 import random
 from typing import Iterable, Type
 
+from empyrean_ai import metrics
+
 
 async def with_retry(
     coro_fn,
@@ -41,6 +43,7 @@ async def with_retry(
             last = exc
             if i == retries:
                 break
+            metrics.RETRIES.inc(type(exc).__name__)
             sleep = min(backoff * (2 ** i), cap)
             sleep *= 1.0 + (random.random() * 0.2)  # +0..+20% jitter
             await asyncio.sleep(sleep)
@@ -0,0 +1,411 @@
+"""On-disk BM25 index over chunked files.
+
+Files are split with :func:`fs_chunks.iter_chunks`. Every chunk becomes a
+document, and a classic inverted index is written to a directory:
+
+``meta.json``
+    Parameters, corpus statistics and the tracked files (mtime, size, SHA-1).
+``terms.json``
+    ``term -> [offset, count, df]`` into the postings file.
+``postings.u32``
+    Flat ``uint32`` pairs ``(doc_id, term_frequency)``, grouped by term.
+``doclen.u32`` / ``docfile.u32`` / ``docspan.u64`` / ``textoff.u64``
+    Per-document token length (0 marks a deleted document), owning file,
+    byte span in that file and span in ``texts.bin``.
+``texts.bin``
+    Chunk texts, so hits can be returned without re-reading the sources.
+
+The fixed-width files are opened with ``mmap``, so a cold start costs little
+more than parsing ``terms.json``. :meth:`BM25Index.update` is incremental:
+unchanged files (same mtime and size, or the same hash) are skipped, and
+their documents keep their ids. Changed or removed files have their documents
+tombstoned, and new documents are appended. As in Lucene, document
+frequencies include tombstoned documents until the index is compacted. That
+happens automatically once more than ``compact_ratio`` of documents are
+dead.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import heapq
+import json
+import math
+import mmap
+import os
+import re
+from array import array
+from collections import Counter
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Literal, Tuple, overload
+
+from .fs_chunks import StreamMode, iter_chunks
+
+__all__ = ["BM25Index", "Hit", "tokenize"]
+
+_FORMAT = 1
+_TOKEN_RE = re.compile(r"[A-Za-z0-9]+")
+_CAMEL_RE = re.compile(r"[a-z0-9]+|[A-Z][a-z0-9]*")
+_SKIP_DIRS = frozenset({".git", "__pycache__", "node_modules", ".venv", ".mypy_cache", ".pytest_cache"})
+_STOP = frozenset("a an and are as at be by for from has in is it of on or that the this to was were will with".split())
+
+
+def tokenize(text: str) -> List[str]:
+    """Lower-cased alphanumeric terms (``snake_case`` splits); camelCase words also yield their parts."""
+    out: List[str] = []
+    for word in _TOKEN_RE.findall(text):
+        low = word.lower()
+        if low not in _STOP:
+            out.append(low)
+        if not word.islower() and not word.isupper() and not word.isdigit():
+            parts = _CAMEL_RE.findall(word)
+            if len(parts) > 1:
+                out.extend(p.lower() for p in parts if len(p) > 1)
+    return out
+
+
+@dataclass(frozen=True)
+class Hit:
+    """A retrieved chunk: source file, byte span in it, text and BM25 score."""
+
+    path: str
+    start: int
+    end: int
+    text: str
+    score: float
+
+
+def _sha1(path: Path) -> str:
+    h = hashlib.sha1()
+    with path.open("rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _is_binary(path: Path) -> bool:
+    with path.open("rb") as f:
+        return b"\0" in f.read(8192)
+
+
+def _load_array(path: Path, typecode: str) -> array:
+    arr = array(typecode)
+    if path.is_file():
+        arr.frombytes(path.read_bytes())
+    return arr
+
+
+def _write_atomic(path: Path, data: bytes | array) -> None:
+    tmp = path.with_name(path.name + ".tmp")
+    with tmp.open("wb") as f:
+        if isinstance(data, array):
+            data.tofile(f)
+        else:
+            f.write(data)
+    os.replace(tmp, path)
+
+
+class BM25Index:
+    """A BM25 index stored in ``index_dir``; see the module docstring for the layout."""
+
+    def __init__(self, index_dir: Path, *, k1: float = 1.2, b: float = 0.75, mode: StreamMode = "lines",
+                 max_size: int = 1500, overlap: int = 0, compact_ratio: float = 0.5):
+        self.dir = Path(index_dir)
+        self.k1 = k1
+        self.b = b
+        self.mode = mode
+        self.max_size = max_size
+        self.overlap = overlap
+        self.compact_ratio = compact_ratio
+        self.files: Dict[str, dict] = {}
+        self.terms: Dict[str, List[int]] = {}
+        self.live_docs = 0
+        self.total_len = 0
+        self.generation = 0  # bumped by compact(), which renumbers documents
+        self._maps: List[mmap.mmap] = []
+        self._post: memoryview | None = None
+        self._doclen: memoryview | None = None
+        self._docfile: memoryview | None = None
+        self._docspan: memoryview | None = None
+        self._textoff: memoryview | None = None
+        self._texts: mmap.mmap | None = None
+        self._file_names: List[str] = []
+        if (self.dir / "meta.json").is_file():
+            self._open()
+
+    # ------------------------------------------------------------------
+    # reading
+    @overload
+    def _map(self, name: str, typecode: Literal["I", "Q"]) -> memoryview | None: ...
+
+    @overload
+    def _map(self, name: str, typecode: None) -> mmap.mmap | None: ...
+
+    def _map(self, name: str, typecode: Literal["I", "Q"] | None) -> memoryview | mmap.mmap | None:
+        path = self.dir / name
+        if not path.is_file() or path.stat().st_size == 0:
+            return None
+        with path.open("rb") as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._maps.append(mm)
+        return memoryview(mm).cast(typecode) if typecode else mm
+
+    def _open(self) -> None:
+        meta = json.loads((self.dir / "meta.json").read_text(encoding="utf-8"))
+        if meta.get("format") != _FORMAT:
+            raise ValueError(f"Unsupported BM25 index format in {self.dir}: {meta.get('format')!r}")
+        self.k1, self.b = meta["k1"], meta["b"]
+        self.mode, self.max_size, self.overlap = meta["mode"], meta["max_size"], meta["overlap"]
+        self.files = meta["files"]
+        self._file_names = meta["file_names"]
+        self.live_docs = meta["live_docs"]
+        self.total_len = meta["total_len"]
+        self.generation = meta.get("generation", 0)
+        self.terms = json.loads((self.dir / "terms.json").read_text(encoding="utf-8"))
+        self._post = self._map("postings.u32", "I")
+        self._doclen = self._map("doclen.u32", "I")
+        self._docfile = self._map("docfile.u32", "I")
+        self._docspan = self._map("docspan.u64", "Q")
+        self._textoff = self._map("textoff.u64", "Q")
+        self._texts = self._map("texts.bin", None)
+
+    def close(self) -> None:
+        for view in (self._post, self._doclen, self._docfile, self._docspan, self._textoff):
+            if view is not None:
+                view.release()
+        self._post = self._doclen = self._docfile = self._docspan = self._textoff = None
+        self._texts = None
+        for mm in self._maps:
+            mm.close()
+        self._maps = []
+
+    def __enter__(self) -> BM25Index:
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return self.live_docs
+
+    @property
+    def n_docs(self) -> int:
+        """Document ids allocated, including tombstoned ones."""
+        return len(self._doclen) if self._doclen is not None else 0
+
+    def stats(self) -> dict:
+        return {"docs": self.live_docs, "dead": self.n_docs - self.live_docs, "terms": len(self.terms),
+                "files": len(self.files), "postings": (len(self._post) // 2) if self._post is not None else 0}
+
+    def retrieve(self, query: str, k: int = 5, max_terms: int = 64) -> List[Hit]:
+        """Top ``k`` chunks for ``query`` by BM25, best first.
+
+        At most ``max_terms`` distinct query terms are scored: the ones with
+        the lowest document frequency.
+        """
+        if k <= 0 or not self.live_docs or self._post is None or self._doclen is None:
+            return []
+        n = self.n_docs
+        avgdl = self.total_len / self.live_docs
+        k1, b = self.k1, self.b
+        post, doclen = self._post, self._doclen
+        scores: Dict[int, float] = {}
+        query_terms = [(t, q, self.terms[t]) for t, q in Counter(tokenize(query)).items() if t in self.terms]
+        if len(query_terms) > max_terms:
+            # long queries (whole documents): the rarest terms carry almost all of the score
+            query_terms = heapq.nsmallest(max_terms, query_terms, key=lambda tqe: (tqe[2][2], tqe[0]))
+        for _term, qtf, (offset, count, df) in query_terms:
+            idf = math.log(1.0 + (n - df + 0.5) / (df + 0.5)) * qtf
+            norm = k1 * (1.0 - b)
+            scale = k1 * b / avgdl
+            for i in range(offset, offset + 2 * count, 2):
+                doc = post[i]
+                dl = doclen[doc]
+                if not dl:
+                    continue  # tombstoned
+                tf = post[i + 1]
+                scores[doc] = scores.get(doc, 0.0) + idf * tf * (k1 + 1.0) / (tf + norm + scale * dl)
+        best = heapq.nlargest(k, scores.items(), key=lambda kv: (kv[1], -kv[0]))
+        return [self.hit(doc, score) for doc, score in best]
+
+    def doc_lengths(self) -> memoryview | None:
+        """Token length per document id (0 for tombstoned documents), backed by the mmap."""
+        return self._doclen
+
+    def text(self, doc: int) -> str:
+        assert self._textoff is not None
+        t0, t1 = self._textoff[2 * doc], self._textoff[2 * doc + 1]
+        return self._texts[t0:t1].decode("utf-8", "replace") if self._texts is not None else ""
+
+    def hit(self, doc: int, score: float) -> Hit:
+        """The :class:`Hit` for document id ``doc`` with ``score``."""
+        assert self._docfile is not None and self._docspan is not None
+        return Hit(self._file_names[self._docfile[doc]], self._docspan[2 * doc], self._docspan[2 * doc + 1],
+                   self.text(doc), score)
+
+    # ------------------------------------------------------------------
+    # writing
+    def _changed(self, key: str, path: Path) -> Tuple[bool, dict]:
+        st = path.stat()
+        info: Dict[str, Any] = {"mtime_ns": st.st_mtime_ns, "size": st.st_size}
+        old = self.files.get(key)
+        if old is not None and old["mtime_ns"] == info["mtime_ns"] and old["size"] == info["size"]:
+            return False, old
+        info["sha1"] = _sha1(path)
+        if old is not None and old.get("sha1") == info["sha1"]:
+            return False, {**old, **info}  # touched but identical
+        return True, info
+
+    def update(self, paths: Iterable[Path], *, prune: bool = True) -> dict:
+        """Index ``paths`` (files or directories), re-chunking only files that changed.
+
+        With ``prune`` (default) tracked files that are no longer present in
+        ``paths`` are dropped from the index. Returns counts of what changed.
+        """
+        wanted: Dict[str, Path] = {}
+        for p in paths:
+            p = Path(p)
+            found = (x for x in p.rglob("*") if x.is_file() and not _SKIP_DIRS.intersection(x.relative_to(p).parts))
+            for f in (sorted(found) if p.is_dir() else [p]):
+                wanted[str(f.resolve())] = f
+
+        doclen = _load_array(self.dir / "doclen.u32", "I") if self._doclen is not None else array("I")
+        docfile = _load_array(self.dir / "docfile.u32", "I") if self._docfile is not None else array("I")
+        docspan = _load_array(self.dir / "docspan.u64", "Q") if self._docspan is not None else array("Q")
+        textoff = _load_array(self.dir / "textoff.u64", "Q") if self._textoff is not None else array("Q")
+        text_size = textoff[-1] if textoff else 0
+        file_names = list(self._file_names)
+        file_ids = {name: i for i, name in enumerate(file_names)}
+
+        stale: set[int] = set()
+        files: Dict[str, dict] = {}
+        changed: List[Tuple[str, Path, dict]] = []
+        unchanged = 0
+        for key, path in wanted.items():
+            try:
+                is_changed, info = self._changed(key, path)
+            except OSError:
+                continue
+            if is_changed:
+                changed.append((key, path, info))
+                if key in self.files:
+                    stale.add(file_ids[key])
+            else:
+                files[key] = info
+                unchanged += 1
+        removed = [k for k in self.files if k not in wanted] if prune else []
+        stale.update(file_ids[k] for k in removed)
+        if not prune:
+            files.update({k: v for k, v in self.files.items() if k not in wanted})
+
+        dead = 0
+        live_docs, total_len = self.live_docs, self.total_len
+        if stale:
+            for doc in range(len(doclen)):
+                if doclen[doc] and docfile[doc] in stale:
+                    live_docs -= 1
+                    total_len -= doclen[doc]
+                    doclen[doc] = 0
+                    dead += 1
+
+        new_post: Dict[str, array] = {}
+        added = 0
+        self.dir.mkdir(parents=True, exist_ok=True)
+        texts_path = self.dir / "texts.bin"
+        # texts.bin is append-only between compactions; mapped readers see a stable prefix
+        with texts_path.open("ab") as texts:
+            texts.truncate(text_size)  # drop bytes left by an interrupted update
+            for key, path, info in changed:
+                if key not in file_ids:
+                    file_ids[key] = len(file_names)
+                    file_names.append(key)
+                fid = file_ids[key]
+                files[key] = info
+                if _is_binary(path):
+                    continue  # tracked, so it is not re-read until it changes
+                first = len(doclen)
+                try:
+                    for chunk in iter_chunks(path, self.mode, self.max_size, self.overlap):
+                        tf = Counter(tokenize(chunk.text))
+                        if not tf:
+                            continue
+                        doc = len(doclen)
+                        length = sum(tf.values())
+                        doclen.append(length)
+                        docfile.append(fid)
+                        docspan.extend((chunk.start, chunk.end))
+                        raw = chunk.text.encode("utf-8")
+                        texts.write(raw)
+                        textoff.extend((text_size, text_size + len(raw)))
+                        text_size += len(raw)
+                        for term, c in tf.items():
+                            arr = new_post.get(term)
+                            if arr is None:
+                                arr = new_post[term] = array("I")
+                            arr.extend((doc, c))
+                        live_docs += 1
+                        total_len += length
+                        added += 1
+                except (UnicodeDecodeError, OSError):
+                    # not text after all: tombstone what was indexed from it
+                    for doc in range(first, len(doclen)):
+                        live_docs -= 1
+                        total_len -= doclen[doc]
+                        doclen[doc] = 0
+                        added -= 1
+
+        self._write(new_post, doclen, docfile, docspan, textoff, file_names, files, live_docs, total_len)
+        result = {"files_indexed": len(changed), "files_unchanged": unchanged, "files_removed": len(removed),
+                  "docs_added": added, "docs_deleted": dead, "docs": live_docs}
+        if len(doclen) and (len(doclen) - live_docs) / len(doclen) > self.compact_ratio:
+            result["compacted"] = True
+            self.compact()
+        return result
+
+    def _write(self, new_post: Dict[str, array], doclen: array, docfile: array, docspan: array,
+               textoff: array, file_names: List[str], files: Dict[str, dict], live_docs: int, total_len: int) -> None:
+        # merge old postings (by slice, no per-posting work) with the new ones, term by term
+        postings = array("I")
+        terms: Dict[str, List[int]] = {}
+        old = self._post
+        for term in sorted(set(self.terms) | set(new_post)):
+            start = len(postings)
+            count = df = 0
+            entry = self.terms.get(term)
+            if entry is not None and old is not None:
+                off, n, d = entry
+                postings.frombytes(old[off : off + 2 * n].tobytes())
+                count, df = n, d
+            fresh = new_post.get(term)
+            if fresh is not None:
+                postings.extend(fresh)
+                count += len(fresh) // 2
+                df += len(fresh) // 2
+            terms[term] = [start, count, df]
+        self.close()
+        _write_atomic(self.dir / "postings.u32", postings)
+        _write_atomic(self.dir / "doclen.u32", doclen)
+        _write_atomic(self.dir / "docfile.u32", docfile)
+        _write_atomic(self.dir / "docspan.u64", docspan)
+        _write_atomic(self.dir / "textoff.u64", textoff)
+        _write_atomic(self.dir / "terms.json", json.dumps(terms, separators=(",", ":")).encode("utf-8"))
+        meta = {"format": _FORMAT, "k1": self.k1, "b": self.b, "mode": self.mode, "max_size": self.max_size,
+                "overlap": self.overlap, "files": files, "file_names": file_names, "live_docs": live_docs,
+                "total_len": total_len, "generation": self.generation}
+        # meta.json last: it is what marks the index as complete
+        _write_atomic(self.dir / "meta.json", json.dumps(meta).encode("utf-8"))
+        self._open()
+
+    def compact(self) -> None:
+        """Rebuild from the tracked files, dropping tombstoned documents."""
+        paths = [Path(k) for k in self.files]
+        generation = self.generation + 1
+        self.close()
+        for name in ("meta.json", "terms.json", "postings.u32", "doclen.u32", "docfile.u32", "docspan.u64",
+                     "textoff.u64", "texts.bin"):
+            (self.dir / name).unlink(missing_ok=True)
+        self.files, self.terms, self._file_names = {}, {}, []
+        self.live_docs = self.total_len = 0
+        self.generation = generation
+        self.update(paths)
@@ -0,0 +1,304 @@
+"""Dense (embedding) retrieval over the chunks of a :class:`BM25Index`.
+
+The dense index does not chunk anything itself. Row ``i`` of its matrix is
+the embedding of BM25 document ``i``, so both indexes share one chunk store
+(``texts.bin``), one set of document ids and one tombstone list. It is
+stored in ``<bm25 index>/dense/``:
+
+``meta.json``
+    Embedding model, dimension, row count and the BM25 generation the rows
+    belong to.
+``embeddings.f16``
+    ``rows x dim`` unit-normalised ``float16`` matrix, memory-mapped.
+``ivf.json`` / ``ivf_centroids.f32`` / ``ivf_order.u32`` / ``ivf_offsets.u32``
+    Optional inverted-file index: k-means centroids and the row ids of each
+    list, stored contiguously. Rows appended after the IVF was built are
+    scanned exhaustively until it is rebuilt.
+
+:meth:`DenseIndex.sync` is incremental like :meth:`BM25Index.update`: it
+embeds only document ids it has not seen. Tombstoned documents keep a zero
+row and are masked at query time. When the lexical index is compacted (its
+``generation`` changes) ids are renumbered and every row is re-embedded.
+
+NumPy is an optional dependency (``pip install empyrean-ai[dense]``).
+"""
+
+from __future__ import annotations
+
+import json
+import math
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Sequence, Tuple
+
+from .bm25 import BM25Index, Hit, _write_atomic
+
+__all__ = ["DenseIndex", "reciprocal_rank_fusion"]
+
+EmbedFn = Callable[[List[str]], Awaitable[List[List[float]]]]
+
+_FORMAT = 1
+_BLOCK_ROWS = 16384  # rows scored per matmul: bounds the float32 temporary
+
+
+def _np() -> Any:
+    try:
+        import numpy as np
+    except ImportError as exc:  # pragma: no cover - optional dependency
+        raise RuntimeError("dense retrieval needs the optional 'numpy' package (empyrean-ai[dense])") from exc
+    return np
+
+
+def _normalise(np: Any, mat: Any) -> Any:
+    mat = np.asarray(mat, dtype=np.float32)
+    norms = np.linalg.norm(mat, axis=-1, keepdims=True)
+    return mat / np.maximum(norms, 1e-12)
+
+
+def _top_k(np: Any, ids: Any, scores: Any, k: int) -> List[Tuple[int, float]]:
+    if not len(scores):
+        return []
+    if k < len(scores):
+        part = np.argpartition(-scores, k - 1)[:k]
+        ids, scores = ids[part], scores[part]
+    order = np.lexsort((ids, -scores))  # best first, ties in doc order
+    return [(int(ids[i]), float(scores[i])) for i in order if scores[i] > -np.inf]
+
+
+class DenseIndex:
+    """Embedding matrix aligned with a BM25 index's document ids; see the module docstring."""
+
+    def __init__(self, index_dir: Path):
+        self.np = _np()
+        self.dir = Path(index_dir)
+        self.model: str | None = None
+        self.dim = 0
+        self.rows = 0
+        self.generation = 0
+        self._mat: Any = None
+        self._ivf: Dict[str, Any] | None = None
+        if (self.dir / "meta.json").is_file():
+            self._open()
+
+    # ------------------------------------------------------------------
+    # reading
+    def _open(self) -> None:
+        np = self.np
+        meta = json.loads((self.dir / "meta.json").read_text(encoding="utf-8"))
+        if meta.get("format") != _FORMAT:
+            raise ValueError(f"Unsupported dense index format in {self.dir}: {meta.get('format')!r}")
+        self.model, self.dim, self.rows = meta["model"], meta["dim"], meta["rows"]
+        self.generation = meta["generation"]
+        self._mat = None
+        if self.rows:
+            self._mat = np.memmap(self.dir / "embeddings.f16", dtype=np.float16, mode="r",
+                                  shape=(self.rows, self.dim))
+        self._ivf = None
+        if (self.dir / "ivf.json").is_file():
+            ivf = json.loads((self.dir / "ivf.json").read_text(encoding="utf-8"))
+            if ivf["generation"] == self.generation and ivf["rows"] <= self.rows:
+                nlist = ivf["nlist"]
+                self._ivf = {
+                    "rows": ivf["rows"],
+                    "centroids": np.fromfile(self.dir / "ivf_centroids.f32", dtype=np.float32).reshape(nlist, self.dim),
+                    "order": np.memmap(self.dir / "ivf_order.u32", dtype=np.uint32, mode="r"),
+                    "offsets": np.fromfile(self.dir / "ivf_offsets.u32", dtype=np.uint32),
+                }
+
+    def close(self) -> None:
+        self._mat = None
+        self._ivf = None
+
+    def __enter__(self) -> DenseIndex:
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return self.rows
+
+    def stats(self) -> dict:
+        return {"model": self.model, "dim": self.dim, "rows": self.rows, "generation": self.generation,
+                "ivf_lists": len(self._ivf["centroids"]) if self._ivf else 0,
+                "ivf_tail": self.rows - self._ivf["rows"] if self._ivf else self.rows}
+
+    def search(self, query: Sequence[float], k: int = 5, *, live: Any = None,
+               nprobe: int | None = 8) -> List[Tuple[int, float]]:
+        """Top ``k`` ``(doc_id, cosine)`` pairs for the query embedding, best first.
+
+        ``live`` is an optional boolean mask over document ids (see
+        :meth:`live_mask`). With an IVF index the ``nprobe`` nearest lists
+        are scanned, plus any rows added since it was built; ``nprobe=None``
+        forces an exact scan.
+        """
+        np = self.np
+        if k <= 0 or self._mat is None:
+            return []
+        q = _normalise(np, query)
+        if q.shape != (self.dim,):
+            raise ValueError(f"query has dimension {q.shape[-1]}, index has {self.dim}")
+        if self._ivf is not None and nprobe is not None and nprobe < len(self._ivf["centroids"]):
+            ids = self._probe(q, nprobe)
+            scores = self._mat[ids].astype(np.float32) @ q
+        else:
+            ids = np.arange(self.rows, dtype=np.int64)
+            scores = np.empty(self.rows, dtype=np.float32)
+            for start in range(0, self.rows, _BLOCK_ROWS):
+                end = min(self.rows, start + _BLOCK_ROWS)
+                scores[start:end] = self._mat[start:end].astype(np.float32) @ q
+        if live is not None:
+            scores[~live[ids]] = -np.inf
+        return _top_k(np, ids, scores, k)
+
+    def _probe(self, q: Any, nprobe: int) -> Any:
+        np = self.np
+        ivf = self._ivf
+        assert ivf is not None
+        lists = np.argpartition(-(ivf["centroids"] @ q), nprobe - 1)[:nprobe]
+        offsets, order = ivf["offsets"], ivf["order"]
+        parts = [order[offsets[c] : offsets[c + 1]] for c in np.sort(lists)]
+        parts.append(np.arange(ivf["rows"], self.rows))  # not in any list yet
+        ids = np.concatenate(parts).astype(np.int64)
+        ids.sort()  # sequential reads from the memmap
+        return ids
+
+    def live_mask(self, lexical: BM25Index) -> Any:
+        """Boolean mask of the document ids that are not tombstoned in ``lexical``."""
+        np = self.np
+        doclen = lexical.doc_lengths()
+        if doclen is None:
+            return np.zeros(self.rows, dtype=bool)
+        mask = np.frombuffer(doclen, dtype=np.uint32) != 0  # a copy: the mmap can still be closed
+        if len(mask) < self.rows:
+            mask = np.concatenate([mask, np.zeros(self.rows - len(mask), dtype=bool)])
+        return mask[: self.rows]
+
+    def retrieve(self, lexical: BM25Index, query: Sequence[float], k: int = 5,
+                 nprobe: int | None = 8) -> List[Hit]:
+        """Top ``k`` chunks of ``lexical`` for the query embedding, as :class:`Hit` objects."""
+        if self.generation != lexical.generation:
+            return []  # ids were renumbered by a compaction; sync() first
+        return [lexical.hit(doc, score) for doc, score in self.search(query, k, live=self.live_mask(lexical),
+                                                                       nprobe=nprobe)]
+
+    # ------------------------------------------------------------------
+    # writing
+    def _write_meta(self) -> None:
+        meta = {"format": _FORMAT, "model": self.model, "dim": self.dim, "rows": self.rows,
+                "generation": self.generation}
+        _write_atomic(self.dir / "meta.json", json.dumps(meta).encode("utf-8"))
+
+    def _reset(self, model: str, generation: int) -> None:
+        self.close()
+        for name in ("meta.json", "embeddings.f16", "ivf.json", "ivf_centroids.f32", "ivf_order.u32",
+                     "ivf_offsets.u32"):
+            (self.dir / name).unlink(missing_ok=True)
+        self.model, self.dim, self.rows, self.generation = model, 0, 0, generation
+
+    async def sync(self, lexical: BM25Index, embed: EmbedFn, model: str, *, batch_size: int = 64,
+                   ivf_min_rows: int | None = None) -> dict:
+        """Embed the documents of ``lexical`` that have no row yet.
+
+        ``embed`` takes a batch of texts and returns one vector per text, e.g.
+        ``functools.partial(client.embed, model)``. A different ``model`` or a
+        compacted lexical index starts over. With ``ivf_min_rows`` the IVF
+        index is (re)built once there are that many rows and more than 10%
+        of them are outside it.
+        """
+        np = self.np
+        reset = self.model is not None and (self.model != model or self.generation != lexical.generation)
+        if reset or self.model is None:
+            self._reset(model, lexical.generation)
+        self.dir.mkdir(parents=True, exist_ok=True)
+        doclen = lexical.doc_lengths()
+        total = lexical.n_docs
+        embedded = skipped = pending = 0
+        path = self.dir / "embeddings.f16"
+        with path.open("ab") as out:
+            out.truncate(self.rows * self.dim * 2)  # drop rows left by an interrupted sync
+            for start in range(self.rows, total, batch_size):
+                docs = range(start, min(total, start + batch_size))
+                live = [d for d in docs if doclen is not None and doclen[d]]
+                vectors = await embed([lexical.text(d) for d in live]) if live else []
+                if len(vectors) != len(live):
+                    raise ValueError(f"embedder returned {len(vectors)} vectors for {len(live)} texts")
+                if not self.dim:
+                    if not vectors:  # dimension unknown: hold leading tombstones back
+                        pending += len(docs)
+                        skipped += len(docs)
+                        continue
+                    self.dim = len(vectors[0])
+                    out.write(np.zeros((pending, self.dim), dtype=np.float16).tobytes())
+                    self.rows += pending
+                block = np.zeros((len(docs), self.dim), dtype=np.float32)  # tombstones stay zero
+                if live:
+                    block[np.asarray(live) - start] = _normalise(np, vectors)
+                out.write(block.astype(np.float16).tobytes())
+                embedded += len(live)
+                skipped += len(docs) - len(live)
+                self.rows += len(docs)
+        self._write_meta()
+        self._open()
+        result = {"rows": self.rows, "embedded": embedded, "skipped": skipped, "reset": reset}
+        if ivf_min_rows is not None and self.rows >= ivf_min_rows:
+            covered = self._ivf["rows"] if self._ivf else 0
+            if self.rows - covered > 0.1 * self.rows:
+                self.build_ivf()
+                result["ivf_built"] = True
+        return result
+
+    def build_ivf(self, nlist: int | None = None, *, iters: int = 10, sample: int = 65536, seed: int = 0) -> None:
+        """Cluster the rows into ``nlist`` lists (default ``4 * sqrt(rows)``) with spherical k-means.
+
+        Centroids are trained on a sample of at most ``sample`` rows; every
+        row is then assigned to its nearest centroid.
+        """
+        np = self.np
+        if self._mat is None:
+            return
+        nlist = max(1, min(self.rows, nlist or int(4 * math.sqrt(self.rows))))
+        rng = np.random.default_rng(seed)
+        pick = np.sort(rng.choice(self.rows, size=min(sample, self.rows), replace=False))
+        train = self._mat[pick].astype(np.float32)
+        train = train[np.linalg.norm(train, axis=1) > 0]  # tombstones
+        if not len(train):
+            return
+        centroids = train[rng.choice(len(train), size=min(nlist, len(train)), replace=False)]
+        for _ in range(iters):
+            assign = np.argmax(train @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assign, train)
+            empty = np.bincount(assign, minlength=len(centroids)) == 0
+            sums[empty] = centroids[empty]  # keep centroids that lost all their points
+            centroids = _normalise(np, sums)
+
+        assign = np.empty(self.rows, dtype=np.int64)
+        for start in range(0, self.rows, _BLOCK_ROWS):
+            end = min(self.rows, start + _BLOCK_ROWS)
+            assign[start:end] = np.argmax(self._mat[start:end].astype(np.float32) @ centroids.T, axis=1)
+        order = np.argsort(assign, kind="stable").astype(np.uint32)
+        offsets = np.searchsorted(assign[order], np.arange(len(centroids) + 1)).astype(np.uint32)
+        self._ivf = None
+        _write_atomic(self.dir / "ivf_centroids.f32", centroids.astype(np.float32).tobytes())
+        _write_atomic(self.dir / "ivf_order.u32", order.tobytes())
+        _write_atomic(self.dir / "ivf_offsets.u32", offsets.tobytes())
+        info = {"nlist": len(centroids), "rows": self.rows, "generation": self.generation}
+        _write_atomic(self.dir / "ivf.json", json.dumps(info).encode("utf-8"))
+        self._open()
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[Hit]], k: int = 5, rrf_k: int = 60) -> List[Hit]:
+    """Fuse ranked hit lists by reciprocal rank: ``score = sum(1 / (rrf_k + rank))``.
+
+    Hits are identified by ``(path, start, end)``; the fused score replaces
+    the per-backend scores, which are not comparable (BM25 vs cosine).
+    """
+    fused: Dict[Tuple[str, int, int], float] = {}
+    first: Dict[Tuple[str, int, int], Hit] = {}
+    for ranking in rankings:
+        for rank, hit in enumerate(ranking, start=1):
+            key = (hit.path, hit.start, hit.end)
+            fused[key] = fused.get(key, 0.0) + 1.0 / (rrf_k + rank)
+            first.setdefault(key, hit)
+    best = sorted(fused.items(), key=lambda kv: -kv[1])[:k]  # stable: earlier lists win ties
+    return [Hit(first[key].path, first[key].start, first[key].end, first[key].text, score) for key, score in best]
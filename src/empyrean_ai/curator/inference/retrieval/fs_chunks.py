@@ -1,15 +1,69 @@
+"""File chunking for retrieval and map-reduce curation.
+
+:func:`chunk_file` and :func:`chunk_text` return every chunk as a list and
+hold the whole document in memory. :func:`iter_chunks` streams a file
+instead: it reads through ``mmap`` (bytes mode) or buffered binary reads
+(chars and lines modes), decodes UTF-8 incrementally so multi-byte
+characters are never split, and yields :class:`Chunk` objects carrying
+their byte offsets. Peak memory is bounded by the chunk size plus one read
+block.
+"""
+
 from __future__ import annotations
 
+import codecs
+import mmap
+from dataclasses import dataclass
 from pathlib import Path
-from typing import Literal
+from typing import BinaryIO, Iterator, List, Literal, Tuple, TypeGuard, get_args
+
+__all__ = ["Chunk", "ChunkMode", "StreamMode", "chunk_file", "chunk_text", "is_chunk_mode", "is_stream_mode",
+           "iter_chunks"]
+
+ChunkMode = Literal["chars", "lines", "tokens"]
+StreamMode = Literal["chars", "lines", "bytes"]
+
+_BLOCK = 1 << 16
+
 
+def is_chunk_mode(mode: str) -> TypeGuard[ChunkMode]:
+    """True when ``mode`` is a :func:`chunk_text` mode, e.g. one read from a request or config."""
+    return mode in get_args(ChunkMode)
 
-def chunk_file(path: Path, mode: Literal["chars", "lines"] = "chars", max_size: int = 2000) -> list[str]:
+
+def is_stream_mode(mode: str) -> TypeGuard[StreamMode]:
+    """True when ``mode`` is an :func:`iter_chunks` mode."""
+    return mode in get_args(StreamMode)
+
+
+def chunk_file(path: Path, mode: ChunkMode = "chars", max_size: int = 2000, overlap: int = 0,
+               chars_per_token: float = 4.0) -> list[str]:
     text = Path(path).read_text(encoding="utf-8")
+    return chunk_text(text, mode, max_size, overlap, chars_per_token)
+
+
+def chunk_text(text: str, mode: ChunkMode = "chars", max_size: int = 2000, overlap: int = 0,
+               chars_per_token: float = 4.0) -> list[str]:
+    """Split ``text`` into chunks of at most ``max_size`` chars, chars or estimated tokens.
+
+    Tokens are estimated at ``chars_per_token``; pass the target model
+    family's ratio (:meth:`ContextPacker.chars_per_token_for`).
+
+    ``overlap`` (same unit as ``max_size``) repeats the end of each chunk at
+    the start of the next, so facts straddling a boundary are seen whole.
+    """
     if not text:
         return []
     if max_size <= 0:
         raise ValueError("max_size must be > 0")
+    if overlap < 0 or overlap >= max_size:
+        raise ValueError("overlap must be >= 0 and < max_size")
+
+    if mode == "tokens":
+        from empyrean_ai.curator.context import ContextPacker
+
+        packer = ContextPacker({}, {"default": chars_per_token}, margin=0)
+        return packer.split(text, max_size, overlap=overlap)
 
     if mode == "lines":
         lines = text.splitlines(keepends=False)
@@ -22,14 +76,23 @@ def chunk_file(path: Path, mode: Literal["chars", "lines"] = "chars", max_size:
                 if buf:
                     chunks.append("\n".join(buf))
                     buf, size = [], 0
-                for i in range(0, len(ln), max_size):
+                for i in range(0, max(1, len(ln) - overlap), max_size - overlap):
                     chunks.append(ln[i : i + max_size])
                 continue
             sep = 1 if buf else 0
             if size + sep + len(ln) > max_size and buf:
                 chunks.append("\n".join(buf))
-                buf, size = [], 0
-                sep = 0
+                # carry whole trailing lines worth up to ``overlap`` chars
+                carry: list[str] = []
+                kept = 0
+                for prev in reversed(buf):
+                    if kept + len(prev) + 1 > overlap or kept + len(prev) + 1 + len(ln) > max_size:
+                        break
+                    carry.append(prev)
+                    kept += len(prev) + 1
+                buf = carry[::-1]
+                size = max(0, kept - 1)
+                sep = 1 if buf else 0
             buf.append(ln)
             size += sep + len(ln)
         if buf:
@@ -37,5 +100,189 @@ def chunk_file(path: Path, mode: Literal["chars", "lines"] = "chars", max_size:
         return chunks
 
     # Char mode
-    return [text[i : i + max_size] for i in range(0, len(text), max_size)]
+    step = max_size - overlap
+    return [text[i : i + max_size] for i in range(0, max(1, len(text) - overlap), step)]
+
+
+@dataclass(frozen=True)
+class Chunk:
+    """A chunk of a file and the byte span ``[start, end)`` it came from.
+
+    Offsets are exact for valid UTF-8. In lines mode the span runs from the
+    start of the first line to the end of the last one, excluding its line
+    terminator; ``text`` joins the lines with ``"\\n"``.
+    """
+
+    text: str
+    start: int
+    end: int
+
+
+class _Windows:
+    """Fixed-size character windows over text fed in pieces (chunk_text "chars" semantics)."""
+
+    def __init__(self, size: int, overlap: int, start: int):
+        self.size = size
+        self.step = size - overlap
+        self.overlap = overlap
+        self.buf = ""
+        self.offset = start  # byte offset of buf[0]
+        self.emitted = 0
 
+    @staticmethod
+    def _nbytes(text: str) -> int:
+        # surrogateescape round-trips undecodable bytes; decoded text is otherwise valid
+        return len(text.encode("utf-8", "surrogateescape"))
+
+    def feed(self, text: str) -> Iterator[Chunk]:
+        buf = self.buf + text
+        i = 0
+        while len(buf) - i >= self.size:
+            window = buf[i : i + self.size]
+            nbytes = self._nbytes(window)
+            yield Chunk(window, self.offset, self.offset + nbytes)
+            self.emitted += 1
+            self.offset += nbytes if self.step == self.size else self._nbytes(buf[i : i + self.step])
+            i += self.step
+        # slice once per feed rather than once per window
+        self.buf = buf[i:]
+
+    def close(self) -> Iterator[Chunk]:
+        # the tail is its own window unless it is already covered by the previous overlap
+        if self.buf and (not self.emitted or len(self.buf) > self.overlap):
+            yield Chunk(self.buf, self.offset, self.offset + self._nbytes(self.buf))
+        self.buf = ""
+
+
+def _check(max_size: int, overlap: int) -> None:
+    if max_size <= 0:
+        raise ValueError("max_size must be > 0")
+    if overlap < 0 or overlap >= max_size:
+        raise ValueError("overlap must be >= 0 and < max_size")
+
+
+def iter_chunks(path: Path, mode: StreamMode = "chars", max_size: int = 2000, overlap: int = 0,
+                errors: str = "strict") -> Iterator[Chunk]:
+    """Lazily chunk a UTF-8 file of any size.
+
+    ``chars`` and ``lines`` produce the same chunks as :func:`chunk_text` for
+    ``\\n`` or ``\\r\\n`` line endings. ``bytes`` windows are at most
+    ``max_size`` bytes and are cut back to character boundaries. ``overlap``
+    uses the same unit as ``max_size``. ``errors`` is passed to the UTF-8
+    decoder.
+    """
+    _check(max_size, overlap)
+    with Path(path).open("rb") as f:
+        if mode == "bytes":
+            yield from _byte_chunks(f, max_size, overlap, errors)
+        elif mode == "lines":
+            yield from _line_chunks(f, max_size, overlap, errors)
+        elif mode == "chars":
+            windows = _Windows(max_size, overlap, 0)
+            decoder = codecs.getincrementaldecoder("utf-8")(errors)
+            block = max(_BLOCK, max_size)
+            while raw := f.read(block):
+                yield from windows.feed(decoder.decode(raw))
+            yield from windows.feed(decoder.decode(b"", final=True))
+            yield from windows.close()
+        else:
+            raise ValueError(f"Unknown chunk mode {mode!r}; use chars, lines or bytes")
+
+
+def _boundary(mm: mmap.mmap, pos: int) -> int:
+    """Move ``pos`` back to the start of the UTF-8 character it falls in."""
+    floor = max(0, pos - 3)
+    while pos > floor and (mm[pos] & 0xC0) == 0x80:
+        pos -= 1
+    return pos
+
+
+def _byte_chunks(f: BinaryIO, max_size: int, overlap: int, errors: str) -> Iterator[Chunk]:
+    n = Path(f.name).stat().st_size
+    if n == 0:
+        return
+    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        start = 0
+        while True:
+            end = n if start + max_size >= n else _boundary(mm, start + max_size)
+            if end <= start:  # max_size smaller than one character
+                end = min(n, start + 4)
+            yield Chunk(mm[start:end].decode("utf-8", errors), start, end)
+            if end >= n:
+                return
+            nxt = _boundary(mm, end - overlap) if overlap else end
+            start = nxt if nxt > start else end
+
+
+def _read_pieces(f: BinaryIO, errors: str) -> Iterator[Tuple[str, int, bool]]:
+    """Yield ``(text, raw_bytes, ends_line)`` pieces of at most one block each.
+
+    The last piece always ends a line, even when the file has no trailing newline.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")(errors)
+    ended = True
+    while raw := f.readline(_BLOCK):
+        ended = raw.endswith(b"\n")
+        yield decoder.decode(raw), len(raw), ended
+    tail = decoder.decode(b"", final=True)
+    if tail or not ended:
+        yield tail, 0, True
+
+
+def _line_chunks(f: BinaryIO, max_size: int, overlap: int, errors: str) -> Iterator[Chunk]:
+    buf: List[Tuple[str, int, int]] = []  # (line, start, end) of the chunk being built
+    size = 0
+    pos = 0  # byte offset of the next unread byte
+    line_start = 0
+    parts: List[str] = []
+    part_len = 0
+    long: _Windows | None = None  # set while streaming a line longer than max_size
+
+    def flush() -> Chunk:
+        return Chunk("\n".join(t for t, _, _ in buf), buf[0][1], buf[-1][2])
+
+    for text, nbytes, ends in _read_pieces(f, errors):
+        pos += nbytes
+        term = 2 if text.endswith("\r\n") else 1 if text.endswith("\n") else 0
+        if term:
+            text = text[:-term]
+        if long is None and part_len + len(text) > max_size:
+            # wrap this line like chunk_text does: flush what we have, then window it
+            if buf:
+                yield flush()
+                buf, size = [], 0
+            long = _Windows(max_size, overlap, line_start)
+            yield from long.feed("".join(parts))
+            parts, part_len = [], 0
+        if long is not None:
+            yield from long.feed(text)
+        else:
+            parts.append(text)
+            part_len += len(text)
+        if not ends:
+            continue
+        line_end = pos - term
+        if long is not None:
+            yield from long.close()
+            long = None
+        else:
+            ln = "".join(parts)
+            sep = 1 if buf else 0
+            if buf and size + sep + len(ln) > max_size:
+                yield flush()
+                carry: List[Tuple[str, int, int]] = []
+                kept = 0
+                for prev in reversed(buf):
+                    if kept + len(prev[0]) + 1 > overlap or kept + len(prev[0]) + 1 + len(ln) > max_size:
+                        break
+                    carry.append(prev)
+                    kept += len(prev[0]) + 1
+                buf = carry[::-1]
+                size = max(0, kept - 1)
+                sep = 1 if buf else 0
+            buf.append((ln, line_start, line_end))
+            size += sep + len(ln)
+        parts, part_len = [], 0
+        line_start = pos
+    if buf:
+        yield flush()
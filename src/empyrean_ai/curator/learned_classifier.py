@@ -0,0 +1,244 @@
+"""Hashed n-gram logistic-regression task classifier (NumPy only).
+
+Texts are lowercased with whitespace collapsed. Features are the
+character n-grams of the text; n-grams that span spaces stand in for word
+and word-pair features. They are hashed into ``dim`` buckets (a power of
+two) and L2-normalised. A multinomial
+logistic regression over those buckets gives a probability per task
+family. The top probability is the confidence, which :class:`Router` checks
+before falling back to the keyword rules.
+
+Featurisation and inference are vectorised. A batch is joined into one
+code-point array and every n-gram is hashed at once with a polynomial
+rolling hash in ``uint64`` arithmetic. ``np.unique`` over ``row * dim +
+bucket`` then yields a sparse ``(indices, values, offsets)`` matrix, and the
+logits are one gather of weight rows followed by ``np.add.reduceat``. Only
+the first ``head_chars`` and last ``tail_chars`` characters of long inputs
+are featurised.
+
+The artifact is an ``.npz`` file holding only the non-zero weight rows, the
+classes and the feature settings, so it loads in milliseconds. Build it
+with ``aan router train`` from ``data/golden/tasks.jsonl`` and from logged
+runs that recorded their input (``run_log.input_chars`` in
+configs/runtime.yml).
+"""
+
+from __future__ import annotations
+
+import json
+import random
+from pathlib import Path
+from typing import Any, Iterable, List, Sequence, Tuple
+
+__all__ = ["LearnedClassifier", "load_examples"]
+
+FORMAT_VERSION = 1
+_BASE = 1_000_003
+_MIX = 0x9E3779B97F4A7C15  # Fibonacci hashing multiplier
+
+
+def _np() -> Any:
+    try:
+        import numpy as np
+    except ImportError as exc:  # pragma: no cover - optional dependency
+        raise RuntimeError("the learned router needs the optional 'numpy' package (empyrean-ai[dense])") from exc
+    return np
+
+
+def load_examples(golden: Path | None = None, runs: Iterable[dict] = (),
+                  run_weight: float = 0.5) -> List[Tuple[str, str, float]]:
+    """``(text, task_family, weight)`` training examples.
+
+    Golden items count fully. Run records are used only when they carry an
+    ``input`` and a winner that validated, at ``run_weight`` because their
+    label came from the router itself or from the caller.
+    """
+    out: List[Tuple[str, str, float]] = []
+    if golden is not None and Path(golden).is_file():
+        for line in Path(golden).read_text(encoding="utf-8").splitlines():
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            if isinstance(item.get("input"), str) and item.get("task_family"):
+                out.append((item["input"], item["task_family"], 1.0))
+    for rec in runs:
+        text, family = rec.get("input"), rec.get("task_family")
+        if isinstance(text, str) and text.strip() and family and (rec.get("winner") or {}).get("ok"):
+            out.append((text, family, run_weight))
+    return out
+
+
+class LearnedClassifier:
+    """Multinomial logistic regression over hashed n-gram features."""
+
+    def __init__(self, weights: Any, bias: Any, classes: Sequence[str], *, dim: int = 1 << 17,
+                 char_ngrams: Tuple[int, int] = (3, 5), head_chars: int = 4096, tail_chars: int = 1024):
+        self.np = _np()
+        self.W = weights
+        self.b = bias
+        self.classes = list(classes)
+        self.dim = int(dim)
+        if self.dim < 2 or self.dim & (self.dim - 1):
+            raise ValueError("dim must be a power of two")
+        self._shift = self.np.uint64(64 - (self.dim.bit_length() - 1))
+        self._dim = self.np.uint64(self.dim)
+        self._base = self.np.uint64(_BASE)
+        self._mix = self.np.uint64(_MIX)
+        self.char_ngrams = (int(char_ngrams[0]), int(char_ngrams[1]))
+        self.head_chars = int(head_chars)
+        self.tail_chars = int(tail_chars)
+
+    # ------------------------------------------------------------------
+    # features
+    def _normalise(self, text: str) -> str:
+        if len(text) > self.head_chars + self.tail_chars:
+            text = text[: self.head_chars] + " " + text[len(text) - self.tail_chars:]
+        return " " + " ".join(text.lower().split()) + " "
+
+    def encode(self, texts: Sequence[str]) -> Tuple[Any, Any, Any]:
+        """Sparse batch: ``(indices, values, offsets)`` with row ``i`` in ``offsets[i]:offsets[i + 1]``."""
+        np = self.np
+        codes = np.frombuffer("\0".join(map(self._normalise, texts)).encode("utf-32-le"),
+                              dtype=np.uint32).astype(np.uint64)
+        many = len(texts) > 1
+        if many:
+            # row of each position = separators before it; windows spanning a separator are dropped
+            row = np.concatenate(([0], np.cumsum(codes == 0, dtype=np.int64)))
+        keys = []
+        h = codes
+        lo, hi = self.char_ngrams
+        for n in range(2, hi + 1):
+            h = h[:-1] * self._base + codes[n - 1:]  # n-gram hashes from the (n-1)-gram ones
+            if n < lo or not h.size:
+                continue
+            bucket = (h * self._mix) >> self._shift
+            if many:
+                m = h.size
+                ok = row[n:n + m] == row[:m]
+                bucket = row[:m][ok].astype(np.uint64) * self._dim + bucket[ok]
+            keys.append(bucket)
+        if keys:
+            uniq, counts = np.unique(np.concatenate(keys), return_counts=True)
+        else:
+            uniq, counts = np.zeros(0, dtype=np.uint64), np.zeros(0, dtype=np.int64)
+        val = counts.astype(np.float32)
+        if many:
+            idx = (uniq % self._dim).astype(np.int64)
+            offsets = np.searchsorted(uniq // self._dim, np.arange(len(texts) + 1, dtype=np.uint64))
+            nonempty = np.diff(offsets) > 0
+            if val.size:
+                sq = np.add.reduceat(val * val, offsets[:-1][nonempty])
+                val /= np.sqrt(np.repeat(sq, np.diff(offsets)[nonempty]))
+            return idx, val, offsets.astype(np.int64)
+        if val.size:
+            val /= np.sqrt(np.dot(val, val))
+        return uniq.astype(np.int64), val, np.array([0, val.size], dtype=np.int64)
+
+    # ------------------------------------------------------------------
+    # inference
+    def _logits(self, idx: Any, val: Any, offsets: Any, W: Any, b: Any) -> Any:
+        np = self.np
+        n = len(offsets) - 1
+        if n == 1:
+            return (b + val @ W[idx])[None, :]
+        logits = np.tile(b, (n, 1))
+        nonempty = np.diff(offsets) > 0
+        if idx.size:
+            contrib = W[idx] * val[:, None]
+            logits[nonempty] += np.add.reduceat(contrib, offsets[:-1][nonempty], axis=0)
+        return logits
+
+    def _softmax(self, logits: Any) -> Any:
+        np = self.np
+        z = np.exp(logits - logits.max(axis=1, keepdims=True))
+        return z / z.sum(axis=1, keepdims=True)
+
+    def proba_batch(self, texts: Sequence[str]) -> Any:
+        """``(len(texts), len(classes))`` class probabilities."""
+        return self._softmax(self._logits(*self.encode(texts), self.W, self.b))
+
+    def predict_batch(self, texts: Sequence[str]) -> List[Tuple[str, float]]:
+        """``(task_family, confidence)`` per text."""
+        if not texts:
+            return []
+        p = self.proba_batch(texts)
+        best = p.argmax(axis=1)
+        return [(self.classes[j], float(p[i, j])) for i, j in enumerate(best)]
+
+    def predict(self, text: str) -> Tuple[str, float]:
+        return self.predict_batch([text])[0]
+
+    # ------------------------------------------------------------------
+    # training
+    @classmethod
+    def train(cls, examples: Sequence[Tuple[str, str, float]], *, dim: int = 1 << 17,
+              char_ngrams: Tuple[int, int] = (3, 5), epochs: int = 200, lr: float = 0.1,
+              l2: float = 1e-4, seed: int = 0) -> LearnedClassifier:
+        """Fit with full-batch Adam on the weighted cross-entropy plus an L2 penalty."""
+        np = _np()
+        if not examples:
+            raise ValueError("no training examples")
+        classes = sorted({label for _, label, _ in examples})
+        model = cls(np.zeros((dim, len(classes)), dtype=np.float32), np.zeros(len(classes), dtype=np.float32),
+                    classes, dim=dim, char_ngrams=char_ngrams)
+        rng = random.Random(seed)
+        order = list(range(len(examples)))
+        rng.shuffle(order)
+        texts = [examples[i][0] for i in order]
+        y = np.asarray([classes.index(examples[i][1]) for i in order])
+        w = np.asarray([examples[i][2] for i in order], dtype=np.float32)
+        w /= w.sum()
+        idx, val, offsets = model.encode(texts)
+        rows = np.repeat(np.arange(len(texts)), np.diff(offsets))
+        onehot = np.eye(len(classes), dtype=np.float32)[y]
+        # only buckets that occur can move, so the optimiser works on those rows
+        used = np.unique(idx)
+        local = np.searchsorted(used, idx)
+        W = np.zeros((used.size, len(classes)), dtype=np.float32)
+        b = np.zeros(len(classes), dtype=np.float32)
+        state = [np.zeros_like(W), np.zeros_like(W), np.zeros_like(b), np.zeros_like(b)]
+        beta1, beta2, eps = 0.9, 0.999, 1e-8
+        for t in range(1, epochs + 1):
+            p = model._softmax(model._logits(local, val, offsets, W, b))
+            g = (p - onehot) * w[:, None]
+            contrib = g[rows] * val[:, None]
+            gW = np.stack([np.bincount(local, weights=contrib[:, c], minlength=used.size)
+                           for c in range(len(classes))], axis=1).astype(np.float32) + l2 * W
+            gb = g.sum(axis=0)
+            for param, grad, m, v in ((W, gW, state[0], state[1]), (b, gb, state[2], state[3])):
+                m *= beta1
+                m += (1 - beta1) * grad
+                v *= beta2
+                v += (1 - beta2) * grad * grad
+                param -= lr * (m / (1 - beta1 ** t)) / (np.sqrt(v / (1 - beta2 ** t)) + eps)
+        model.W[used] = W
+        model.b = b
+        return model
+
+    # ------------------------------------------------------------------
+    # artifact
+    def save(self, path: Path) -> None:
+        np = self.np
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        rows = np.flatnonzero(np.any(self.W != 0, axis=1))
+        meta = {"version": FORMAT_VERSION, "dim": self.dim, "char_ngrams": list(self.char_ngrams),
+                "head_chars": self.head_chars, "tail_chars": self.tail_chars, "classes": self.classes}
+        tmp = path.with_name(path.name + ".tmp")
+        with tmp.open("wb") as f:
+            np.savez(f, rows=rows.astype(np.int64), weights=self.W[rows], bias=self.b,
+                     meta=np.frombuffer(json.dumps(meta).encode("utf-8"), dtype=np.uint8))
+        tmp.replace(path)
+
+    @classmethod
+    def load(cls, path: Path) -> LearnedClassifier:
+        np = _np()
+        with np.load(Path(path)) as z:
+            meta = json.loads(z["meta"].tobytes().decode("utf-8"))
+            if meta.get("version") != FORMAT_VERSION:
+                raise ValueError(f"{path}: unsupported classifier format {meta.get('version')}")
+            W = np.zeros((int(meta["dim"]), len(meta["classes"])), dtype=np.float32)
+            W[z["rows"]] = z["weights"]
+            bias = z["bias"].astype(np.float32)
+        return cls(W, bias, meta["classes"], dim=meta["dim"], char_ngrams=tuple(meta["char_ngrams"]),
+                   head_chars=meta["head_chars"], tail_chars=meta["tail_chars"])
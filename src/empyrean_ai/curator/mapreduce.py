@@ -0,0 +1,98 @@
+"""Map-reduce curation over large inputs.
+
+Large documents are split into chunks (see ``retrieval.fs_chunks``), each
+chunk is curated on its own and the per-chunk JSON outputs are merged by a
+family-specific reducer. The reducers are local and deterministic; the merged
+document is validated against the same output schema as a single-shot result.
+"""
+
+from __future__ import annotations
+
+from collections import Counter
+from typing import Any, Callable, Dict, Iterable, List
+
+__all__ = ["REDUCERS", "reduce_outputs"]
+
+Reducer = Callable[[List[Dict[str, Any]]], Dict[str, Any]]
+
+
+def _unique(values: Iterable[Any]) -> List[Any]:
+    seen: set = set()
+    out = []
+    for v in values:
+        marker = repr(v)
+        if marker not in seen:
+            seen.add(marker)
+            out.append(v)
+    return out
+
+
+def _join(parts: List[Dict[str, Any]], field: str, sep: str = "\n\n") -> str:
+    return sep.join(_unique(p[field] for p in parts if p.get(field)))
+
+
+def _first(parts: List[Dict[str, Any]], field: str) -> str:
+    return next((p[field] for p in parts if p.get(field)), "")
+
+
+def _mode(parts: List[Dict[str, Any]], field: str) -> str:
+    counts = Counter(p[field] for p in parts if p.get(field))
+    # most common; max() keeps the first of equal counts, i.e. the earliest chunk
+    return max(counts, key=counts.__getitem__) if counts else ""
+
+
+def _extraction(parts: List[Dict[str, Any]]) -> Dict[str, Any]:
+    return {"items": _unique(item for p in parts for item in p.get("items", []))}
+
+
+def _analytical(parts: List[Dict[str, Any]]) -> Dict[str, Any]:
+    return {"answer": _join(parts, "answer"), "reasoning": _join(parts, "reasoning")}
+
+
+def _code_assist(parts: List[Dict[str, Any]]) -> Dict[str, Any]:
+    out = {"summary": _join(parts, "summary"), "plan": _join(parts, "plan"), "language": _mode(parts, "language")}
+    diff = _join(parts, "diff", "\n")
+    if diff:
+        out["diff"] = diff
+    return out
+
+
+def _design_rfc(parts: List[Dict[str, Any]]) -> Dict[str, Any]:
+    return {
+        "title": _first(parts, "title"),
+        "summary": _join(parts, "summary"),
+        "pros": _unique(x for p in parts for x in p.get("pros", [])),
+        "cons": _unique(x for p in parts for x in p.get("cons", [])),
+        "decision": _mode(parts, "decision"),
+    }
+
+
+def _bug_triage(parts: List[Dict[str, Any]]) -> Dict[str, Any]:
+    # the chunk most confident about the cause carries the diagnosis
+    best: Dict[str, Any] = max(parts, key=lambda p: float(p.get("confidence", 0.0)))
+    return dict(best)
+
+
+def _creative(parts: List[Dict[str, Any]]) -> Dict[str, Any]:
+    return {"title": _first(parts, "title"), "style": _mode(parts, "style"), "content": _join(parts, "content")}
+
+
+REDUCERS: Dict[str, Reducer] = {
+    "extraction": _extraction,
+    "analytical": _analytical,
+    "code_assist": _code_assist,
+    "design_rfc": _design_rfc,
+    "bug_triage": _bug_triage,
+    "creative": _creative,
+}
+
+
+def reduce_outputs(task_family: str, parts: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Merge parsed per-chunk outputs (in chunk order) for ``task_family``."""
+    if not parts:
+        raise ValueError("nothing to reduce: no chunk produced a usable output")
+    reducer = REDUCERS.get(task_family)
+    if reducer is None:
+        known = ", ".join(sorted(REDUCERS))
+        raise KeyError(f"No map-reduce reducer for task_family {task_family!r}. Known: {known}")
+    return reducer(parts)
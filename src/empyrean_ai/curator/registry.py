@@ -1,6 +1,6 @@
 from __future__ import annotations
 from dataclasses import dataclass
-from typing import Dict, Optional
+from typing import Dict, List, Optional
 
 @dataclass(frozen=True)
 class ModelInfo:
@@ -8,13 +8,15 @@ class ModelInfo:
     ollama_name: str
     context_max: int
     family: str
+    max_concurrency: int = 1
 
 class ModelRegistry:
     def __init__(self, cfg: dict):
         self._models: Dict[str, ModelInfo] = {}
         for k, v in cfg["models"]["models"].items():
             self._models[k] = ModelInfo(
-                key=k, ollama_name=v["ollama_name"], context_max=v["context_max"], family=v["family"]
+                key=k, ollama_name=v["ollama_name"], context_max=v["context_max"], family=v["family"],
+                max_concurrency=int(v.get("max_concurrency", 1)),
             )
         self._aliases: Dict[str, str] = cfg["models"].get("aliases", {})
 
@@ -25,6 +27,10 @@ class ModelRegistry:
             raise KeyError(f"Unknown model: {name}")
         return self._models[name]
 
+    def by_context(self) -> List[ModelInfo]:
+        """All models, smallest context window first."""
+        return sorted(self._models.values(), key=lambda m: m.context_max)
+
     def smallest_for_family(self, task_family: str) -> ModelInfo:
         # simple heuristic: pick initial from routing task_map
         return self.resolve(self.routing_initial(task_family))
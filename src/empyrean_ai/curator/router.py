@@ -1,29 +1,77 @@
 from __future__ import annotations
+import logging
 import re
-from typing import Dict, List
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Sequence
+
+from .classifier import KeywordClassifier
+from .escalation import EscalationPolicy
+from .learned_classifier import LearnedClassifier
+
+log = logging.getLogger(__name__)
 
 UNCERTAINTY = re.compile(r"\b(not sure|uncertain|unsure|might be|maybe)\b", re.I)
 
+BASE_DIR = Path(__file__).resolve().parents[3]
+
+
+@dataclass(frozen=True)
+class Classification:
+    task_family: str
+    confidence: float
+    source: str  # hint | learned | keywords
+
+
+def _open_learned(node: dict, base_dir: Path) -> LearnedClassifier | None:
+    if node.get("backend", "keywords") != "learned":
+        return None
+    path = Path((node.get("learned") or {}).get("path", "data/router/classifier.npz"))
+    path = path if path.is_absolute() else base_dir / path
+    if not path.is_file():
+        log.warning("learned router enabled but no model at %s; run 'aan router train'", path)
+        return None
+    try:
+        return LearnedClassifier.load(path)
+    except (RuntimeError, ValueError, OSError) as exc:  # numpy is optional
+        log.warning("learned router disabled: %s", exc)
+        return None
+
+
 class Router:
-    def __init__(self, routing_cfg: dict, aliases: Dict[str, str] | None = None):
+    def __init__(self, routing_cfg: dict, aliases: Dict[str, str] | None = None, base_dir: Path | None = None,
+                 learned: LearnedClassifier | None = None):
         self.cfg = routing_cfg
         self.aliases = aliases or {}
+        node = routing_cfg.get("classifier") or {}
+        self.classifier = KeywordClassifier.from_config(node)
+        # optional hashed n-gram model; below min_confidence the keyword rules decide
+        self.learned = learned if learned is not None else _open_learned(node, base_dir or BASE_DIR)
+        self.min_confidence = float((node.get("learned") or {}).get("min_confidence", 0.6))
 
-    def classify(self, text: str, hint: str | None = None) -> str:
+    def route(self, text: str, hint: str | None = None) -> Classification:
+        """Task family for ``text`` with its confidence and which classifier decided."""
         if hint:
-            return hint
-        t = text.lower()
-        if any(k in t for k in ["bug", "stack trace", "traceback", "exception"]):
-            return "bug_triage"
-        if any(k in t for k in ["diff", "implement", "code", "function", "class "]):
-            return "code_assist"
-        if any(k in t for k in ["design", "rfc", "architecture", "trade-off", "tradeoff"]):
-            return "design_rfc"
-        if any(k in t for k in ["extract", "fields", "json only", "key:"]):
-            return "extraction"
-        if any(k in t for k in ["story", "blog", "creative"]):
-            return "creative"
-        return "analytical"
+            return Classification(hint, 1.0, "hint")
+        return self.route_batch([text])[0]
+
+    def route_batch(self, texts: Sequence[str]) -> List[Classification]:
+        """:meth:`route` for many texts; the learned model scores them in one vectorised pass."""
+        learned = self.learned.predict_batch(texts) if self.learned is not None else [None] * len(texts)
+        out = []
+        for text, pred in zip(texts, learned):
+            if pred is not None and pred[1] >= self.min_confidence:
+                out.append(Classification(pred[0], pred[1], "learned"))
+            else:
+                family, confidence = self.classifier.predict(text)
+                out.append(Classification(family, confidence, "keywords"))
+        return out
+
+    def classify(self, text: str, hint: str | None = None) -> str:
+        return self.route(text, hint).task_family
+
+    def classify_batch(self, texts: Sequence[str]) -> List[str]:
+        return [c.task_family for c in self.route_batch(texts)]
 
     def initial_model(self, task_family: str) -> str:
         return self.cfg["task_map"][task_family]["initial"]
@@ -31,9 +79,17 @@ class Router:
     def escalation_chain(self, task_family: str) -> List[str]:
         return list(self.cfg["task_map"][task_family]["chain"])
 
+    def initial_candidates(self, task_family: str) -> List[str]:
+        """The initial model followed by any configured equivalent ``alternates``."""
+        node = self.cfg["task_map"][task_family]
+        return [node["initial"]] + [m for m in node.get("alternates", []) if m != node["initial"]]
+
     def needs_escalation(self, signals: List[str]) -> bool:
         allowed = set(self.cfg["defaults"]["escalate_on"])
         return any(s in allowed for s in signals)
 
+    def escalation_policy(self, strategy: str | None = None) -> EscalationPolicy:
+        return EscalationPolicy.from_config(self.cfg, strategy)
+
     def alias(self, model_name: str) -> str:
         return self.aliases.get(model_name, model_name)
@@ -0,0 +1,285 @@
+"""Per-model admission control in front of the Ollama client.
+
+Each Ollama model gets a lane with a concurrency limit and a bounded priority
+queue. Callers wait in the queue until a slot frees up; repairs go before
+escalations, which go before initial calls, so work already in progress is
+finished first. A caller whose deadline passes while queued is shed with
+:class:`DeadlineExceeded`; a caller arriving at a full queue is rejected
+with :class:`QueueFull`. Limits live in configs/models.yml.
+
+An optional model-affinity mode groups queued work by model to avoid
+swapping models in and out of GPU memory; see :class:`ModelScheduler`.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import heapq
+import itertools
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from enum import IntEnum
+from typing import AsyncIterator, Dict, Iterable, List, Sequence, Tuple
+
+__all__ = ["Priority", "AdmissionError", "QueueFull", "DeadlineExceeded", "ModelScheduler"]
+
+
+class Priority(IntEnum):
+    """Lower values are served first."""
+
+    REPAIR = 0
+    ESCALATION = 1
+    INITIAL = 2
+
+
+class AdmissionError(Exception):
+    """A generation was not admitted; ``status_code`` is the HTTP status to report."""
+
+    status_code = 503
+
+    def __init__(self, model: str, message: str, retry_after: float | None = None):
+        super().__init__(message)
+        self.model = model
+        self.retry_after = retry_after
+
+
+class QueueFull(AdmissionError):
+    status_code = 429
+
+
+class DeadlineExceeded(AdmissionError):
+    status_code = 503
+
+
+_Waiter = Tuple[int, int, float, "asyncio.Future[None]"]
+
+
+class _Lane:
+    __slots__ = ("limit", "active", "queue", "admitted", "shed", "rejected", "wait_total", "wait_max",
+                 "loads", "load_seconds")
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.active = 0
+        self.queue: List[_Waiter] = []
+        self.admitted = 0
+        self.shed = 0
+        self.rejected = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.loads = 0
+        self.load_seconds = 0.0
+
+    def queued(self) -> int:
+        return sum(1 for w in self.queue if not w[3].done())
+
+    def oldest(self) -> float | None:
+        """Enqueue time of the longest-waiting live caller."""
+        times = [w[2] for w in self.queue if not w[3].done()]
+        return min(times) if times else None
+
+    def pop(self) -> "asyncio.Future[None] | None":
+        while self.queue:
+            fut = heapq.heappop(self.queue)[3]
+            if not fut.done():
+                return fut
+        return None
+
+
+class ModelScheduler:
+    """Per-model concurrency limits with a bounded priority queue per model.
+
+    With ``affinity`` enabled the scheduler also limits how many distinct
+    models run at once (``max_resident``, matching what the Ollama host can
+    keep loaded). Queued generations for a model that is already running are
+    drained as a batch; another model is only opened when a slot is free or
+    when its oldest caller has waited ``max_wait_s``, at which point the
+    running models stop taking new work until they drain. Models known to be
+    resident (see :meth:`set_resident`) are opened first.
+    """
+
+    def __init__(self, limits: Dict[str, int] | None = None, default_limit: int = 1, max_queue: int = 64,
+                 default_deadline_s: float | None = None, *, affinity: bool = False, max_resident: int = 1,
+                 max_wait_s: float = 5.0, load_threshold_s: float = 0.5):
+        self.limits = dict(limits or {})
+        self.default_limit = max(1, default_limit)
+        self.max_queue = max(0, max_queue)
+        self.default_deadline_s = default_deadline_s
+        self.affinity = affinity
+        self.max_resident = max(1, max_resident)
+        self.max_wait_s = max_wait_s
+        self.load_threshold_s = load_threshold_s
+        self.swaps = 0
+        self._lanes: Dict[str, _Lane] = {}
+        self._resident: OrderedDict[str, None] = OrderedDict()
+        self._seq = itertools.count()
+
+    @classmethod
+    def from_config(cls, models_cfg: dict) -> ModelScheduler:
+        """Build from configs/models.yml: per-model ``max_concurrency`` plus the ``scheduler`` section."""
+        node = models_cfg.get("scheduler") or {}
+        default_limit = int(node.get("default_max_concurrency", 1))
+        limits = {
+            m["ollama_name"]: int(m.get("max_concurrency", default_limit))
+            for m in (models_cfg.get("models") or {}).values()
+        }
+        deadline = node.get("default_deadline_s")
+        return cls(limits, default_limit, int(node.get("max_queue", 64)),
+                   float(deadline) if deadline is not None else None,
+                   affinity=bool(node.get("affinity", False)),
+                   max_resident=int(node.get("max_resident", 1)),
+                   max_wait_s=float(node.get("max_wait_s", 5.0)))
+
+    def _lane(self, model: str) -> _Lane:
+        lane = self._lanes.get(model)
+        if lane is None:
+            lane = self._lanes[model] = _Lane(max(1, self.limits.get(model, self.default_limit)))
+        return lane
+
+    def deadline_in(self, seconds: float | None = None) -> float | None:
+        """Absolute (monotonic) deadline ``seconds`` from now, or the configured default."""
+        s = self.default_deadline_s if seconds is None else seconds
+        return time.monotonic() + s if s is not None else None
+
+    # ------------------------------------------------------------------
+    # residency
+    @property
+    def resident(self) -> List[str]:
+        return list(self._resident)
+
+    def set_resident(self, models: Iterable[str]) -> None:
+        """Replace the resident set with what the inference host reports (e.g. /api/ps)."""
+        self._resident = OrderedDict((m, None) for m in models)
+
+    def prefer_resident(self, candidates: Sequence[str]) -> int:
+        """Index of the first resident model in ``candidates`` (0 when none is resident)."""
+        for i, m in enumerate(candidates):
+            if m in self._resident:
+                return i
+        return 0
+
+    def record_load(self, model: str, load_duration_ns: int | None) -> None:
+        """Account Ollama's reported ``load_duration`` for one generation."""
+        if not load_duration_ns:
+            return
+        seconds = load_duration_ns / 1e9
+        if seconds >= self.load_threshold_s:
+            lane = self._lane(model)
+            lane.loads += 1
+            lane.load_seconds += seconds
+
+    def _touch(self, model: str) -> None:
+        if model in self._resident:
+            self._resident.move_to_end(model)
+            return
+        self.swaps += 1
+        self._resident[model] = None
+        while len(self._resident) > self.max_resident:
+            self._resident.popitem(last=False)
+
+    # ------------------------------------------------------------------
+    def _fill(self, model: str, lane: _Lane) -> None:
+        while lane.active < lane.limit:
+            fut = lane.pop()
+            if fut is None:
+                return
+            lane.active += 1
+            self._touch(model)
+            fut.set_result(None)
+
+    def _dispatch(self) -> None:
+        if not self.affinity:
+            for model, lane in self._lanes.items():
+                self._fill(model, lane)
+            return
+        now = time.monotonic()
+        running = {m for m, lane in self._lanes.items() if lane.active > 0}
+        waiting = {m: t for m, lane in self._lanes.items() if (t := lane.oldest()) is not None}
+        overdue = {m for m, t in waiting.items() if m not in running and now - t >= self.max_wait_s}
+        if not overdue:
+            # keep batching the models that are already loaded and running
+            for m in running:
+                self._fill(m, self._lanes[m])
+        free = self.max_resident - len(running)
+        if free <= 0:
+            return
+        candidates = sorted(
+            (m for m in waiting if m not in running),
+            key=lambda m: (m not in overdue, m not in self._resident, waiting[m]),
+        )
+        for m in candidates[:free]:
+            self._fill(m, self._lanes[m])
+
+    async def acquire(self, model: str, priority: Priority = Priority.INITIAL, deadline: float | None = None) -> None:
+        lane = self._lane(model)
+        queued = lane.queued()
+        if queued >= self.max_queue and (queued or lane.active >= lane.limit):
+            lane.rejected += 1
+            raise QueueFull(model, f"queue for {model} is full ({self.max_queue} waiting)", retry_after=1.0)
+        timeout = None
+        if deadline is not None:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                lane.shed += 1
+                raise DeadlineExceeded(model, f"deadline passed before {model} could be scheduled")
+        fut: asyncio.Future[None] = asyncio.get_running_loop().create_future()
+        heapq.heappush(lane.queue, (int(priority), next(self._seq), time.monotonic(), fut))
+        self._dispatch()
+        t0 = time.perf_counter()
+        if not fut.done():
+            try:
+                await asyncio.wait_for(asyncio.shield(fut), timeout)
+            except asyncio.TimeoutError:
+                # a slot granted in the same tick the timer fired is kept
+                if not fut.done() or fut.cancelled():
+                    fut.cancel()
+                    lane.shed += 1
+                    raise DeadlineExceeded(model, f"waited {time.perf_counter() - t0:.1f}s for {model}; deadline exceeded") from None
+            except asyncio.CancelledError:
+                if fut.done() and not fut.cancelled():
+                    self.release(model)  # slot was handed to us but nobody will use it
+                else:
+                    fut.cancel()
+                raise
+            waited = time.perf_counter() - t0
+            lane.wait_total += waited
+            lane.wait_max = max(lane.wait_max, waited)
+        lane.admitted += 1
+
+    def release(self, model: str) -> None:
+        self._lane(model).active -= 1
+        self._dispatch()
+
+    @asynccontextmanager
+    async def slot(self, model: str, priority: Priority = Priority.INITIAL,
+                   deadline: float | None = None) -> AsyncIterator[None]:
+        await self.acquire(model, priority, deadline)
+        try:
+            yield
+        finally:
+            self.release(model)
+
+    def stats(self) -> dict:
+        models = {}
+        for model, lane in self._lanes.items():
+            waited = lane.admitted or 1
+            models[model] = {
+                "limit": lane.limit,
+                "active": lane.active,
+                "queued": lane.queued(),
+                "admitted": lane.admitted,
+                "shed": lane.shed,
+                "rejected": lane.rejected,
+                "wait_avg_s": lane.wait_total / waited,
+                "wait_max_s": lane.wait_max,
+                "loads": lane.loads,
+                "load_seconds": lane.load_seconds,
+            }
+        return {
+            "affinity": self.affinity,
+            "resident": self.resident,
+            "swaps": self.swaps,
+            "load_seconds": sum(lane.load_seconds for lane in self._lanes.values()),
+            "models": models,
+        }
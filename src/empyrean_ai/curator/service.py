@@ -0,0 +1,165 @@
+"""Curation with escalation, shared by the HTTP API and the CLI.
+
+:class:`CurateService` classifies a request, picks its starting model
+(a resident equivalent, a long enough context window, the adaptive start),
+walks the escalation chain and caches accepted results. ``/v1/curate``,
+``/v1/curate/batch`` and ``aan batch`` all go through it, so a batch run
+from the command line escalates exactly like one posted to the server.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from pathlib import Path
+from typing import Any, AsyncIterable, AsyncIterator, Callable, Collection, Dict, Iterable, List, Mapping
+
+from .. import metrics
+from ..runlog import iter_runs, run_dir_from_config
+from .adaptive import AdaptiveRouter
+from .batch import BatchProgress, Item, run_batch
+from .engine import CuratorEngine
+from .escalation import run_chain
+from .registry import ModelInfo, ModelRegistry
+from .router import Router
+from .scheduler import Priority
+
+__all__ = ["CURATE_FIELDS", "CurateService"]
+
+# per-request options accepted by CurateService.curate (and on batch items)
+CURATE_FIELDS = ("task_family", "model", "n_candidates", "early_stop", "bypass_cache", "escalation", "deadline_s",
+                 "retrieve")
+
+
+class CurateService:
+    def __init__(self, cfg: dict, base: Path, *, max_concurrency: int | None = None):
+        self.cfg = cfg
+        self.base = Path(base)
+        self.registry = ModelRegistry(cfg)
+        self.registry.set_routing(cfg["routing"])
+        self.router = Router(cfg["routing"], aliases=cfg["models"].get("aliases", {}), base_dir=self.base)
+        self.engine = CuratorEngine(cfg, self.base, max_concurrency=max_concurrency)
+        self.adaptive = AdaptiveRouter.from_config(cfg["routing"])
+        # run records (and the adaptive router's history) live where configs/runtime.yml run_log puts them
+        self.run_dir = run_dir_from_config(cfg.get("runtime"), self.base)
+
+    async def start(self) -> None:
+        if self.adaptive.enabled:
+            # replay recent run logs so routing starts from observed outcomes
+            days = AdaptiveRouter.recent_days(int((self.cfg["routing"].get("adaptive") or {}).get("history_days", 14)))
+            await asyncio.to_thread(self.adaptive.load_runs, iter_runs(self.run_dir, days))
+        await self.engine.start()
+
+    async def aclose(self) -> None:
+        await self.engine.aclose()
+
+    def initial_model(self, task: str, model: str | None) -> ModelInfo:
+        if model not in (None, "auto"):
+            return self.registry.resolve(self.router.alias(model))
+        candidates = [self.registry.resolve(self.router.alias(k)) for k in self.router.initial_candidates(task)]
+        # with model affinity on, start on an equivalent model that is already loaded
+        scheduler = self.engine.scheduler
+        pick = scheduler.prefer_resident([m.ollama_name for m in candidates]) if scheduler.affinity else 0
+        return candidates[pick]
+
+    async def curate(self, text: str, *, task_family: str | None = None, model: str | None = "auto",
+                     n_candidates: int = 2, early_stop: bool | None = None, bypass_cache: bool = False,
+                     escalation: str | None = None, deadline_s: float | None = None, retrieve: bool | None = None,
+                     stream: bool | None = None, on_event: Callable[[dict], None] | None = None) -> Dict[str, Any]:
+        """Curate ``text``, escalating along the task family's chain until a result is acceptable.
+
+        ``deadline_s`` is a queueing budget for each step of the chain, counted
+        from when that step asks for its model; a slow first model does not
+        use up the budget of the escalations after it. Raises ``ValueError``
+        for an unknown ``escalation`` strategy.
+        """
+        engine, registry, router = self.engine, self.registry, self.router
+        started = time.perf_counter()
+        task = task_family or router.classify(text)
+        model_info = self.initial_model(task, model)
+        auto = model in (None, "auto")
+        if auto:
+            # inputs too large for the initial model go to one with a long enough context window
+            fallback = [m.ollama_name for m in [model_info] + registry.by_context()]
+            chosen = engine.pick_context_model(task, text, fallback)
+            if chosen != model_info.ollama_name:
+                model_info = next(m for m in registry.by_context() if m.ollama_name == chosen)
+        if on_event is not None:
+            on_event({"event": "start", "task_family": task, "model": model_info.key})
+        esc_key = None if bypass_cache else await engine.escalation_cache_key(task, text, model_info.ollama_name, retrieve)
+        if esc_key is not None and engine.cache is not None:
+            hit = await engine.cache.aget(esc_key)
+            if hit is not None:
+                return {**hit, "meta": {**hit["meta"], "cache": "hit"}}
+        policy = router.escalation_policy(escalation)
+        steps = [model_info.key] + [k for k in (registry.resolve(router.alias(c)).key for c in router.escalation_chain(task)) if k != model_info.key]
+        routing = None
+        if auto:
+            # start further down the chain when the earlier models rarely pass (configs/routing.yml 'adaptive')
+            # but never at a model whose context window cannot hold the input
+            names = [registry.resolve(k).ollama_name for k in steps]
+            decision = self.adaptive.choose(task, names, engine.context_fits(task, text, names))
+            metrics.ROUTING_DECISIONS.inc(task, decision.mode)
+            routing = decision.explain(steps)
+            steps = steps[decision.start:]
+
+        async def attempt(key: str, depth: int) -> dict:
+            if depth and on_event is not None:
+                on_event({"event": "escalate", "model": key, "depth": depth})
+            name = registry.resolve(key).ollama_name
+            out = await engine.curate(task, text, name, n_candidates=n_candidates, run_dir=self.run_dir,
+                                      early_stop=early_stop, stream=stream, on_event=on_event,
+                                      use_cache=not bypass_cache,
+                                      priority=Priority.ESCALATION if depth else Priority.INITIAL,
+                                      deadline=engine.scheduler.deadline_in(deadline_s), retrieve=retrieve)
+            meta = out["meta"]
+            if meta.get("cache") != "hit" and not meta.get("coalesced") and "elapsed" in meta:
+                self.adaptive.observe(task, name, out["validation"]["ok"], out["validation"].get("signals", []),
+                                      meta["elapsed"], meta.get("tokens", 0))
+            return out
+
+        def acceptable(out: dict) -> bool:
+            return out["validation"]["ok"] and not router.needs_escalation(out["validation"].get("signals", []))
+
+        def rank(out: dict) -> tuple:
+            return (not out["validation"]["ok"], len(out["validation"].get("signals", [])))
+
+        out, model_used, trace = await run_chain(steps, attempt, acceptable, policy, rank)
+        metrics.ESCALATION_DEPTH.observe(steps.index(model_used) if model_used in steps else 0, task)
+        metrics.STAGE_SECONDS.observe(time.perf_counter() - started, "escalation", task, model_used)
+        result = {"task_family": task, "model_used": model_used, "output": out["text"], "validation": out["validation"], "meta": {**out["meta"], "escalation": trace}}
+        if routing is not None:
+            result["routing"] = routing
+        if esc_key is not None and engine.cache is not None and acceptable(out):
+            await engine.cache.aput(esc_key, result)
+        return result
+
+    def batch(self, items: Iterable[Item] | AsyncIterable[Item], *, max_in_flight: int | None = None,
+              done: Collection[str] = (), progress: BatchProgress | None = None, meta: bool = False,
+              defaults: Mapping[str, Any] | None = None) -> AsyncIterator[Dict[str, Any]]:
+        """:func:`run_batch` of :meth:`curate` over JSONL items (``input`` plus any of ``CURATE_FIELDS``).
+
+        ``defaults`` fill in options an item leaves out. Result lines drop
+        ``meta`` unless ``meta`` is set. Batch sizes come from
+        configs/runtime.yml ``batch``.
+        """
+        bcfg = self.cfg["runtime"].get("batch") or {}
+        defaults = dict(defaults or {})
+
+        def prepare(window: List[dict]) -> None:
+            # classify a window's unlabelled items in one batch; curate() reuses the task family
+            todo = [it for it in window if not it.get("task_family")]
+            for it, family in zip(todo, self.router.classify_batch([it["input"] for it in todo]), strict=True):
+                it["task_family"] = family
+
+        def key(item: dict) -> tuple:
+            item["task_family"] = item.get("task_family") or self.router.classify(item["input"])
+            return item["task_family"], self.initial_model(item["task_family"], item.get("model", defaults.get("model"))).key
+
+        async def process(item: dict) -> dict:
+            options = {**defaults, **{k: item[k] for k in CURATE_FIELDS if k in item}}
+            result = await self.curate(item["input"], **options)
+            return result if meta else {k: v for k, v in result.items() if k != "meta"}
+
+        return run_batch(items, process, key=key, max_in_flight=max_in_flight or int(bcfg.get("max_in_flight", 16)),
+                         window=int(bcfg.get("window", 256)), done=done, progress=progress, prepare=prepare)
@@ -0,0 +1,85 @@
+"""Single-flight coalescing of identical in-flight async calls.
+
+Concurrent callers that use the same key share one underlying task; each gets
+its result or the same exception. A caller that is cancelled (for example a
+client disconnecting) leaves without disturbing the others; the shared task is
+only cancelled once every caller has gone.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import functools
+from typing import Any, Awaitable, Callable, Dict, Generic, Tuple, TypeVar
+
+__all__ = ["SingleFlight"]
+
+T = TypeVar("T")
+
+
+class _Flight(Generic[T]):
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: asyncio.Future[T]):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Deduplicate concurrent calls by key."""
+
+    def __init__(self) -> None:
+        self._flights: Dict[str, _Flight[Any]] = {}
+        self.leaders = 0
+        self.coalesced = 0
+        self.abandoned = 0
+
+    def __len__(self) -> int:
+        return len(self._flights)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._flights
+
+    def _forget(self, key: str, flight: _Flight[Any]) -> None:
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+
+    def _forget_done(self, key: str, flight: _Flight[Any], _task: asyncio.Future[Any]) -> None:
+        self._forget(key, flight)
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[T]]) -> Tuple[T, bool]:
+        """Run ``fn`` once per key among concurrent callers.
+
+        Returns ``(result, joined)`` where ``joined`` is True for callers that
+        attached to a flight started by someone else.
+        """
+        flight = self._flights.get(key)
+        joined = flight is not None
+        if flight is None:
+            flight = _Flight(asyncio.ensure_future(fn()))
+            self._flights[key] = flight
+            flight.task.add_done_callback(functools.partial(self._forget_done, key, flight))
+            self.leaders += 1
+        else:
+            self.coalesced += 1
+        flight.waiters += 1
+        try:
+            result = await asyncio.shield(flight.task)
+        except asyncio.CancelledError:
+            if flight.waiters == 1 and not flight.task.done():
+                # nobody is left to receive the result; new callers start afresh
+                self._forget(key, flight)
+                flight.task.cancel()
+                self.abandoned += 1
+            raise
+        finally:
+            flight.waiters -= 1
+        return result, joined
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": len(self._flights),
+            "leaders": self.leaders,
+            "coalesced": self.coalesced,
+            "abandoned": self.abandoned,
+        }
@@ -4,15 +4,24 @@ This module provides the :class:`TemplateLibrary` class which offers a very
 small abstraction over filesystem based template loading and rendering.  The
 `CuratorEngine` makes use of this class to load prompt templates and inject
 user supplied content.
+
+Templates are compiled once into a :class:`CompiledTemplate`: the literal
+text between input placeholders, the template's sections (``system``,
+``instructions``, ``format_constraints``, ...) and its table of variant
+directives. Rendering is then a single ``str.join``. Compiled templates are
+reloaded when the file's mtime changes, checked at most once per
+``reload_interval`` seconds.
 """
 
 from __future__ import annotations
 
 import re
+import time
+from dataclasses import dataclass
 from pathlib import Path
-from typing import Dict, Final
+from typing import Dict, Final, List, Mapping, Tuple
 
-__all__ = ["TemplateLibrary"]
+__all__ = ["CompiledTemplate", "TemplateLibrary", "VARIANT_DIRECTIVES"]
 
 
 _INPUT_BLOCK_RE: Final = re.compile(
@@ -22,24 +31,150 @@ _INPUT_BLOCK_RE: Final = re.compile(
 _INPUT_PLACEHOLDER_RE: Final = re.compile(
     r"(?:\{\{input\}\}|\[\[input\]\]|\{input\})"
 )
+_SECTION_RE: Final = re.compile(r"^([A-Za-z_][\w-]*):[ \t]*(.*)$")
+
+#: Suffixes appended to the rendered prompt for candidate ``i``. Candidate 0
+#: is the plain prompt; a template's ``variants:`` block adds more.
+VARIANT_DIRECTIVES: Final[Tuple[str, ...]] = ("", "\nConstraint: be concise yet complete.")
+
+_COMPILED_STRINGS_MAX: Final = 64
+
+
+def _sanitize(user_input: str) -> str:
+    if "<" in user_input:  # skip the regex when there cannot be a tag
+        user_input = _INPUT_BLOCK_RE.sub("", user_input)
+    return user_input.strip()
+
+
+def _sections(text: str) -> Dict[str, str]:
+    """Top-level ``key: value`` and ``key: |`` blocks of a template.
+
+    Prompt templates are YAML-shaped but not valid YAML (the ``[USER]``
+    marker and the bare placeholder), so they are scanned line by line.
+    Unindented lines that are not keys are collected under ``body``.
+    """
+    out: Dict[str, List[str]] = {}
+    key: str | None = None
+    block = False
+    for line in text.splitlines():
+        m = _SECTION_RE.match(line)
+        if m is not None:
+            key, value = m.group(1), m.group(2).strip()
+            block = value in ("|", "|-", ">")
+            quoted = len(value) >= 2 and value[0] in "\"'" and value[-1] == value[0]
+            out[key] = [] if block else [value[1:-1] if quoted else value]
+        elif block and key is not None and (not line.strip() or line[:1] in " \t"):
+            out[key].append(line)
+        elif line.strip():
+            key, block = None, False
+            out.setdefault("body", []).append(line)
+    result: Dict[str, str] = {}
+    for k, lines in out.items():
+        indent = min((len(ln) - len(ln.lstrip()) for ln in lines if ln.strip()), default=0)
+        result[k] = "\n".join(ln[indent:] for ln in lines).strip("\n")
+    return result
+
+
+@dataclass(frozen=True)
+class CompiledTemplate:
+    """A template parsed for fast rendering.
+
+    ``segments`` are the literal pieces around the input placeholders, so a
+    template with ``n`` placeholders has ``n + 1`` segments.
+    """
+
+    name: str
+    source: str
+    segments: Tuple[str, ...]
+    sections: Mapping[str, str]
+    directives: Tuple[str, ...] = VARIANT_DIRECTIVES
+    mtime_ns: int = 0
+
+    @classmethod
+    def compile(cls, source: str, name: str = "<string>", mtime_ns: int = 0) -> CompiledTemplate:
+        sections = _sections(source)
+        extra = tuple("\n" + ln.strip() for ln in sections.get("variants", "").splitlines() if ln.strip())
+        return cls(name, source, tuple(_INPUT_PLACEHOLDER_RE.split(source)), sections,
+                   VARIANT_DIRECTIVES + extra, mtime_ns)
+
+    def render(self, user_input: str) -> str:
+        """The template with sanitised ``user_input`` in every placeholder."""
+        if len(self.segments) == 1:
+            return self.source
+        return _sanitize(user_input).join(self.segments)
+
+    def variants(self, prompt: str, n: int) -> List[str]:
+        """Up to ``n`` candidate prompts: ``prompt`` followed by each directive."""
+        return [prompt + d for d in self.directives[: max(1, n)]]
 
 
 class TemplateLibrary:
     """Filesystem-backed loader and renderer for prompt templates."""
 
     base_dir: Path
-    _cache: Dict[str, str]
+    _cache: Dict[str, CompiledTemplate]
+
+    def __init__(self, base_dir: Path, reload_interval: float = 1.0) -> None:
+        """Initialise the library with a root directory of templates.
 
-    def __init__(self, base_dir: Path) -> None:
-        """Initialise the library with a root directory of templates."""
+        ``reload_interval`` bounds how often a cached template's mtime is
+        checked; ``0`` checks on every access.
+        """
 
         self.base_dir = base_dir
+        self.reload_interval = reload_interval
         self._cache = {}
+        self._checked: Dict[str, float] = {}
+        self._compiled_strings: Dict[str, CompiledTemplate] = {}
+        self.reloads = 0
 
     def __repr__(self) -> str:  # pragma: no cover - convenience method
         return f"{self.__class__.__name__}(base_dir={self.base_dir!s})"
 
     # ------------------------------------------------------------------
+    def _path(self, name: str) -> Path:
+        base = self.base_dir.resolve()
+        path = (base / f"{name}.yml").resolve()
+
+        try:
+            # ``relative_to`` raises ValueError if path is not under base.
+            path.relative_to(base)
+        except ValueError:  # pragma: no cover - defensive programming
+            raise FileNotFoundError(
+                f"Refusing to load template outside base directory: {path}"
+            )
+        return path
+
+    def get(self, name: str) -> CompiledTemplate:
+        """Return the compiled template named ``name``, recompiling it if the file changed.
+
+        Raises
+        ------
+        FileNotFoundError
+            If the template does not exist or is outside ``base_dir``.
+        """
+
+        cached = self._cache.get(name)
+        now = time.monotonic()
+        if cached is not None and now - self._checked.get(name, 0.0) < self.reload_interval:
+            return cached
+
+        path = self._path(name)
+        if not path.is_file():
+            raise FileNotFoundError(
+                f"Template '{name}' not found under '{self.base_dir.resolve()}' (looked for '{path}')."
+            )
+        mtime_ns = path.stat().st_mtime_ns
+        self._checked[name] = now
+        if cached is not None and cached.mtime_ns == mtime_ns:
+            return cached
+
+        compiled = CompiledTemplate.compile(path.read_text(encoding="utf-8"), name, mtime_ns)
+        if cached is not None:
+            self.reloads += 1
+        self._cache[name] = compiled
+        return compiled
+
     def load(self, name: str) -> str:
         """Return the contents of the template named ``name``.
 
@@ -54,39 +189,34 @@ class TemplateLibrary:
             If the template does not exist or is outside ``base_dir``.
         """
 
-        if name in self._cache:
-            return self._cache[name]
+        return self.get(name).source
 
-        base = self.base_dir.resolve()
-        path = (base / f"{name}.yml").resolve()
+    def preload(self) -> List[str]:
+        """Compile every template under ``base_dir``; returns their names."""
 
-        try:
-            # ``relative_to`` raises ValueError if path is not under base.
-            path.relative_to(base)
-        except ValueError:  # pragma: no cover - defensive programming
-            raise FileNotFoundError(
-                f"Refusing to load template outside base directory: {path}"
-            )
-
-        if not path.is_file():
-            raise FileNotFoundError(
-                f"Template '{name}' not found under '{base}' (looked for '{path}')."
-            )
-
-        text = path.read_text(encoding="utf-8")
-        self._cache[name] = text
-        return text
+        if not self.base_dir.is_dir():
+            return []
+        names = [p.relative_to(self.base_dir).with_suffix("").as_posix()
+                 for p in sorted(self.base_dir.rglob("*.yml"))]
+        for name in names:
+            self.get(name)
+        return names
 
     # ------------------------------------------------------------------
-    def render(self, template: str, user_input: str) -> str:
+    def render(self, template: str | CompiledTemplate, user_input: str) -> str:
         """Inject ``user_input`` into ``template``.
 
         Any ``<USER-CONTENT>...</USER-CONTENT>`` blocks inside ``user_input``
         are removed prior to substitution.  The sanitised input replaces any of
         the placeholders ``{input}``, ``{{input}}`` and ``[[input]]`` in the
-        provided template.
+        provided template. Template strings are compiled on first use.
         """
 
-        sanitized = _INPUT_BLOCK_RE.sub("", user_input).strip()
-        return _INPUT_PLACEHOLDER_RE.sub(lambda _: sanitized, template)
-
+        if isinstance(template, str):
+            compiled = self._compiled_strings.get(template)
+            if compiled is None:
+                if len(self._compiled_strings) >= _COMPILED_STRINGS_MAX:
+                    self._compiled_strings.pop(next(iter(self._compiled_strings)))
+                compiled = self._compiled_strings[template] = CompiledTemplate.compile(template)
+            template = compiled
+        return template.render(user_input)
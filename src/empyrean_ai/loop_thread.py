@@ -0,0 +1,127 @@
+"""A managed event loop on a background thread for blocking callers.
+
+Synchronous entry points (``services/``, scripts, notebooks) call async code
+through :meth:`LoopThread.run`. Unlike ``asyncio.run`` per call, one loop
+lives for the whole process, so connection pools, semaphores and caches
+created on it are reused, and calls from several threads run concurrently
+on it.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import atexit
+import concurrent.futures
+import threading
+from typing import Any, Awaitable, Callable, Coroutine, List, TypeVar
+
+__all__ = ["LoopThread", "shared_loop"]
+
+T = TypeVar("T")
+
+Closer = Callable[[], Awaitable[None]]
+
+
+class LoopThread:
+    """An asyncio event loop running forever on a daemon thread."""
+
+    def __init__(self, name: str = "empyrean-loop") -> None:
+        self.name = name
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._thread: threading.Thread | None = None
+        self._closers: List[Closer] = []
+        self._lock = threading.Lock()
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        """The running loop, started on first use."""
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                ready = threading.Event()
+
+                def _main() -> None:
+                    asyncio.set_event_loop(loop)
+                    loop.call_soon(ready.set)
+                    loop.run_forever()
+
+                self._thread = threading.Thread(target=_main, name=self.name, daemon=True)
+                self._thread.start()
+                ready.wait()
+                self._loop = loop
+            return self._loop
+
+    def submit(self, coro: Coroutine[Any, Any, T]) -> concurrent.futures.Future[T]:
+        """Schedule ``coro`` on the loop and return a thread-safe future."""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run(self, coro: Coroutine[Any, Any, T], timeout: float | None = None) -> T:
+        """Run ``coro`` on the loop and block until it finishes.
+
+        On ``timeout`` the coroutine is cancelled and ``TimeoutError`` is
+        raised. Calling this from the loop's own thread would deadlock and
+        raises ``RuntimeError``.
+        """
+        if self._thread is not None and threading.current_thread() is self._thread:
+            coro.close()
+            raise RuntimeError("LoopThread.run() called from its own loop; await the coroutine instead")
+        fut = self.submit(coro)
+        try:
+            return fut.result(timeout)
+        except concurrent.futures.TimeoutError:
+            fut.cancel()
+            raise TimeoutError(f"timed out after {timeout}s") from None
+
+    async def forward(self, coro: Coroutine[Any, Any, T]) -> T:
+        """Await ``coro`` on this loop from any loop.
+
+        Objects bound to this loop (connection pools, engines) may then be
+        used from ``asyncio.run`` or another framework's loop. On this loop
+        ``coro`` is simply awaited.
+        """
+        if asyncio.get_running_loop() is self._loop:
+            return await coro
+        return await asyncio.wrap_future(self.submit(coro))
+
+    def add_closer(self, closer: Closer) -> None:
+        """Register an async cleanup (e.g. ``client.aclose``) to run on :meth:`close`."""
+        self._closers.append(closer)
+
+    def close(self, timeout: float = 5.0) -> None:
+        """Run the registered closers (last first), then stop the loop and join the thread."""
+        with self._lock:
+            loop, thread = self._loop, self._thread
+            self._loop = self._thread = None
+            closers, self._closers = self._closers[::-1], []
+        if loop is None or thread is None:
+            return
+
+        async def _shutdown() -> None:
+            for closer in closers:
+                try:
+                    await closer()
+                except Exception:  # one failing closer must not keep the others from running
+                    pass
+
+        try:
+            asyncio.run_coroutine_threadsafe(_shutdown(), loop).result(timeout)
+        except (concurrent.futures.TimeoutError, concurrent.futures.CancelledError, RuntimeError):
+            pass
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join(timeout)
+        if not thread.is_alive():
+            loop.close()
+
+
+_shared: LoopThread | None = None
+_shared_lock = threading.Lock()
+
+
+def shared_loop() -> LoopThread:
+    """The process-wide loop thread, closed at interpreter exit."""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = LoopThread()
+            atexit.register(_shared.close)
+        return _shared
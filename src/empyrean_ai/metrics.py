@@ -0,0 +1,204 @@
+"""In-process counters and histograms with Prometheus text exposition.
+
+Metrics are created once at import and looked up by label values on the hot
+path. Recording costs a dict lookup, a ``bisect`` over the bucket bounds
+and a few additions under an uncontended lock, so it is safe from the event
+loop and from worker threads alike. :meth:`Registry.render` produces the
+text format served on ``/metrics``; no client library is needed.
+
+The metric families used across the package are defined at the bottom of
+this module.
+"""
+
+from __future__ import annotations
+
+import math
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Sequence, Tuple
+
+__all__ = [
+    "Counter", "Histogram", "Registry", "REGISTRY", "render",
+    "STAGE_SECONDS", "QUEUE_WAIT_SECONDS", "TOKENS", "TOKENS_PER_SECOND", "LOAD_SECONDS",
+    "RETRIES", "CACHE_REQUESTS", "REPAIRS", "ESCALATION_DEPTH", "REQUESTS", "ROUTING_DECISIONS",
+    "PREFILL_TOKENS", "PREFILL_SAVED_SECONDS",
+]
+
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+RATE_BUCKETS = (1.0, 2.0, 5.0, 10.0, 20.0, 30.0, 50.0, 75.0, 100.0, 150.0, 250.0, 500.0, 1000.0, 5000.0)
+DEPTH_BUCKETS = (0.0, 1.0, 2.0, 3.0, 4.0, 5.0)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _num(v: float) -> str:
+    if v == math.inf:
+        return "+Inf"
+    return repr(float(v)) if not float(v).is_integer() else str(int(v))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, doc: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.doc = doc
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+
+    def _key(self, values: Sequence[str]) -> Tuple[str, ...]:
+        if len(values) != len(self.labels):
+            raise ValueError(f"{self.name} takes labels {self.labels}, got {tuple(values)}")
+        return tuple(str(v) for v in values)
+
+    def render(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, doc: str, labels: Sequence[str] = ()):
+        super().__init__(name, doc, labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}_total{_labels(self.labels, k)} {_num(v)}" for k, v in items]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, doc: str, labels: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, doc, labels)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [per-bucket counts (last is +Inf), sum, count]
+        self._series: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        key = self._key(labels)
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+
+    @contextmanager
+    def time(self, *labels: str) -> Iterator[None]:
+        """Observe the wall time of the ``with`` block."""
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - t0, *labels)
+
+    def snapshot(self, *labels: str) -> Tuple[int, float]:
+        """``(count, sum)`` for one label set."""
+        series = self._series.get(self._key(labels))
+        return (series[2], series[1]) if series else (0, 0.0)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted((k, ([*s[0]], s[1], s[2])) for k, s in self._series.items())
+        lines = []
+        for key, (counts, total, n) in items:
+            cumulative = 0
+            for bound, c in zip((*self.buckets, math.inf), counts):
+                cumulative += c
+                le = 'le="' + _num(bound) + '"'
+                lines.append(f"{self.name}_bucket{_labels(self.labels, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labels, key)} {_num(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labels, key)} {n}")
+        return lines
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"metric {metric.name} already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, doc: str, labels: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, doc, labels))  # type: ignore[return-value]
+
+    def histogram(self, name: str, doc: str, labels: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, doc, labels, buckets))  # type: ignore[return-value]
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format (version 0.0.4)."""
+        out: List[str] = []
+        for m in self._metrics.values():
+            out.append(f"# HELP {m.name} {m.doc}")
+            out.append(f"# TYPE {m.name} {m.kind}")
+            out.extend(m.render())
+        return "\n".join(out) + "\n"
+
+
+REGISTRY = Registry()
+
+
+def render() -> str:
+    return REGISTRY.render()
+
+
+STAGE_SECONDS = REGISTRY.histogram(
+    "empyrean_stage_seconds",
+    "Wall time per curation stage (render, queue, generate, validate, salvage, repair, curate, escalation).",
+    ("stage", "task_family", "model"))
+QUEUE_WAIT_SECONDS = REGISTRY.histogram(
+    "empyrean_queue_wait_seconds", "Time spent waiting for a scheduler slot.", ("model", "priority"))
+TOKENS = REGISTRY.counter(
+    "empyrean_tokens", "Tokens reported by Ollama (prompt_eval_count, eval_count).", ("model", "kind"))
+TOKENS_PER_SECOND = REGISTRY.histogram(
+    "empyrean_tokens_per_second", "Ollama throughput from eval_duration and prompt_eval_duration.",
+    ("model", "phase"), RATE_BUCKETS)
+LOAD_SECONDS = REGISTRY.histogram(
+    "empyrean_model_load_seconds", "Ollama load_duration per generation (model swaps show up here).", ("model",))
+RETRIES = REGISTRY.counter(
+    "empyrean_retries", "Calls retried by with_retry, by exception type.", ("exception",))
+CACHE_REQUESTS = REGISTRY.counter(
+    "empyrean_cache_requests", "Response cache lookups by result (hit, miss, coalesced).", ("task_family", "result"))
+REPAIRS = REGISTRY.counter(
+    "empyrean_repairs", "Invalid candidates fixed locally (salvage) or by a repair generation (llm).",
+    ("task_family", "kind"))
+ESCALATION_DEPTH = REGISTRY.histogram(
+    "empyrean_escalation_depth", "Position in the escalation chain of the model that produced the result.",
+    ("task_family",), DEPTH_BUCKETS)
+REQUESTS = REGISTRY.counter(
+    "empyrean_requests", "Curate calls by outcome (ok, invalid).", ("task_family", "outcome"))
+ROUTING_DECISIONS = REGISTRY.counter(
+    "empyrean_routing_decisions", "Starting-model decisions of the adaptive router (static, adaptive, explore).",
+    ("task_family", "mode"))
+PREFILL_TOKENS = REGISTRY.counter(
+    "empyrean_prefill_tokens", "Prompt tokens evaluated by Ollama or reused from its prompt cache.", ("model", "kind"))
+PREFILL_SAVED_SECONDS = REGISTRY.counter(
+    "empyrean_prefill_saved_seconds", "Estimated prompt evaluation time saved by prompt-cache reuse.", ("model",))
@@ -1,12 +1,20 @@
 from __future__ import annotations
 import json
 import re
+import time
 from pathlib import Path
+from typing import Any, Dict, Iterator, List, Tuple
 from jsonschema import Draft202012Validator
 from jsonschema.exceptions import ValidationError
 
 UNCERTAINTY = re.compile(r"\b(not sure|uncertain|unsure|might be|maybe)\b", re.I)
 REFUSAL = re.compile(r"\b(i can't|i cannot|cannot comply|refuse)\b", re.I)
+_NUMBER_PREFIX = re.compile(r"-?(?:0|[1-9]\d*)?(?:\.\d*)?(?:[eE][+-]?\d*)?")
+_FENCE_OPEN = re.compile(r"^\s*```[\w+.-]*[ \t]*\n?")
+_FENCE_CLOSE = re.compile(r"\n?[ \t]*```\s*$")
+_THINK_BLOCK = re.compile(r"<(think|thinking|reasoning)>.*?(?:</\1>|$)", re.DOTALL | re.IGNORECASE)
+_WRAPPER_TAG = re.compile(r"^\s*<([A-Za-z][\w-]*)>\s*|\s*</[A-Za-z][\w-]*>\s*$")
+_LITERALS = {"True": "true", "False": "false", "None": "null", "true": "true", "false": "false", "null": "null"}
 
 class ValidationResult:
     def __init__(self, ok: bool, signals: list[str] | None = None, errors: str | None = None):
@@ -14,20 +22,314 @@ class ValidationResult:
         self.signals = signals or []
         self.errors = errors
 
+def strip_fences(text: str) -> str:
+    """Remove a surrounding markdown fence, including a language tag such as ```json."""
+    t = text.strip()
+    if t.startswith("```"):
+        t = _FENCE_CLOSE.sub("", _FENCE_OPEN.sub("", t, count=1), count=1)
+    return t
+
+
 def parse_json_strict(text: str) -> tuple[dict | None, str | None]:
     try:
         # Strip accidental markdown fences
-        t = text.strip()
-        if t.startswith("```"):
-            t = t.strip("` ")
-        return json.loads(t), None
+        return json.loads(strip_fences(text)), None
     except Exception as e:
         return None, str(e)
 
+
+def _outermost(text: str) -> Tuple[str, bool]:
+    """The first ``{...}`` or ``[...]`` span in ``text`` and whether it was closed.
+
+    Brackets inside strings (either quote style) are ignored. An unclosed
+    span runs to the end of the text.
+    """
+    start = next((i for i, ch in enumerate(text) if ch in "{["), -1)
+    if start < 0:
+        return "", False
+    depth = 0
+    quote = ""
+    escape = False
+    for i in range(start, len(text)):
+        ch = text[i]
+        if quote:
+            if escape:
+                escape = False
+            elif ch == "\\":
+                escape = True
+            elif ch == quote:
+                quote = ""
+        elif ch in "\"'":
+            quote = ch
+        elif ch in "{[":
+            depth += 1
+        elif ch in "}]":
+            depth -= 1
+            if depth == 0:
+                return text[start : i + 1], True
+    return text[start:], False
+
+
+def _rewrite(text: str) -> List[str]:
+    """Re-emit ``text`` as JSON where the fix is mechanical; returns candidate texts.
+
+    Single-quoted strings become double-quoted, raw newlines in strings are
+    escaped, Python literals become JSON ones and trailing commas are
+    dropped. If the text is truncated, the open string is closed and the
+    open containers are closed. The first candidate keeps everything; the
+    second cuts back to the last complete value, for output cut off
+    mid-key or mid-number.
+    """
+    out: List[str] = []
+    stack: List[str] = []
+    quote = ""
+    escape = False
+    after_colon: List[bool] = []  # per open object: is the next string a value?
+    safe: Tuple[int, Tuple[str, ...]] = (0, ())
+    i, n = 0, len(text)
+
+    def value_done() -> None:
+        nonlocal safe
+        safe = (len(out), tuple(stack))
+
+    while i < n:
+        ch = text[i]
+        if quote:
+            if escape:
+                escape = False
+                if ch == "'":
+                    out[-1] = ch  # \' is not a JSON escape
+                else:
+                    out.append(ch)
+            elif ch == "\\":
+                escape = True
+                out.append(ch)
+            elif ch == quote:
+                quote = ""
+                out.append('"')
+                is_key = bool(stack) and stack[-1] == "}" and not after_colon[-1]
+                if not is_key:
+                    value_done()
+            elif ch == '"':
+                out.append('\\"')  # a double quote inside a single-quoted string
+            elif ch == "\n":
+                out.append("\\n")
+            else:
+                out.append(ch)
+            i += 1
+            continue
+        if ch in "\"'":
+            quote = ch
+            out.append('"')
+        elif ch in "{[":
+            stack.append("}" if ch == "{" else "]")
+            if ch == "{":
+                after_colon.append(False)
+            out.append(ch)
+        elif ch in "}]":
+            while out and out[-1].isspace():
+                out.pop()
+            if out and out[-1] == ",":
+                out.pop()
+            if stack and stack[-1] == ch:
+                stack.pop()
+                if ch == "}":
+                    after_colon.pop()
+                out.append(ch)
+                value_done()
+                if not stack:
+                    break
+        elif ch == ":" and stack and stack[-1] == "}":
+            after_colon[-1] = True
+            out.append(ch)
+        elif ch == "," and stack:
+            if stack[-1] == "}":
+                after_colon[-1] = False
+            out.append(ch)
+        elif ch.isalpha() or ch == "_":
+            j = i
+            while j < n and (text[j].isalnum() or text[j] == "_"):
+                j += 1
+            word = text[i:j]
+            out.append(_LITERALS.get(word, word))
+            if word in _LITERALS:
+                value_done()
+            i = j
+            continue
+        elif ch in "-0123456789":
+            j = i
+            while j < n and text[j] in "+-.eE0123456789":
+                j += 1
+            out.append(text[i:j])
+            if j < n:  # a number at the very end may be cut short
+                value_done()
+            i = j
+            continue
+        else:
+            out.append(ch)
+        i += 1
+
+    if not stack and not quote:
+        return ["".join(out)]
+    full = list(out)
+    if quote:
+        if escape:
+            full.pop()  # a dangling backslash
+        full.append('"')
+    tail = "".join(full).rstrip()
+    if tail.endswith(","):
+        tail = tail[:-1]
+    if tail.endswith(":"):
+        tail += " null"
+    candidates = [tail + "".join(reversed(stack))]
+    cut, open_at_cut = safe
+    candidates.append("".join(out[:cut]).rstrip().rstrip(",") + "".join(reversed(open_at_cut)))
+    return candidates
+
+
+def salvage_json(text: str) -> Tuple[Any | None, List[str]]:
+    """Deterministically recover a JSON value from near-JSON model output.
+
+    Tries, in order: the text with fences stripped; the outermost object or
+    array after dropping ``<think>`` blocks, wrapper tags and surrounding
+    prose; and mechanical rewrites of it (see :func:`_rewrite`). Returns
+    ``(data, fixes)``. ``fixes`` names what was needed, and ``data`` is None
+    when nothing parses. Schema validation is the caller's job.
+    """
+    fixes: List[str] = []
+    t = strip_fences(text)
+    if t != text.strip():
+        fixes.append("fence")
+    try:
+        return json.loads(t), fixes
+    except ValueError:
+        pass
+    if _THINK_BLOCK.search(t):
+        t = _THINK_BLOCK.sub("", t)
+        fixes.append("think")
+    unwrapped = _WRAPPER_TAG.sub("", t)
+    if unwrapped != t:
+        t = strip_fences(unwrapped)
+        fixes.append("tags")
+    span, closed = _outermost(t)
+    if not span:
+        return None, fixes
+    if span != t.strip():
+        fixes.append("extract")
+    try:
+        return json.loads(span), fixes
+    except ValueError:
+        pass
+    for k, candidate in enumerate(_rewrite(span)):
+        try:
+            data = json.loads(candidate)
+        except ValueError:
+            continue
+        fixes.append("syntax" if closed else ("closed" if k == 0 else "truncated"))
+        return data, fixes
+    return None, fixes
+
 def load_schema(path: Path) -> dict:
     with path.open("r", encoding="utf-8") as f:
         return json.load(f)
 
+
+class SchemaRegistry:
+    """Compiled validators for ``<family>.schema.json`` files, keyed by task family.
+
+    Schemas are parsed and checked once (see :meth:`load_all`) and recompiled
+    only when the file's mtime changes; the mtime is re-checked at most every
+    ``check_interval`` seconds so the hot path does not hit the filesystem.
+    """
+
+    def __init__(self, schema_dir: Path, check_interval: float = 1.0):
+        self.schema_dir = Path(schema_dir)
+        self.check_interval = check_interval
+        # family -> (validator, mtime_ns, last_checked)
+        self._compiled: Dict[str, Tuple[Draft202012Validator, int, float]] = {}
+
+    def _path(self, task_family: str) -> Path:
+        return self.schema_dir / f"{task_family}.schema.json"
+
+    def _compile(self, task_family: str) -> Draft202012Validator:
+        path = self._path(task_family)
+        mtime = path.stat().st_mtime_ns
+        schema = load_schema(path)
+        Draft202012Validator.check_schema(schema)
+        validator = Draft202012Validator(schema)
+        self._compiled[task_family] = (validator, mtime, time.monotonic())
+        return validator
+
+    def load_all(self) -> list[str]:
+        """Compile every schema in ``schema_dir``; raises on the first invalid one."""
+        families = sorted(p.name[: -len(".schema.json")] for p in self.schema_dir.glob("*.schema.json"))
+        for fam in families:
+            self._compile(fam)
+        return families
+
+    def reload(self, task_family: str | None = None) -> None:
+        """Drop compiled validators (one family or all) so they are rebuilt on next use."""
+        if task_family is None:
+            self._compiled.clear()
+        else:
+            self._compiled.pop(task_family, None)
+
+    def validator(self, task_family: str) -> Draft202012Validator:
+        entry = self._compiled.get(task_family)
+        if entry is None:
+            return self._compile(task_family)
+        validator, mtime, checked = entry
+        now = time.monotonic()
+        if now - checked >= self.check_interval:
+            if self._path(task_family).stat().st_mtime_ns != mtime:
+                return self._compile(task_family)
+            self._compiled[task_family] = (validator, mtime, now)
+        return validator
+
+
+_REGISTRIES: Dict[Path, SchemaRegistry] = {}
+
+
+def get_schema_registry(schema_dir: Path) -> SchemaRegistry:
+    """Process-wide registry for ``schema_dir`` (created on first use)."""
+    key = Path(schema_dir)
+    reg = _REGISTRIES.get(key)
+    if reg is None:
+        reg = _REGISTRIES[key] = SchemaRegistry(key)
+    return reg
+
+
+def iter_strings(data: Any) -> Iterator[str]:
+    """Yield every string (keys and values) in a parsed JSON tree."""
+    stack = [data]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, str):
+            yield node
+        elif isinstance(node, dict):
+            for k, v in node.items():
+                yield k
+                stack.append(v)
+        elif isinstance(node, list):
+            stack.extend(node)
+
+
+def marker_signals(data: Any) -> list[str]:
+    """Uncertainty/refusal signals found in the strings of ``data``."""
+    uncertain = refusal = False
+    for s in iter_strings(data):
+        uncertain = uncertain or UNCERTAINTY.search(s) is not None
+        refusal = refusal or REFUSAL.search(s) is not None
+        if uncertain and refusal:
+            break
+    signals = []
+    if uncertain:
+        signals.append("uncertainty_markers")
+    if refusal:
+        signals.append("refusal_detected")
+    return signals
+
+
 def validate_output(task_family: str, raw_text: str, schema_dir: Path) -> ValidationResult:
     data, err = parse_json_strict(raw_text)
     signals: list[str] = []
@@ -35,17 +337,201 @@ def validate_output(task_family: str, raw_text: str, schema_dir: Path) -> Valida
         signals.append("invalid_json")
         return ValidationResult(False, signals, f"json parse error: {err}")
     # refusal / uncertainty checks
-    text = json.dumps(data)
-    if UNCERTAINTY.search(text):
-        signals.append("uncertainty_markers")
-    if REFUSAL.search(text):
-        signals.append("refusal_detected")
+    signals.extend(marker_signals(data))
     # schema
-    schema_path = schema_dir / f"{task_family}.schema.json"
     try:
-        schema = load_schema(schema_path)
-        Draft202012Validator(schema).validate(data)
+        get_schema_registry(schema_dir).validator(task_family).validate(data)
     except ValidationError as ve:
         signals.append("schema_fail")
         return ValidationResult(False, signals, f"schema: {ve.message}")
     return ValidationResult(True, signals, None)
+
+
+class IncrementalJSONValidator:
+    """Feed model output chunk by chunk and report as soon as it cannot succeed.
+
+    Tracks just enough JSON grammar (containers, strings, literals, commas and
+    colons) to notice the first character that makes the text unparseable, and
+    scans string contents for refusal phrases. ``feed`` returns the signal that
+    justifies aborting the generation (``invalid_json`` or ``refusal_detected``)
+    or ``None`` while the output can still become valid. Everything before the
+    first ``{`` or ``[`` is treated as preamble, the way :func:`salvage_json`
+    treats it: fences, a "Sure, here it is:" lead-in and ``<think>`` blocks
+    (brackets inside them included) are skipped, so a reply is only cut once
+    its JSON itself goes wrong. Preamble is scanned for refusals and aborts
+    as ``invalid_json`` when ``max_preamble`` characters pass outside think
+    blocks with no JSON.
+    """
+
+    _LITERAL_CHARS = frozenset("0123456789+-.eEtruefalsn")
+    _WINDOW = 64
+    _THINK_OPEN = {"<think>": "</think>", "<thinking>": "</thinking>", "<reasoning>": "</reasoning>"}
+
+    def __init__(self, max_preamble: int = 2048) -> None:
+        self.max_preamble = max_preamble
+        self.text = ""
+        self.error: str | None = None
+        self.signal: str | None = None
+        self._stack: list[str] = []
+        # expectations: value | value_or_end | key | key_or_end | colon | comma | end
+        self._expect = "value"
+        self._started = False
+        self._done = False
+        self._in_string = False
+        self._escape = False
+        self._literal = ""
+        self._string_tail = ""
+        self._pos = 0
+        self._preamble = 0  # preamble characters outside think blocks
+        self._lead_tail = ""  # recent preamble, for tags and refusals
+        self._think_close: str | None = None  # closing tag while inside a think block
+
+    @property
+    def complete(self) -> bool:
+        return self._done
+
+    def feed(self, chunk: str) -> str | None:
+        if self.signal or not chunk:
+            return self.signal
+        self.text += chunk
+        for ch in chunk:
+            self._pos += 1
+            if not self._step(ch):
+                self.signal = "invalid_json"
+                return self.signal
+        if REFUSAL.search(self._string_tail) or (
+                not self._started and self._think_close is None and REFUSAL.search(self._lead_tail)):
+            self.signal = "refusal_detected"
+            self.error = "refusal pattern in output"
+        return self.signal
+
+    def _fail(self, ch: str, why: str) -> bool:
+        self.error = f"unexpected {ch!r} at offset {self._pos - 1}: {why}"
+        return False
+
+    def _close_value(self) -> None:
+        if not self._stack:
+            self._done = True
+            self._expect = "end"
+        else:
+            self._expect = "comma"
+
+    def _end_literal(self) -> bool:
+        lit, self._literal = self._literal, ""
+        if lit in ("true", "false", "null"):
+            return True
+        try:
+            json.loads(lit)
+        except ValueError:
+            return False
+        return True
+
+    def _lead(self, ch: str) -> bool:
+        """One character before the JSON value: fence, prose or think block."""
+        self._lead_tail = (self._lead_tail + ch)[-self._WINDOW:]
+        if self._think_close is not None:
+            if self._lead_tail.lower().endswith(self._think_close):
+                self._think_close = None
+                self._lead_tail = ""
+            return True
+        if ch in "{[":
+            self._started = True
+            self._stack.append("}" if ch == "{" else "]")
+            self._expect = "key_or_end" if ch == "{" else "value_or_end"
+            return True
+        if ch == ">":
+            tail = self._lead_tail.lower()
+            opened = next((close for tag, close in self._THINK_OPEN.items() if tail.endswith(tag)), None)
+            if opened is not None:
+                self._think_close = opened
+                return True
+        self._preamble += 1
+        if self._preamble > self.max_preamble:
+            return self._fail(ch, f"no JSON value after {self.max_preamble} characters")
+        return True
+
+    def _step(self, ch: str) -> bool:
+        if self._in_string:
+            if self._escape:
+                self._escape = False
+            elif ch == "\\":
+                self._escape = True
+            elif ch == '"':
+                self._in_string = False
+                if self._expect == "key":
+                    self._expect = "colon"
+                else:
+                    self._close_value()
+                self._string_tail = self._string_tail[-self._WINDOW:] + " "
+                return True
+            self._string_tail = (self._string_tail + ch)[-self._WINDOW * 4:]
+            return True
+
+        if self._literal:
+            if ch in self._LITERAL_CHARS:
+                self._literal += ch
+                if not any(w.startswith(self._literal) for w in ("true", "false", "null")) \
+                        and not _NUMBER_PREFIX.fullmatch(self._literal):
+                    return self._fail(ch, "bad literal")
+                return True
+            if not self._end_literal():
+                return self._fail(ch, "bad literal")
+            self._close_value()
+
+        if not self._started:
+            return self._lead(ch)
+        if ch.isspace():
+            return True
+        if self._done:
+            if ch == "`":
+                return True
+            return self._fail(ch, "trailing content after JSON value")
+
+        exp = self._expect
+        if exp == "value":
+            self._started = True
+            if ch == "{":
+                self._stack.append("}")
+                self._expect = "key_or_end"
+            elif ch == "[":
+                self._stack.append("]")
+                self._expect = "value_or_end"
+            elif ch == '"':
+                self._in_string = True
+            elif ch in "-0123456789tfn":
+                self._literal = ch
+            else:
+                return self._fail(ch, "expected a JSON value")
+            return True
+        if exp == "value_or_end":
+            if ch == "]":
+                self._stack.pop()
+                self._close_value()
+                return True
+            self._expect = "value"
+            return self._step(ch)
+        if exp in ("key", "key_or_end"):
+            if ch == '"':
+                self._expect = "key"
+                self._in_string = True
+                return True
+            if ch == "}" and exp == "key_or_end":
+                self._stack.pop()
+                self._close_value()
+                return True
+            return self._fail(ch, "expected an object key")
+        if exp == "colon":
+            if ch == ":":
+                self._expect = "value"
+                return True
+            return self._fail(ch, "expected ':'")
+        if exp == "comma":
+            if ch == ",":
+                self._expect = "key" if self._stack[-1] == "}" else "value"
+                return True
+            if ch == self._stack[-1]:
+                self._stack.pop()
+                self._close_value()
+                return True
+            return self._fail(ch, "expected ',' or a closing bracket")
+        return self._fail(ch, "invalid state")
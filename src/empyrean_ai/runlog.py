@@ -0,0 +1,257 @@
+"""Background, batched run logging.
+
+:class:`RunLogWriter` accepts run payloads from the request path without
+touching the filesystem: records go into a bounded in-memory queue and a
+background task appends them in batches to one JSONL file per UTC day
+(``runs-YYYYMMDD.jsonl``, optionally gzip or zstd compressed, one compressed
+member per batch). :func:`iter_runs` streams records back, including the
+legacy one-file-per-run layout written by :func:`evaluators.log_run`.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import gzip
+import io
+import json
+import logging
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import IO, Any, Iterator, Literal
+
+log = logging.getLogger(__name__)
+
+__all__ = ["RunLogWriter", "iter_runs", "run_dir_from_config"]
+
+WhenFull = Literal["block", "drop_newest", "drop_oldest"]
+Compression = Literal["none", "gzip", "zstd"]
+
+_SUFFIX = {"none": ".jsonl", "gzip": ".jsonl.gz", "zstd": ".jsonl.zst"}
+_STOP = object()
+
+
+def run_dir_from_config(runtime_cfg: dict | None, base_dir: Path) -> Path:
+    """Where run records live: ``run_log.dir`` of configs/runtime.yml, relative to ``base_dir``.
+
+    The same directory is used when the writer is disabled and runs fall
+    back to one file each.
+    """
+    run_dir = Path(((runtime_cfg or {}).get("run_log") or {}).get("dir", "data/runs"))
+    return run_dir if run_dir.is_absolute() else Path(base_dir) / run_dir
+
+
+def _zstd() -> Any:
+    try:
+        import zstandard
+    except ImportError as exc:  # pragma: no cover - optional dependency
+        raise RuntimeError("zstd run logs need the optional 'zstandard' package") from exc
+    return zstandard
+
+
+class RunLogWriter:
+    """Queue run payloads and append them to daily JSONL segments in batches.
+
+    ``when_full`` selects the policy when the queue is at ``max_queue``:
+    ``block`` applies backpressure to :meth:`log`, ``drop_newest`` discards
+    the incoming record and ``drop_oldest`` discards the oldest queued one.
+    Batches are written when ``batch_size`` records are queued or after
+    ``flush_interval`` seconds, whichever comes first; :meth:`aclose` flushes
+    everything still queued. Records go to ``run_dir`` unless :meth:`log`
+    names another directory.
+    """
+
+    def __init__(
+        self,
+        run_dir: Path,
+        *,
+        flush_interval: float = 1.0,
+        batch_size: int = 256,
+        max_queue: int = 10_000,
+        when_full: WhenFull = "drop_oldest",
+        compression: Compression = "none",
+    ):
+        if when_full not in ("block", "drop_newest", "drop_oldest"):
+            raise ValueError(f"Unknown run_log when_full policy: {when_full!r}")
+        if compression not in _SUFFIX:
+            raise ValueError(f"Unknown run_log compression: {compression!r}")
+        if compression == "zstd":
+            _zstd()
+        self.run_dir = Path(run_dir)
+        self.flush_interval = flush_interval
+        self.batch_size = max(1, batch_size)
+        self.max_queue = max(1, max_queue)
+        self.when_full = when_full
+        self.compression = compression
+        self.written = 0
+        self.dropped = 0
+        self.batches = 0
+        self._queue: asyncio.Queue[Any] | None = None
+        self._task: asyncio.Task[None] | None = None
+        # set when a full batch is queued or on close, to cut the flush wait short
+        self._wake: asyncio.Event | None = None
+        self._closed = False
+
+    @classmethod
+    def from_config(cls, runtime_cfg: dict | None, base_dir: Path) -> RunLogWriter | None:
+        """Build a writer from the ``run_log`` section of configs/runtime.yml (None if disabled)."""
+        node = (runtime_cfg or {}).get("run_log") or {}
+        if not node.get("enabled", True):
+            return None
+        return cls(
+            run_dir_from_config(runtime_cfg, base_dir),
+            flush_interval=float(node.get("flush_interval", 1.0)),
+            batch_size=int(node.get("batch_size", 256)),
+            max_queue=int(node.get("max_queue", 10_000)),
+            when_full=node.get("when_full", "drop_oldest"),
+            compression=node.get("compression", "none"),
+        )
+
+    # ------------------------------------------------------------------
+    async def start(self) -> None:
+        if self._task is None:
+            self._queue = asyncio.Queue(self.max_queue)
+            self._wake = asyncio.Event()
+            self._closed = False
+            self._task = asyncio.create_task(self._run(), name="run-log-writer")
+
+    async def log(self, payload: dict, run_dir: Path | None = None) -> bool:
+        """Queue one record for ``run_dir`` (default: the writer's); returns False if it was dropped."""
+        if self._closed:
+            self.dropped += 1
+            return False
+        if self._task is None:
+            await self.start()
+        assert self._queue is not None and self._wake is not None
+        entry = (Path(run_dir) if run_dir is not None else self.run_dir, payload)
+        if self.when_full == "block":
+            await self._queue.put(entry)
+        else:
+            if self._queue.full():
+                self.dropped += 1
+                if self.when_full == "drop_newest":
+                    return False
+                self._queue.get_nowait()
+            self._queue.put_nowait(entry)
+        if self._queue.qsize() >= self.batch_size:
+            self._wake.set()
+        return True
+
+    async def aclose(self) -> None:
+        """Flush everything queued and stop the background task."""
+        if self._task is None or self._closed:
+            return
+        assert self._queue is not None and self._wake is not None
+        self._closed = True
+        self._wake.set()
+        await self._queue.put(_STOP)
+        task, self._task = self._task, None
+        await task
+
+    def stats(self) -> dict:
+        return {
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "written": self.written,
+            "dropped": self.dropped,
+            "batches": self.batches,
+        }
+
+    # ------------------------------------------------------------------
+    def _drain(self, batch: list[Any]) -> bool:
+        """Move queued records into ``batch``; True once the stop marker is seen."""
+        assert self._queue is not None
+        while len(batch) < self.batch_size and not self._queue.empty():
+            item = self._queue.get_nowait()
+            if item is _STOP:
+                return True
+            batch.append(item)
+        return False
+
+    async def _run(self) -> None:
+        assert self._queue is not None and self._wake is not None
+        stop = False
+        while not stop:
+            first = await self._queue.get()
+            batch: list[Any] = []
+            if first is _STOP:
+                stop = True
+            else:
+                batch.append(first)
+                stop = self._drain(batch)
+                if not stop and len(batch) < self.batch_size and not self._closed:
+                    self._wake.clear()
+                    try:
+                        await asyncio.wait_for(self._wake.wait(), self.flush_interval)
+                    except asyncio.TimeoutError:
+                        pass
+                    stop = self._drain(batch)
+            if stop:
+                # closing: write whatever else is queued too
+                while not self._queue.empty():
+                    item = self._queue.get_nowait()
+                    if item is not _STOP:
+                        batch.append(item)
+            if batch:
+                try:
+                    await asyncio.to_thread(self._write_batch, batch)
+                except Exception:  # keep the writer alive; the batch is lost
+                    log.exception("run log: failed to write %d records", len(batch))
+                    self.dropped += len(batch)
+
+    def segment_path(self, day: str | None = None, run_dir: Path | None = None) -> Path:
+        day = day or datetime.now(timezone.utc).strftime("%Y%m%d")
+        return (run_dir or self.run_dir) / f"runs-{day}{_SUFFIX[self.compression]}"
+
+    def _write_batch(self, batch: list[tuple[Path, dict]]) -> None:
+        by_dir: dict[Path, list[dict]] = {}
+        for run_dir, payload in batch:
+            by_dir.setdefault(run_dir, []).append(payload)
+        for run_dir, payloads in by_dir.items():
+            data = "".join(json.dumps(p, ensure_ascii=False, separators=(",", ":")) + "\n" for p in payloads).encode("utf-8")
+            if self.compression == "gzip":
+                data = gzip.compress(data)
+            elif self.compression == "zstd":
+                data = _zstd().ZstdCompressor().compress(data)
+            run_dir.mkdir(parents=True, exist_ok=True)
+            with self.segment_path(run_dir=run_dir).open("ab") as f:
+                f.write(data)
+        self.written += len(batch)
+        self.batches += 1
+
+
+def _open_segment(path: Path) -> IO[str]:
+    if path.name.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8")
+    if path.name.endswith(".zst"):
+        raw = path.open("rb")
+        reader = _zstd().ZstdDecompressor().stream_reader(raw, read_across_frames=True, closefd=True)
+        return io.TextIOWrapper(reader, encoding="utf-8")
+    return path.open("r", encoding="utf-8")
+
+
+def iter_runs(run_dir: Path, days: set[str] | None = None) -> Iterator[dict]:
+    """Stream run records from ``run_dir`` in day order.
+
+    ``days`` (``YYYYMMDD`` strings) restricts which days are read. Records
+    from JSONL segments and from legacy ``YYYYMMDD/run_*.json`` files are
+    both returned; torn trailing lines are skipped.
+    """
+    root = Path(run_dir)
+    if not root.is_dir():
+        return
+    for seg in sorted(root.glob("runs-*.jsonl*")):
+        day = seg.name[len("runs-"):].split(".", 1)[0]
+        if days is not None and day not in days:
+            continue
+        with _open_segment(seg) as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue
+    for day_dir in sorted(p for p in root.iterdir() if p.is_dir()):
+        if days is not None and day_dir.name not in days:
+            continue
+        for path in sorted(day_dir.glob("run_*.json")):
+            yield json.loads(path.read_text(encoding="utf-8"))
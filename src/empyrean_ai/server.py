@@ -1,51 +1,204 @@
 from __future__ import annotations
-from fastapi import FastAPI
+import asyncio
+import json
+import re
+import time
+from contextlib import aclosing, asynccontextmanager
+from typing import Any, Callable
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
+from starlette.requests import ClientDisconnect
+from starlette.types import Receive, Scope, Send
 from pathlib import Path
 from .config import load_configs
-from .curator.registry import ModelRegistry
-from .curator.router import Router
-from .curator.engine import CuratorEngine
+from .curator.batch import BatchProgress, Checkpoint, aiter_lines, aread_items
+from .curator.inference.retrieval.fs_chunks import chunk_text, is_chunk_mode
+from .curator.scheduler import AdmissionError
+from .curator.service import CurateService
 from .logging_utils import setup_logging
+from . import metrics
 
 setup_logging()
 
 BASE = Path(__file__).resolve().parents[2]
 
 cfg = load_configs(BASE / "configs")
-registry = ModelRegistry(cfg)
-registry.set_routing(cfg["routing"])
-router = Router(cfg["routing"], aliases=cfg["models"].get("aliases", {}))
-engine = CuratorEngine(cfg, BASE)
+service = CurateService(cfg, BASE)
+registry, router, engine, adaptive = service.registry, service.router, service.engine, service.adaptive
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(_app: FastAPI):
+    await service.start()
+    try:
+        yield
+    finally:
+        await service.aclose()
+
+app = FastAPI(lifespan=lifespan)
+
+@app.exception_handler(AdmissionError)
+async def admission_error(_request: Request, exc: AdmissionError):
+    headers = {"Retry-After": str(max(1, round(exc.retry_after)))} if exc.retry_after else None
+    return JSONResponse(status_code=exc.status_code, content={"detail": str(exc), "model": exc.model}, headers=headers)
 
 class CurateRequest(BaseModel):
     task_family: str | None = None
     input: str
     model: str | None = "auto"
     n_candidates: int = 2
+    early_stop: bool | None = None
+    bypass_cache: bool = False
+    escalation: str | None = None  # sequential | hedged | speculative (default: configs/routing.yml)
+    deadline_s: float | None = None  # queueing budget per escalation step; default from configs/models.yml scheduler
+    retrieve: bool | None = None  # ground the prompt in the local index (default: runtime.yml retrieval.families)
 
 @app.get("/healthz")
 async def healthz():
     return {"status": "ok"}
 
+@app.get("/v1/stats")
+async def stats():
+    return {**engine.stats(), "adaptive_routing": adaptive.snapshot()}
+
+@app.get("/metrics")
+async def metrics_endpoint():
+    # Prometheus text exposition format
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+async def _curate_with_escalation(req: CurateRequest, *, stream: bool | None = None,
+                                  on_event: Callable[[dict], None] | None = None) -> dict[str, Any]:
+    try:
+        router.escalation_policy(req.escalation)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    return await service.curate(req.input, **req.model_dump(exclude={"input"}), stream=stream, on_event=on_event)
+
 @app.post("/v1/curate")
 async def curate(req: CurateRequest):
-    task = req.task_family or router.classify(req.input)
-    model_key = registry.routing_initial(task) if req.model in (None, "auto") else req.model
-    model_info = registry.resolve(router.alias(model_key))
-    out = await engine.curate(task, req.input, model_info.ollama_name, n_candidates=req.n_candidates, run_dir=BASE / "data" / "runs")
-    # escalation loop: use configured signals policy
-    chain = router.escalation_chain(task)
-    i = 0
-    signals = out["validation"].get("signals", [])
-    while (not out["validation"]["ok"] or router.needs_escalation(signals)) and i < len(chain):
-        m = registry.resolve(router.alias(chain[i]))
-        out = await engine.curate(task, req.input, m.ollama_name, n_candidates=req.n_candidates, run_dir=BASE / "data" / "runs")
-        signals = out["validation"].get("signals", [])
-        i += 1
-    return {"task_family": task, "model_used": model_info.key if out["meta"]["model"]==model_info.ollama_name else chain[i-1] if i>0 else model_info.key, "output": out["text"], "validation": out["validation"], "meta": out["meta"]}
+    return await _curate_with_escalation(req)
+
+@app.post("/v1/curate/stream")
+async def curate_stream(req: CurateRequest):
+    """NDJSON event stream: start, token/abort/repair/escalate events, then result (or error)."""
+    queue: asyncio.Queue[dict | None] = asyncio.Queue()
+
+    async def _produce() -> None:
+        try:
+            result = await _curate_with_escalation(req, stream=True, on_event=queue.put_nowait)
+            queue.put_nowait({"event": "result", **result})
+        except Exception as exc:  # surface failures in-band; headers are already sent
+            queue.put_nowait({"event": "error", "error": f"{type(exc).__name__}: {exc}"})
+        finally:
+            queue.put_nowait(None)
+
+    async def _body():
+        task = asyncio.create_task(_produce())
+        try:
+            while (ev := await queue.get()) is not None:
+                yield json.dumps(ev, ensure_ascii=False) + "\n"
+        finally:
+            # client disconnected (or we are done): stop any in-flight generation
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+    return StreamingResponse(_body(), media_type="application/x-ndjson")
+
+class MapReduceRequest(CurateRequest):
+    n_candidates: int = 1
+    chunk_mode: str | None = None  # chars | lines | tokens (default: configs/runtime.yml map_reduce)
+    chunk_size: int | None = None
+    chunk_overlap: int | None = None
+
+@app.post("/v1/curate/map_reduce")
+async def curate_map_reduce(req: MapReduceRequest):
+    """Chunk a large input, curate the chunks concurrently and merge them per task family."""
+    task = req.task_family or router.classify(req.input)  # scans a bounded window of large inputs
+    model_info = service.initial_model(task, req.model)
+    mr = cfg["runtime"].get("map_reduce") or {}
+    mode = req.chunk_mode or mr.get("chunk_mode", "tokens")
+    if not is_chunk_mode(mode):
+        raise HTTPException(status_code=400, detail=f"Unknown chunk_mode {mode!r}")
+    try:
+        chunks = chunk_text(req.input, mode, req.chunk_size or int(mr.get("chunk_size", 4000)),
+                            req.chunk_overlap if req.chunk_overlap is not None else int(mr.get("overlap", 200)),
+                            engine.packer.chars_per_token_for(model_info.ollama_name))
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    max_chunks = int(mr.get("max_chunks", 512))
+    if len(chunks) > max_chunks:
+        raise HTTPException(status_code=413, detail=f"input splits into {len(chunks)} chunks (limit {max_chunks})")
+    out = await engine.curate_map_reduce(task, chunks, model_info.ollama_name, n_candidates=req.n_candidates,
+                                         run_dir=service.run_dir, early_stop=req.early_stop,
+                                         use_cache=not req.bypass_cache,
+                                         # many chunks queue behind each other: only an explicit budget applies
+                                         deadline=engine.scheduler.deadline_in(req.deadline_s) if req.deadline_s is not None else None)
+    return {"task_family": task, "model_used": model_info.key, "output": out["text"], "validation": out["validation"], "meta": out["meta"]}
+
+_JOB_ID_RE = re.compile(r"[A-Za-z0-9._-]{1,128}")
+
+class _UploadStreamingResponse(StreamingResponse):
+    """A StreamingResponse that starts while the request body is still being read.
+
+    Before ASGI 2.4, StreamingResponse watches ``receive()`` for a disconnect
+    and would swallow the body chunks the response is still reading. Here the
+    body reader sees the disconnect instead, and a closed socket fails the
+    next send.
+    """
+
+    async def __call__(self, _scope: Scope, _receive: Receive, send: Send) -> None:
+        try:
+            await self.stream_response(send)
+        except OSError:
+            raise ClientDisconnect() from None
+        if self.background is not None:
+            await self.background()
+
+@app.post("/v1/curate/batch")
+async def curate_batch(request: Request, job_id: str | None = None, max_in_flight: int | None = None,
+                       meta: bool = False, total: int | None = None):
+    """JSONL of curate requests in, NDJSON out in completion order.
+
+    Each input line is a ``CurateRequest`` plus an ``id``. The upload is read
+    as it arrives, one window at a time. Output lines are ``result`` or
+    ``error`` events carrying that id (a malformed line is an ``error`` for
+    its id or line number), ``progress`` events every
+    ``batch.progress_interval_s`` and a final ``done`` summary. Progress
+    reports ``total``, ``remaining`` and ``eta_s`` only when the client
+    passes ``total``. With ``job_id`` finished lines are checkpointed, and
+    re-posting the same job skips them.
+    """
+    bcfg = cfg["runtime"].get("batch") or {}
+    if job_id is not None and not _JOB_ID_RE.fullmatch(job_id):
+        raise HTTPException(status_code=400, detail="job_id must match [A-Za-z0-9._-]{1,128}")
+    if max_in_flight is not None and max_in_flight < 1:
+        raise HTTPException(status_code=400, detail="max_in_flight must be >= 1")
+    checkpoint_dir = Path(bcfg.get("checkpoint_dir", "data/batch"))
+    checkpoint_dir = checkpoint_dir if checkpoint_dir.is_absolute() else BASE / checkpoint_dir
+    checkpoint = Checkpoint(checkpoint_dir / f"{job_id}.jsonl") if job_id else None
+    interval = float(bcfg.get("progress_interval_s", 5.0))
+
+    async def _body():
+        progress = BatchProgress(total=total)
+        last = time.monotonic()
+        try:
+            lines = service.batch(aread_items(aiter_lines(request.stream()), errors="report"),
+                                  max_in_flight=max_in_flight, meta=meta, progress=progress,
+                                  done=checkpoint.done if checkpoint is not None else ())
+            async with aclosing(lines):
+                async for line in lines:
+                    if checkpoint is not None:
+                        checkpoint.record(line)
+                    yield json.dumps(line, ensure_ascii=False) + "\n"
+                    if time.monotonic() - last >= interval:
+                        last = time.monotonic()
+                        yield json.dumps({"event": "progress", **progress.snapshot()}) + "\n"
+            yield json.dumps({"event": "done", "job_id": job_id, **progress.snapshot()}) + "\n"
+        finally:
+            if checkpoint is not None:
+                checkpoint.close()
+
+    return _UploadStreamingResponse(_body(), media_type="application/x-ndjson")
 
 class EvalRequest(BaseModel):
     limit: int | None = 10
@@ -53,7 +206,6 @@ class EvalRequest(BaseModel):
 @app.post("/v1/eval")
 async def eval_endpoint(req: EvalRequest):
     # lightweight local eval over golden set without heavy inference
-    import json
     g = (BASE / "data" / "golden" / "tasks.jsonl").read_text(encoding="utf-8").strip().splitlines()
     tasks = [json.loads(x) for x in g][: (req.limit or 10)]
     by_family = {}
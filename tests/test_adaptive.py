@@ -0,0 +1,95 @@
+import asyncio
+
+import pytest
+
+from empyrean_ai.curator.adaptive import AdaptiveRouter
+from empyrean_ai.curator.scheduler import ModelScheduler
+from test_engine import FakeClient, _engine
+
+CHAIN = ["small", "large"]
+
+
+def _router(**kw):
+    kw.setdefault("enabled", True)
+    kw.setdefault("min_samples", 10)
+    kw.setdefault("explore", 0.0)
+    return AdaptiveRouter(["schema_fail", "uncertainty_markers"], **kw)
+
+
+def _feed(r, model, n, accepted, elapsed, family="extraction"):
+    for i in range(n):
+        ok = i < accepted
+        r.observe(family, model, ok, [] if ok else ["schema_fail"], elapsed)
+
+
+def test_skips_initial_model_that_rarely_passes():
+    r = _router()
+    assert r.choose("extraction", CHAIN).mode == "static"  # no data yet
+    _feed(r, "small", 20, 2, 2.0)
+    _feed(r, "large", 20, 20, 5.0)
+    d = r.choose("extraction", CHAIN)
+    assert (d.start, d.mode) == (1, "adaptive")  # 2.0 + 0.9 * 5.0 > 5.0
+    assert d.explain(CHAIN)["skipped"] == ["small"]
+    assert r.snapshot()["families"]["extraction"]["small"]["signal_rates"] == {"schema_fail": 0.9}
+
+
+def test_quality_floor_and_cheap_initial_keep_static_start():
+    r = _router(quality_floor=0.99)
+    _feed(r, "small", 20, 2, 2.0)
+    _feed(r, "large", 20, 19, 5.0)
+    assert r.plan("extraction", CHAIN).mode == "static"  # the large model alone passes 95%
+    r = _router()
+    _feed(r, "small", 20, 18, 1.0)
+    _feed(r, "large", 20, 20, 5.0)
+    assert r.plan("extraction", CHAIN).start == 0
+    assert _router(enabled=False).choose("extraction", CHAIN).reason == "adaptive routing off"
+
+
+def test_exploration_starts_earlier_within_budget():
+    r = _router(explore=0.3, seed=1)
+    _feed(r, "small", 20, 0, 2.0)
+    _feed(r, "large", 20, 20, 5.0)
+    modes = [r.choose("extraction", CHAIN).mode for _ in range(1000)]
+    assert 200 < modes.count("explore") < 400
+    assert set(modes) == {"adaptive", "explore"}
+
+
+def test_never_starts_at_a_model_that_cannot_hold_the_input():
+    chain = ["small", "mid", "large"]
+    r = _router(explore=1.0, seed=3)
+    _feed(r, "small", 20, 0, 3.0)
+    _feed(r, "mid", 20, 20, 3.0)
+    _feed(r, "large", 20, 20, 5.0)
+    assert r.plan("extraction", chain).start == 1
+    assert r.plan("extraction", chain, [True, False, True]).start == 2  # mid's window is too small
+    assert {r.choose("extraction", chain, [True, False, True]).start for _ in range(50)} == {0}
+
+
+@pytest.mark.asyncio
+async def test_learns_from_engine_run_records():
+    eng = _engine(FakeClient(delay=0.01))
+    out = await eng.curate("extraction", "key: value", "m", n_candidates=1, use_cache=False)
+    r = _router(min_samples=1)
+    assert r.load_runs([out["meta"], {**out["meta"], "cache": "hit"}, {"task_family": "x"}]) == 1
+    arm = r.stats[("extraction", "m")]
+    assert arm.n == 1 and arm.accepted == 1 and 0.01 <= arm.latency_s < 1.0
+
+
+@pytest.mark.asyncio
+async def test_replay_skips_records_not_observed_live():
+    eng = _engine(FakeClient(delay=0.01))
+    chunked = await eng.curate_map_reduce("extraction", ["key: a", "key: b"], "m", use_cache=False)
+    single = await eng.curate("extraction", "key: value", "m", n_candidates=1, use_cache=False)
+    r = _router(min_samples=1)
+    assert r.load_runs([chunked["meta"], {**single["meta"], "coalesced": True},
+                        {**single["meta"], "cache": "hit"}]) == 0
+    assert ("extraction", "m") not in r.stats
+
+
+@pytest.mark.asyncio
+async def test_engine_reports_generation_time_without_queue_wait():
+    eng = _engine(FakeClient(delay=0.1), scheduler=ModelScheduler(default_limit=1))
+    first, second = await asyncio.gather(*(eng.curate("extraction", f"key: {i}", "m", n_candidates=1, use_cache=False)
+                                           for i in range(2)))
+    assert max(first["meta"]["elapsed"], second["meta"]["elapsed"]) < 0.18
+    assert max(first["meta"]["wall_s"], second["meta"]["wall_s"]) >= 0.2  # one of them queued behind the other
@@ -0,0 +1,121 @@
+import asyncio
+import json
+from pathlib import Path
+
+import pytest
+
+from empyrean_ai.curator.batch import BatchProgress, Checkpoint, aiter_lines, aread_items, read_items, run_batch
+from test_engine import FakeClient, _engine
+
+
+def _items(n):
+    return list(read_items(json.dumps({"input": f"doc {i}", "model": "ab"[i % 2]}) for i in range(n)))
+
+
+@pytest.mark.asyncio
+async def test_completion_order_bounded_and_errors_isolated():
+    active = peak = 0
+    started = []
+
+    async def process(item):
+        nonlocal active, peak
+        started.append(item["model"])
+        active += 1
+        peak = max(peak, active)
+        await asyncio.sleep(0.2 if item["id"] == 1 else 0.01)
+        active -= 1
+        if item["id"] == 3:
+            raise RuntimeError("boom")
+        return {"output": item["input"]}
+
+    progress = BatchProgress(total=6)
+    lines = [ln async for ln in run_batch(_items(6), process, key=lambda it: it["model"], max_in_flight=2,
+                                          progress=progress)]
+    assert peak == 2
+    assert started == ["a", "a", "a", "b", "b", "b"]  # grouped by key within the window
+    assert lines[-1]["id"] == 1  # slowest item finishes last
+    assert next(ln for ln in lines if ln["id"] == 3) == {"event": "error", "id": 3, "error": "RuntimeError: boom"}
+    snap = progress.snapshot()
+    assert (snap["done"], snap["failed"], snap["remaining"]) == (5, 1, 0)
+
+
+@pytest.mark.asyncio
+async def test_checkpoint_resumes_and_retries_errors(tmp_path: Path):
+    path = tmp_path / "job.jsonl"
+    with Checkpoint(path) as ck:
+        ck.record({"event": "result", "id": 1, "output": "x"})
+        ck.record({"event": "error", "id": 2, "error": "boom"})
+    with path.open("a", encoding="utf-8") as f:
+        f.write('{"event": "result", "id": 3, "out')  # crash mid-line
+    ck = Checkpoint(path)
+    assert ck.done == {"1"}
+    seen = []
+
+    async def process(item):
+        seen.append(item["id"])
+        return {}
+
+    progress = BatchProgress(total=4)
+    async for line in run_batch(_items(4), process, done=ck.done, progress=progress):
+        ck.record(line)
+    ck.close()
+    assert sorted(seen) == [2, 3, 4] and progress.skipped == 1
+    assert Checkpoint(path).done == {"1", "2", "3", "4"}
+
+
+@pytest.mark.asyncio
+async def test_batch_through_engine():
+    client = FakeClient()
+    eng = _engine(client, max_concurrency=4)
+
+    async def process(item):
+        out = await eng.curate("extraction", item["input"], item["model"], n_candidates=1, use_cache=False)
+        return {"ok": out["validation"]["ok"]}
+
+    lines = [ln async for ln in run_batch(_items(8), process, max_in_flight=8)]
+    assert sorted(ln["id"] for ln in lines) == list(range(1, 9))
+    assert all(ln["ok"] for ln in lines) and client.peak == 4
+
+
+
+@pytest.mark.asyncio
+async def test_prepare_sees_each_window_before_grouping():
+    windows = []
+
+    def prepare(window):
+        windows.append([it["id"] for it in window])
+        for it in window:
+            it["model"] = "ab"[it["id"] <= 2]
+
+    async def process(item):
+        return {"model": item["model"]}
+
+    lines = [ln async for ln in run_batch(_items(4), process, key=lambda it: it["model"], max_in_flight=4,
+                                          prepare=prepare)]
+    assert windows == [[1, 2, 3, 4]]
+    assert {ln["id"]: ln["model"] for ln in lines} == {1: "b", 2: "b", 3: "a", 4: "a"}
+
+def test_read_items_rejects_bad_lines():
+    with pytest.raises(ValueError, match="line 2"):
+        list(read_items(['{"input": "a"}', '{"text": "b"}']))
+    assert [it["id"] for it in read_items(['{"input": "a"}', "", '{"id": "x", "input": "b"}'])] == [1, "x"]
+
+
+@pytest.mark.asyncio
+async def test_async_source_reports_malformed_lines_per_item():
+    async def body():
+        yield b'{"input": "a"}\n{"id": "x", "text": '
+        yield b'"b"}\nnot json\n\n{"input": "c"}'
+
+    async def process(item):
+        return {"output": item["input"]}
+
+    progress = BatchProgress()
+    items = aread_items(aiter_lines(body()), errors="report")
+    lines = {ln["id"]: ln async for ln in run_batch(items, process, window=2, progress=progress)}
+    assert lines[1] == {"event": "result", "id": 1, "output": "a"}
+    assert lines[5]["output"] == "c"
+    assert lines["x"]["error"] == "line 2: expected an object with a string 'input'"
+    assert lines[3]["event"] == "error" and lines[3]["error"].startswith("line 3: invalid JSON")
+    snap = progress.snapshot()
+    assert (snap["done"], snap["failed"], "total" in snap) == (2, 2, False)
@@ -0,0 +1,77 @@
+import os
+from pathlib import Path
+
+import pytest
+
+from empyrean_ai.curator.inference.retrieval.bm25 import BM25Index, tokenize
+from test_engine import FakeClient, _engine
+
+
+def _corpus(root: Path) -> Path:
+    root.mkdir()
+    (root / "pool.py").write_text("def acquireConnection(pool):\n    # connection pool exhausted timeout\n", encoding="utf-8")
+    (root / "cache.md").write_text("The response cache stores validated results with a TTL.\n", encoding="utf-8")
+    (root / "notes.txt").write_text("Unrelated notes about gardening and tomatoes.\n", encoding="utf-8")
+    (root / "blob.bin").write_bytes(b"\0\1\2binary")
+    return root
+
+
+def test_tokenize_splits_identifiers():
+    assert tokenize("acquireConnection snake_case the HTTP") == [
+        "acquireconnection", "acquire", "connection", "snake", "case", "http"]
+
+
+def test_build_query_and_reopen(tmp_path: Path):
+    root = _corpus(tmp_path / "src")
+    idx = BM25Index(tmp_path / "idx")
+    stats = idx.update([root])
+    assert stats["docs_added"] == 3  # the binary file is tracked but not indexed
+    hits = idx.retrieve("connection pool timeout", k=2)
+    assert Path(hits[0].path).name == "pool.py"
+    assert hits[0].text.startswith("def acquireConnection")
+    assert hits[0].score > (hits[1].score if len(hits) > 1 else 0)
+    idx.close()
+    with BM25Index(tmp_path / "idx") as again:
+        assert [h.path for h in again.retrieve("connection pool timeout", k=1)] == [hits[0].path]
+        assert again.retrieve("nonexistentterm") == []
+
+
+def test_incremental_update_reindexes_only_changes(tmp_path: Path):
+    root = _corpus(tmp_path / "src")
+    idx = BM25Index(tmp_path / "idx", compact_ratio=0.9)
+    idx.update([root])
+    assert idx.update([root])["files_indexed"] == 0
+    # touched but identical: the hash check keeps it
+    os.utime(root / "cache.md", ns=(1, 1))
+    assert idx.update([root])["files_indexed"] == 0
+    (root / "cache.md").write_text("Cache entries now expire after tomatoes ripen.\n", encoding="utf-8")
+    res = idx.update([root])
+    assert res["files_indexed"] == 1 and res["docs_deleted"] == 1 and res["docs_added"] == 1
+    assert "TTL" not in " ".join(h.text for h in idx.retrieve("cache ttl", k=5))
+    (root / "notes.txt").unlink()
+    res = idx.update([root])
+    assert res["files_removed"] == 1 and len(idx) == 2
+    assert idx.stats()["dead"] == 2
+
+
+def test_compaction_drops_tombstones(tmp_path: Path):
+    root = _corpus(tmp_path / "src")
+    idx = BM25Index(tmp_path / "idx", compact_ratio=0.3)
+    idx.update([root])
+    (root / "notes.txt").unlink()
+    (root / "cache.md").unlink()
+    assert idx.update([root]).get("compacted")
+    assert idx.stats()["dead"] == 0 and len(idx) == 1
+
+
+@pytest.mark.asyncio
+async def test_engine_inserts_retrieved_chunks(tmp_path: Path):
+    idx = BM25Index(tmp_path / "idx")
+    idx.update([_corpus(tmp_path / "src")])
+    client = FakeClient()
+    eng = _engine(client, retriever=idx)
+    out = await eng.curate("extraction", "why is the connection pool timing out", "m", n_candidates=1, retrieve=True)
+    assert "acquireConnection" in client.calls[0]
+    assert out["meta"]["context"]["passages"] >= 1
+    await eng.curate("extraction", "connection pool", "m", n_candidates=1, retrieve=False)
+    assert "acquireConnection" not in client.calls[1]
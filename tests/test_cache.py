@@ -0,0 +1,92 @@
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+from empyrean_ai.config import load_configs
+from empyrean_ai.curator.cache import MemoryCache, ResponseCache, SQLiteCache, cache_key
+from empyrean_ai.curator.engine import CuratorEngine
+from test_engine import BASE, FakeClient
+
+
+def test_cache_key_depends_on_every_component():
+    base = cache_key("extraction", "p", "m", {"temperature": 0.2, "top_p": 0.85})
+    assert base == cache_key("extraction", "p", "m", {"top_p": 0.85, "temperature": 0.2})
+    assert base != cache_key("analytical", "p", "m", {"temperature": 0.2, "top_p": 0.85})
+    assert base != cache_key("extraction", "p2", "m", {"temperature": 0.2, "top_p": 0.85})
+    assert base != cache_key("extraction", "p", "m2", {"temperature": 0.2, "top_p": 0.85})
+    assert base != cache_key("extraction", "p", "m", {"temperature": 0.3, "top_p": 0.85})
+
+
+def test_memory_cache_lru_and_ttl():
+    c = MemoryCache(max_entries=2, ttl=60)
+    c.put("a", 1)
+    c.put("b", 2)
+    assert c.get("a") == 1  # a is now most recent
+    c.put("c", 3)
+    assert c.get("b") is None and c.evictions == 1
+    c.put("old", 4, expires=time.time() - 1)
+    assert c.get("old") is None and c.expirations == 1
+
+
+def test_sqlite_cache_survives_reopen(tmp_path: Path):
+    path = tmp_path / "c.sqlite3"
+    first = ResponseCache(MemoryCache(), SQLiteCache(path))
+    first.put("k", {"text": "x"})
+    first.close()
+    second = ResponseCache(MemoryCache(), SQLiteCache(path))
+    assert second.get("k") == {"text": "x"}
+    assert second.stats()["hits"] == 1
+    assert len(second.memory) == 1  # promoted into memory
+    second.close()
+
+
+@pytest.mark.asyncio
+async def test_async_access_runs_sqlite_off_the_event_loop(tmp_path: Path):
+    disk = SQLiteCache(tmp_path / "c.sqlite3")
+    threads = set()
+    get, put = disk.get, disk.put
+    disk.get = lambda key: threads.add(threading.get_ident()) or get(key)
+    disk.put = lambda key, value: threads.add(threading.get_ident()) or put(key, value)
+    cache = ResponseCache(MemoryCache(), disk)
+    await cache.aput("k", {"text": "x"})
+    cache.memory.clear()
+    assert await cache.aget("k") == {"text": "x"} and await cache.aget("other") is None
+    assert threads and threading.get_ident() not in threads
+    assert (cache.hits, cache.misses, cache.stores) == (1, 1, 1)
+    cache.close()
+
+
+def _engine(client, cache):
+    return CuratorEngine(load_configs(None), BASE, client=client, cache=cache)
+
+
+@pytest.mark.asyncio
+async def test_engine_serves_repeats_from_cache_and_honours_bypass():
+    client = FakeClient(delay=0)
+    cache = ResponseCache(MemoryCache())
+    eng = _engine(client, cache)
+    first = await eng.curate("extraction", "key: value", "m", n_candidates=1)
+    again = await eng.curate("extraction", "key: value", "m", n_candidates=1)
+    assert len(client.calls) == 1
+    assert first["meta"]["cache"] == "miss" and again["meta"]["cache"] == "hit"
+    assert again["text"] == first["text"]
+    await eng.curate("extraction", "key: value", "m", n_candidates=1, use_cache=False)
+    assert len(client.calls) == 2
+    assert cache.stats()["hits"] == 1
+
+
+@pytest.mark.asyncio
+async def test_engine_skips_non_deterministic_profiles_and_invalid_results():
+    creative = '{"title": "t", "style": "s", "content": "c"}'
+    client = FakeClient(reply=lambda p: (creative, 0))
+    cache = ResponseCache(MemoryCache())
+    eng = _engine(client, cache)
+    out = await eng.curate("creative", "a story", "m", n_candidates=1)
+    assert out["meta"]["cache"] == "off"
+
+    bad = FakeClient(reply=lambda p: ("nope", 0))
+    eng = _engine(bad, cache)
+    await eng.curate("extraction", "x", "m", n_candidates=1)
+    assert cache.stats()["stores"] == 0
@@ -0,0 +1,71 @@
+import pytest
+
+from empyrean_ai.config import load_configs
+from empyrean_ai.curator.context import ContextPacker, TokenEstimator
+from test_engine import FakeClient, _engine
+
+
+def _packer(**kw):
+    windows = {"small": (1000, "general"), "big": (100_000, "code")}
+    kw.setdefault("margin", 0)
+    return ContextPacker(windows, {"default": 4.0, "code": 3.0}, cap=2000, **kw)
+
+
+def test_estimator_counts_words_and_punctuation():
+    est = TokenEstimator(4.0)
+    assert est.count("hello, world!") == 6  # 2 + 1 + 2 + 1
+    assert est.count("internationalisation") == 5
+    assert est.count("") == 0
+
+
+def test_budget_reserves_reply_and_respects_cap():
+    p = _packer()
+    assert p.budget("small", 200) == 800
+    assert p.window("unknown") == 2000
+    assert _packer(long_context=False).window("big") == 2000
+    assert (_packer().chars_per_token_for("big"), _packer().chars_per_token_for("small")) == (3.0, 4.0)
+    assert p.estimator("code") is p.estimator("code")
+
+
+def test_pack_trims_deterministically_keeping_head_and_tail():
+    p = _packer()
+    text = "\n".join(f"line {i} of the document" for i in range(1000))
+    a = p.pack(lambda s: f"TASK\n{s}", text, "small", 200)
+    b = p.pack(lambda s: f"TASK\n{s}", text, "small", 200)
+    assert a == b
+    assert a.trimmed and a.omitted_lines > 0
+    assert a.prompt_tokens <= a.budget
+    assert "line 0 of" in a.prompt and "line 999 of" in a.prompt
+    small = p.pack(lambda s: s, "short input", "small")
+    assert not small.trimmed and small.prompt == "short input"
+
+
+def test_split_respects_budget_with_overlap():
+    p = _packer()
+    text = "\n".join(f"row {i}" for i in range(200)) + "\n" + "x" * 5000
+    chunks = p.split(text, 50, overlap=10)
+    assert all(p.count(c) <= 50 for c in chunks)
+    assert chunks[0].startswith("row 0")
+    first_tail = chunks[0].splitlines()[-1]
+    assert first_tail in chunks[1].splitlines()[:5]
+
+
+def test_routing_picks_long_context_model():
+    cfg = load_configs(None)
+    eng = _engine(FakeClient())
+    huge = "word " * 30_000
+    small = cfg["models"]["models"]["gpt-oss:20b"]["ollama_name"]
+    long = cfg["models"]["models"]["qwen3:30b"]["ollama_name"]
+    assert eng.pick_context_model("analytical", "short", [small, long]) == small
+    assert eng.pick_context_model("analytical", huge, [small, long]) == long
+
+
+@pytest.mark.asyncio
+async def test_curate_trims_oversized_input():
+    client = FakeClient()
+    eng = _engine(client)
+    huge = "\n".join("key: value " * 20 for _ in range(3000))
+    out = await eng.curate("extraction", huge, "curated/gpt-oss-20b:curated", n_candidates=1)
+    ctx = out["meta"]["context"]
+    assert ctx["trimmed"] and ctx["prompt_tokens"] <= ctx["budget"]
+    assert len(client.calls[0]) < len(huge)
@@ -0,0 +1,134 @@
+import hashlib
+from pathlib import Path
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from empyrean_ai.curator.inference.retrieval.bm25 import BM25Index, Hit, tokenize  # noqa: E402
+from empyrean_ai.curator.inference.retrieval.dense import DenseIndex, reciprocal_rank_fusion  # noqa: E402
+from test_engine import FakeClient, _engine  # noqa: E402
+
+# paraphrases share a dimension, so dense search matches what BM25 cannot
+_CONCEPTS = {"timeout": "slow", "latency": "slow", "slow": "slow", "sluggish": "slow",
+             "cache": "store", "storage": "store", "tomatoes": "garden", "gardening": "garden"}
+_DIM = 16
+
+
+def _vector(text: str) -> list:
+    v = np.zeros(_DIM)
+    for word in tokenize(text):
+        concept = _CONCEPTS.get(word, word)
+        v[int(hashlib.sha1(concept.encode()).hexdigest(), 16) % _DIM] += 1.0
+    return v.tolist()
+
+
+class Embedder:
+    def __init__(self):
+        self.texts: list = []
+
+    async def __call__(self, texts):
+        self.texts.extend(texts)
+        return [_vector(t) for t in texts]
+
+
+class EmbeddingClient(FakeClient):
+    async def embed(self, model, inputs):
+        return [_vector(t) for t in inputs]
+
+
+def _corpus(root: Path) -> Path:
+    root.mkdir()
+    (root / "pool.py").write_text("def acquire(pool):\n    # timeout waiting for a connection\n", encoding="utf-8")
+    (root / "cache.md").write_text("The response cache keeps validated results.\n", encoding="utf-8")
+    (root / "notes.txt").write_text("Unrelated notes about gardening and tomatoes.\n", encoding="utf-8")
+    return root
+
+
+@pytest.mark.asyncio
+async def test_sync_is_incremental_and_finds_paraphrases(tmp_path: Path):
+    root = _corpus(tmp_path / "src")
+    lexical = BM25Index(tmp_path / "idx", compact_ratio=0.9)
+    lexical.update([root])
+    dense = DenseIndex(tmp_path / "idx" / "dense")
+    embed = Embedder()
+    res = await dense.sync(lexical, embed, "fake", batch_size=2)
+    assert res["embedded"] == 3 and len(dense) == 3 and len(embed.texts) == 3
+    assert (await dense.sync(lexical, embed, "fake"))["embedded"] == 0
+
+    assert lexical.retrieve("sluggish latency") == []
+    hits = dense.retrieve(lexical, _vector("sluggish latency"), k=1)
+    assert Path(hits[0].path).name == "pool.py" and hits[0].score > 0.3
+
+    (root / "notes.txt").write_text("Sluggish responses under load.\n", encoding="utf-8")
+    lexical.update([root])
+    embed.texts.clear()
+    res = await dense.sync(lexical, embed, "fake")
+    assert res["embedded"] == 1 and embed.texts == ["Sluggish responses under load."]
+    texts = [h.text for h in dense.retrieve(lexical, _vector("gardening"), k=5)]
+    assert len(texts) == 3 and not any("tomatoes" in t for t in texts)  # the old chunk is masked
+    dense.close()
+    with DenseIndex(tmp_path / "idx" / "dense") as again:
+        assert again.stats()["rows"] == 4
+
+
+@pytest.mark.asyncio
+async def test_compaction_or_new_model_re_embeds(tmp_path: Path):
+    root = _corpus(tmp_path / "src")
+    lexical = BM25Index(tmp_path / "idx", compact_ratio=0.3)
+    lexical.update([root])
+    dense = DenseIndex(tmp_path / "idx" / "dense")
+    await dense.sync(lexical, Embedder(), "fake")
+    (root / "notes.txt").unlink()
+    (root / "cache.md").unlink()
+    assert lexical.update([root]).get("compacted")
+    assert dense.retrieve(lexical, _vector("timeout"), k=1) == []  # stale ids are never served
+    res = await dense.sync(lexical, Embedder(), "fake")
+    assert res["reset"] and res["embedded"] == 1 and len(dense) == 1
+    assert (await dense.sync(lexical, Embedder(), "other-model"))["reset"]
+
+
+@pytest.mark.asyncio
+async def test_ivf_matches_exact_search(tmp_path: Path):
+    rng = np.random.default_rng(0)
+    root = tmp_path / "src"
+    root.mkdir()
+    (root / "rows.txt").write_text("".join(f"r{i:03d}\n" for i in range(600)), encoding="utf-8")
+    lexical = BM25Index(tmp_path / "idx", max_size=6)
+    lexical.update([root])
+    centres = rng.normal(size=(6, 24))
+    table = {f"r{i:03d}": (centres[i % 6] + 0.3 * rng.normal(size=24)).tolist() for i in range(600)}
+
+    async def embed(texts):
+        return [table[t] for t in texts]
+
+    dense = DenseIndex(tmp_path / "idx" / "dense")
+    await dense.sync(lexical, embed, "fake", batch_size=128)
+    exact = dense.search(table["r007"], k=10, nprobe=None)
+    dense.build_ivf(nlist=12)
+    assert dense.stats()["ivf_lists"] == 12 and dense.stats()["ivf_tail"] == 0
+    approx = dense.search(table["r007"], k=10, nprobe=4)
+    assert approx[0][0] == exact[0][0] == 7
+    assert len({d for d, _ in approx} & {d for d, _ in exact}) >= 8
+    # every row is found by its own vector: it sits in the list of its nearest centroid
+    for i in (0, 123, 599):
+        assert dense.search(table[f"r{i:03d}"], k=1, nprobe=1)[0][0] == i
+
+
+def test_reciprocal_rank_fusion_rewards_agreement():
+    a, b, c = (Hit(p, 0, 1, p, 1.0) for p in ("a", "b", "c"))
+    fused = reciprocal_rank_fusion([[a, b], [c, b]], k=3)
+    assert [h.path for h in fused] == ["b", "a", "c"]
+    assert fused[0].score == pytest.approx(2 / 62)
+
+
+@pytest.mark.asyncio
+async def test_engine_fuses_dense_hits(tmp_path: Path):
+    lexical = BM25Index(tmp_path / "idx")
+    lexical.update([_corpus(tmp_path / "src")])
+    dense = DenseIndex(tmp_path / "idx" / "dense")
+    await dense.sync(lexical, Embedder(), "fake")
+    client = EmbeddingClient()
+    eng = _engine(client, retriever=lexical, dense=dense)
+    await eng.curate("extraction", "why are requests so sluggish", "m", n_candidates=1, retrieve=True)
+    assert "timeout waiting for a connection" in client.calls[0]
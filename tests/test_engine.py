@@ -0,0 +1,175 @@
+import asyncio
+import json
+import time
+from pathlib import Path
+
+import pytest
+
+from empyrean_ai.config import load_configs
+from empyrean_ai.curator.engine import CuratorEngine
+from empyrean_ai.curator.scheduler import ModelScheduler
+
+BASE = Path(__file__).resolve().parents[1]
+VALID = json.dumps({"items": [{"key": "a", "value": "b"}]})
+
+
+class FakeClient:
+    """Stand-in for OllamaClient: replies per prompt with an optional delay."""
+
+    def __init__(self, reply=None, delay: float = 0.05):
+        self.reply = reply or (lambda prompt: (VALID, delay))
+        self.calls: list[str] = []
+        self.active = 0
+        self.peak = 0
+        self.cancelled = 0
+
+    async def generate(self, model, prompt, options=None):
+        self.calls.append(prompt)
+        text, delay = self.reply(prompt)
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        finally:
+            self.active -= 1
+        return {"text": text, "elapsed": delay, "raw": {}, "model": model, "request_id": "x"}
+
+
+def _engine(client, **kw):
+    kw.setdefault("scheduler", ModelScheduler(default_limit=4))
+    return CuratorEngine(load_configs(None), BASE, client=client, **kw)
+
+
+@pytest.mark.asyncio
+async def test_candidates_run_concurrently():
+    client = FakeClient(delay=0.1)
+    eng = _engine(client, max_concurrency=4)
+    t0 = time.perf_counter()
+    out = await eng.curate("extraction", "key: value", "m", n_candidates=2)
+    assert time.perf_counter() - t0 < 0.18
+    assert client.peak == 2
+    assert out["validation"]["ok"]
+    assert len(out["meta"]["candidates"]) == 2
+
+
+@pytest.mark.asyncio
+async def test_concurrency_limit_is_respected_including_repairs():
+    client = FakeClient(reply=lambda p: ("not json", 0.02) if "previous output" not in p else (VALID, 0.02))
+    eng = _engine(client, max_concurrency=1)
+    out = await eng.curate("extraction", "key: value", "m", n_candidates=2)
+    assert client.peak == 1
+    assert len(client.calls) == 4  # two candidates + two repairs
+    assert out["validation"]["ok"]
+
+
+@pytest.mark.asyncio
+async def test_early_stop_cancels_slower_candidates():
+    def reply(prompt):
+        return (VALID, 1.0) if "concise" in prompt else (VALID, 0.01)
+
+    client = FakeClient(reply=reply)
+    eng = _engine(client, early_stop=True)
+    t0 = time.perf_counter()
+    out = await eng.curate("extraction", "key: value", "m", n_candidates=2)
+    assert time.perf_counter() - t0 < 0.5
+    assert out["meta"]["early_stopped"] is True
+    assert out["meta"]["cancelled"] == 1
+    assert client.cancelled == 1
+
+
+@pytest.mark.asyncio
+async def test_candidate_error_propagates_and_cancels_rest():
+    class Boom(Exception):
+        pass
+
+    class Failing(FakeClient):
+        async def generate(self, model, prompt, options=None):
+            if "concise" not in prompt:
+                raise Boom()
+            return await super().generate(model, prompt, options)
+
+    client = Failing(delay=1.0)
+    eng = _engine(client)
+    with pytest.raises(Boom):
+        await eng.curate("extraction", "key: value", "m", n_candidates=2)
+    assert client.cancelled == 1
+
+
+class StreamingClient(FakeClient):
+    """Adds generate_stream: emits the reply in 4-char pieces, honouring ``check``."""
+
+    async def generate_stream(self, model, prompt, options=None, *, on_chunk=None, check=None):
+        self.calls.append(prompt)
+        text, _ = self.reply(prompt)
+        sent = ""
+        for i in range(0, len(text), 4):
+            piece = text[i : i + 4]
+            sent += piece
+            if on_chunk:
+                on_chunk(piece)
+            reason = check(piece) if check else None
+            if reason:
+                return {"text": sent, "elapsed": 0.0, "raw": {}, "model": model, "request_id": "x", "aborted": reason}
+            await asyncio.sleep(0)
+        return {"text": sent, "elapsed": 0.0, "raw": {}, "model": model, "request_id": "x", "aborted": None}
+
+
+@pytest.mark.asyncio
+async def test_streaming_aborts_broken_output_then_repairs():
+    garbage = '{"items": [' + "blah " * 100
+
+    def reply(prompt):
+        return (VALID, 0) if "not valid JSON" in prompt else (garbage, 0)
+
+    client = StreamingClient(reply=reply)
+    events: list[dict] = []
+    out = await _engine(client).curate("extraction", "key: value", "m", n_candidates=1, stream=True,
+                                       on_event=events.append)
+    assert out["validation"]["ok"]
+    assert out["meta"]["candidates"][0]["aborted"] is None  # repaired candidate won
+    kinds = [e["event"] for e in events]
+    assert "abort" in kinds and "repair" in kinds
+    # the broken generation was cut early; the repair asks again with the original input
+    assert client.calls[1].count("blah") == 0
+    assert "key: value" in client.calls[1]
+
+
+@pytest.mark.asyncio
+async def test_streaming_tolerates_preamble_and_think_blocks():
+    chatty = "<think>the input has {one} pair</think>\nSure, here is the JSON:\n" + VALID
+    client = StreamingClient(reply=lambda _p: (chatty, 0))
+    events: list[dict] = []
+    out = await _engine(client).curate("extraction", "key: value", "m", n_candidates=1, stream=True,
+                                       on_event=events.append)
+    assert out["validation"]["ok"] and json.loads(out["text"]) == json.loads(VALID)
+    assert "abort" not in [e["event"] for e in events]
+    assert len(client.calls) == 1
+
+
+@pytest.mark.asyncio
+async def test_streaming_refusal_skips_repair():
+    refusal = '{"items": [{"key": "note", "value": "I cannot comply with that request"}]}'
+    client = StreamingClient(reply=lambda p: (refusal, 0))
+    out = await _engine(client).curate("extraction", "x", "m", n_candidates=1, stream=True)
+    assert out["validation"]["signals"] == ["refusal_detected"]
+    assert not out["validation"]["ok"]
+    assert len(client.calls) == 1
+
+
+@pytest.mark.asyncio
+async def test_salvage_avoids_llm_repair():
+    fenced = "Sure, here it is:\n```json\n" + VALID[:-2] + ",]}\n```"
+    client = FakeClient(reply=lambda p: (VALID, 0) if "previous output" in p else (fenced, 0))
+    eng = _engine(client)
+    out = await eng.curate("extraction", "key: value", "m", n_candidates=1)
+    assert out["validation"]["ok"] and json.loads(out["text"]) == json.loads(VALID)
+    assert len(client.calls) == 1
+    assert out["meta"]["candidates"][0]["salvaged"] == ["extract", "syntax"]
+    assert eng.stats()["repair"]["salvaged"] == 1 and eng.stats()["repair"]["llm_repairs"] == 0
+    # schema-invalid salvage still falls back to the LLM repair
+    client.reply = lambda p: (VALID, 0) if "previous output" in p else ('{"items": [{"key": 1}', 0)
+    out = await eng.curate("extraction", "other", "m", n_candidates=1)
+    assert out["validation"]["ok"] and eng.stats()["repair"]["llm_repairs"] == 1
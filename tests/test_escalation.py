@@ -0,0 +1,82 @@
+import asyncio
+
+import pytest
+
+from empyrean_ai.config import load_configs
+from empyrean_ai.curator.escalation import EscalationPolicy, run_chain
+from empyrean_ai.curator.router import Router
+
+
+def _attempts(spec: dict[str, tuple[float, bool]]):
+    """spec: model -> (delay, acceptable). Records starts and cancellations."""
+    log: dict[str, list[str]] = {"started": [], "cancelled": []}
+
+    async def attempt(key, depth):
+        log["started"].append(key)
+        delay, ok = spec[key]
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            log["cancelled"].append(key)
+            raise
+        return {"model": key, "ok": ok}
+
+    return attempt, log
+
+
+def _accept(r):
+    return r["ok"]
+
+
+@pytest.mark.asyncio
+async def test_sequential_walks_chain_until_acceptable():
+    attempt, log = _attempts({"a": (0, False), "b": (0, True), "c": (0, True)})
+    res, key, trace = await run_chain(["a", "b", "c"], attempt, _accept, EscalationPolicy("sequential"))
+    assert key == "b" and log["started"] == ["a", "b"]
+    assert [t["status"] for t in trace] == ["rejected", "accepted", "skipped"]
+
+
+@pytest.mark.asyncio
+async def test_hedged_starts_next_model_after_budget_and_cancels_loser():
+    attempt, log = _attempts({"a": (1.0, True), "b": (0.02, True)})
+    policy = EscalationPolicy("hedged", hedge_after_s=0.02)
+    res, key, trace = await run_chain(["a", "b"], attempt, _accept, policy)
+    assert key == "b"
+    assert log["cancelled"] == ["a"]
+    assert trace[1]["hedged"] is True and trace[0]["status"] == "cancelled"
+
+
+@pytest.mark.asyncio
+async def test_speculative_races_first_models():
+    attempt, log = _attempts({"a": (0.05, True), "b": (0.01, False), "c": (0, True)})
+    policy = EscalationPolicy("speculative", speculative_width=2)
+    res, key, _ = await run_chain(["a", "b", "c"], attempt, _accept, policy)
+    assert key == "a"
+    assert log["started"] == ["a", "b"]  # c never needed
+
+
+@pytest.mark.asyncio
+async def test_no_acceptable_result_returns_best_ranked_and_errors_are_tolerated():
+    async def attempt(key, depth):
+        if key == "boom":
+            raise RuntimeError("down")
+        return {"model": key, "ok": False, "signals": 1 if key == "a" else 2}
+
+    res, key, trace = await run_chain(["a", "boom", "b"], attempt, _accept, EscalationPolicy(),
+                                      rank=lambda r: r["signals"])
+    assert key == "a"
+    assert trace[1]["status"] == "error"
+
+    async def always_fails(key, depth):
+        raise RuntimeError(key)
+
+    with pytest.raises(RuntimeError, match="x"):
+        await run_chain(["x", "y"], always_fails, _accept, EscalationPolicy())
+
+
+def test_policy_from_routing_config():
+    r = Router(load_configs(None)["routing"])
+    assert r.escalation_policy().strategy == "sequential"
+    assert r.escalation_policy("hedged").strategy == "hedged"
+    with pytest.raises(ValueError):
+        r.escalation_policy("yolo")
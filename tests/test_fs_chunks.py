@@ -0,0 +1,63 @@
+from pathlib import Path
+
+import pytest
+
+from empyrean_ai.curator.inference.retrieval.fs_chunks import chunk_file, chunk_text, iter_chunks
+
+
+def test_chars_with_overlap_covers_text():
+    chunks = chunk_text("abcdefghij", "chars", 4, overlap=1)
+    assert chunks == ["abcd", "defg", "ghij"]
+    assert chunk_text("abcdefghij", "chars", 4) == ["abcd", "efgh", "ij"]
+
+
+def test_lines_carry_trailing_lines(tmp_path: Path):
+    p = tmp_path / "doc.txt"
+    p.write_text("\n".join(f"l{i}" for i in range(6)), encoding="utf-8")
+    assert chunk_file(p, "lines", 8) == ["l0\nl1\nl2", "l3\nl4\nl5"]
+    assert chunk_file(p, "lines", 8, overlap=3) == ["l0\nl1\nl2", "l2\nl3\nl4", "l4\nl5"]
+
+
+def test_tokens_mode_and_bad_overlap():
+    text = " ".join(["word"] * 100)
+    chunks = chunk_text(text, "tokens", 30)
+    assert len(chunks) >= 4
+    with pytest.raises(ValueError):
+        chunk_text(text, "chars", 10, overlap=10)
+
+
+def test_tokens_mode_uses_the_given_chars_per_token(tmp_path: Path):
+    p = tmp_path / "doc.txt"
+    p.write_text(" ".join(["internationalisation"] * 40), encoding="utf-8")
+    assert len(chunk_file(p, "tokens", 60, chars_per_token=2.0)) > len(chunk_file(p, "tokens", 60))
+
+
+@pytest.mark.parametrize("mode", ["chars", "lines"])
+def test_iter_chunks_matches_chunk_text_with_offsets(tmp_path: Path, mode):
+    text = "\n".join(f"ligne {i} ✓ 𝄞" for i in range(50)) + "\n" + "ü" * 70 + "\ntail"
+    p = tmp_path / "doc.txt"
+    p.write_bytes(text.encode("utf-8"))
+    data = p.read_bytes()
+    got = list(iter_chunks(p, mode, 25, overlap=5))
+    assert [c.text for c in got] == chunk_text(text, mode, 25, overlap=5)
+    for c in got:
+        assert data[c.start : c.end].decode("utf-8") == c.text
+
+
+def test_iter_chunks_bytes_never_split_characters(tmp_path: Path):
+    p = tmp_path / "doc.txt"
+    p.write_bytes(("é" * 10 + "𝄞" * 10).encode("utf-8"))
+    chunks = list(iter_chunks(p, "bytes", 7, overlap=2))
+    assert all(len(c.text.encode("utf-8")) <= 7 for c in chunks)
+    assert chunks[0].start == 0 and chunks[-1].end == p.stat().st_size
+    assert all(a.start < b.start <= a.end for a, b in zip(chunks, chunks[1:]))
+    assert chunks[1].start < chunks[0].end  # overlap where the characters allow it
+    (tmp_path / "empty.txt").write_bytes(b"")
+    assert list(iter_chunks(tmp_path / "empty.txt", "bytes", 7)) == []
+
+
+def test_iter_chunks_is_lazy(tmp_path: Path):
+    p = tmp_path / "doc.txt"
+    p.write_text("x" * 10_000, encoding="utf-8")
+    it = iter_chunks(p, "chars", 100)
+    assert next(it).text == "x" * 100
@@ -0,0 +1,55 @@
+import json
+from pathlib import Path
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from empyrean_ai.config import load_configs  # noqa: E402
+from empyrean_ai.curator.learned_classifier import LearnedClassifier, load_examples  # noqa: E402
+from empyrean_ai.curator.router import Router  # noqa: E402
+
+_EXAMPLES = [
+    ("the worker crashes with a segfault in the allocator", "bug_triage", 1.0),
+    ("segfault after upgrading, core dumped on startup", "bug_triage", 1.0),
+    ("write a short poem about autumn leaves", "creative", 1.0),
+    ("a poem for my sister's wedding toast", "creative", 1.0),
+]
+
+
+def _model():
+    return LearnedClassifier.train(_EXAMPLES, dim=1 << 12, epochs=100)
+
+
+def test_train_save_load_roundtrip(tmp_path: Path):
+    model = _model()
+    assert model.predict("segfault in the allocator")[0] == "bug_triage"
+    assert model.predict("an autumn poem")[0] == "creative"
+    path = tmp_path / "clf.npz"
+    model.save(path)
+    loaded = LearnedClassifier.load(path)
+    texts = ["segfault in the allocator", "an autumn poem", "", "x" * 20_000]
+    assert loaded.classes == model.classes
+    assert np.allclose(loaded.proba_batch(texts), model.proba_batch(texts), atol=1e-6)
+    # a batch scores each text exactly as it scores alone
+    assert np.allclose(loaded.proba_batch(texts), np.vstack([loaded.proba_batch([t]) for t in texts]), atol=1e-6)
+
+
+def test_router_falls_back_to_keywords_below_min_confidence():
+    routing = load_configs(None)["routing"]
+    router = Router(routing, learned=_model())
+    assert router.route("core dumped: segfault in the allocator").source == "learned"
+    router.min_confidence = 1.01
+    c = router.route("Traceback: core dumped")
+    assert (c.task_family, c.source) == ("bug_triage", "keywords")
+    assert router.route("anything", hint="creative").source == "hint"
+    assert Router(routing).learned is None  # configs default to the keyword backend
+
+
+def test_load_examples_uses_only_validated_runs_with_input(tmp_path: Path):
+    golden = tmp_path / "tasks.jsonl"
+    golden.write_text(json.dumps({"id": "g1", "task_family": "creative", "input": "a poem"}) + "\n")
+    runs = [{"task_family": "bug_triage", "input": "segfault", "winner": {"ok": True}},
+            {"task_family": "bug_triage", "input": "segfault", "winner": {"ok": False}},
+            {"task_family": "bug_triage", "winner": {"ok": True}}]
+    assert load_examples(golden, runs) == [("a poem", "creative", 1.0), ("segfault", "bug_triage", 0.5)]
@@ -0,0 +1,103 @@
+import sys
+from pathlib import Path
+
+import httpx
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "benchmarks"))
+
+from fake_ollama import FakeOllama, FakeOllamaConfig, parse_latency  # noqa: E402
+from loadtest import compare, drive, parse_mix  # noqa: E402
+
+from empyrean_ai.curator.inference.ollama_client import OllamaClient  # noqa: E402
+from empyrean_ai.post_validators import validate_output  # noqa: E402
+from test_engine import BASE, _engine  # noqa: E402
+
+
+@pytest.fixture
+def fake_url():
+    fakes = []
+
+    def start(**kw):
+        fake = FakeOllama(FakeOllamaConfig(**kw))
+        fakes.append(fake)
+        return fake, fake.start()
+
+    yield start
+    for fake in fakes:
+        fake.close()
+
+
+@pytest.mark.asyncio
+async def test_fake_ollama_serves_schema_valid_replies_and_model_loads(fake_url):
+    fake, url = fake_url(load_delay=0.05, max_loaded=1)
+    eng = _engine(OllamaClient(base_url=url))
+    try:
+        out = await eng.curate("design_rfc", "Design a cache", "a", n_candidates=1, use_cache=False)
+        assert out["validation"]["ok"]
+        streamed = await eng.curate("extraction", "k: v", "b", n_candidates=1, stream=True, use_cache=False)
+        assert streamed["validation"]["ok"]
+        assert fake.stats["loads"] == 2 and fake.stats["streamed"] == 1
+        assert await eng.client.ps() == ["b"]
+    finally:
+        await eng.aclose()
+
+
+@pytest.mark.asyncio
+async def test_fake_ollama_failure_and_invalid_rates(fake_url):
+    _, url = fake_url(fail_rate=1.0)
+    client = OllamaClient(base_url=url)
+    with pytest.raises(httpx.HTTPStatusError):
+        await client.generate("m", '{"items": []}')
+    await client.aclose()
+
+    fake, url = fake_url(invalid_rate=1.0)
+    client = OllamaClient(base_url=url)
+    res = await client.generate("m", '{"answer": "string", "reasoning": "string"}')
+    await client.aclose()
+    assert not validate_output("analytical", res["text"], BASE / "schemas" / "outputs").ok
+    assert fake.stats["invalid"] == 1
+
+
+@pytest.mark.asyncio
+async def test_drive_reports_percentiles_and_outcomes():
+    async def call(family, text):
+        return "invalid" if "request 3)" in text else "ok"
+
+    report = await drive(call, parse_mix("extraction=1,creative=1"), requests=10, concurrency=4)
+    assert report["outcomes"] == {"invalid": 1, "ok": 9}
+    assert report["latency_ms"]["p99"] is not None and report["req_per_s"] > 0
+
+
+def test_compare_flags_regressions_beyond_tolerance():
+    base = {"req_per_s": 100.0, "latency_ms": {"p95": 10.0, "p99": 20.0}}
+    cur = {"req_per_s": 95.0, "latency_ms": {"p95": 12.0, "p99": 21.0}}
+    assert compare(cur, base, 0.1)["regressions"] == ["latency_ms.p95"]
+    with pytest.raises(ValueError):
+        parse_latency("gamma:1")
+
+
+@pytest.mark.asyncio
+async def test_keep_alive_prefix_reuse_and_repair_context(fake_url):
+    fake, url = fake_url(max_loaded=1)
+    eng = _engine(OllamaClient(base_url=url, keep_alive="10m", keep_alive_models={"a": -1}))
+    eng.salvage = False
+    try:
+        out = await eng.curate("extraction", "key: value", "a", n_candidates=2, use_cache=False)
+        assert [r["keep_alive"] for r in fake.requests] == [-1, -1]
+        assert {r["context_tokens"] for r in fake.requests} == {0}
+        # the variants differ only in a trailing directive, so whichever runs second reuses the prefix
+        assert 0 < out["meta"]["prefill"]["reused_tokens"] < out["meta"]["prefill"]["prompt_tokens"]
+        assert eng.stats()["prefix_reuse"]["hit_ratio"] > 0.4
+
+        fake.config.invalid_rate = 1.0
+        await eng.curate("extraction", "key: other", "a", n_candidates=1, use_cache=False)
+        candidate, repair = fake.requests[2:]
+        assert repair["context_tokens"] > candidate["prompt_chars"] // 4  # continues the failed turn
+        assert repair["prompt_chars"] < 200  # without resending the prompt or the bad output
+
+        await eng.curate("extraction", "key: value", "b", n_candidates=1, use_cache=False)
+        assert fake.requests[-1]["keep_alive"] == "10m"
+        assert sorted(await eng.client.ps()) == ["a", "b"]  # the pinned model was not evicted
+    finally:
+        await eng.aclose()
@@ -0,0 +1,68 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from empyrean_ai.loop_thread import LoopThread
+
+
+def test_blocking_callers_share_one_loop_concurrently():
+    lt = LoopThread()
+    loops = []
+
+    async def work():
+        loops.append(asyncio.get_running_loop())
+        await asyncio.sleep(0.1)
+        return threading.current_thread().name
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(lt.run(work()))) for _ in range(8)]
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert time.perf_counter() - t0 < 0.5  # overlapped, not 8 x 0.1 s
+    assert results == ["empyrean-loop"] * 8 and len(set(map(id, loops))) == 1
+    lt.close()
+
+
+def test_timeout_cancels_and_close_runs_closers():
+    lt = LoopThread()
+    cancelled = asyncio.Event()
+    closed = []
+
+    async def slow():
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    async def closer():
+        closed.append(True)
+
+    with pytest.raises(TimeoutError):
+        lt.run(slow(), timeout=0.05)
+    assert lt.run(asyncio.wait_for(cancelled.wait(), 1)) is True
+
+    async def reentrant():
+        lt.run(asyncio.sleep(0))
+
+    with pytest.raises(RuntimeError):
+        lt.run(reentrant())
+    lt.add_closer(closer)
+    lt.close()
+    assert closed == [True]
+
+
+def test_forward_runs_on_the_loop_from_any_loop():
+    lt = LoopThread()
+
+    async def where():
+        return threading.current_thread().name
+
+    assert asyncio.run(lt.forward(where())) == "empyrean-loop"
+    assert lt.run(lt.forward(where())) == "empyrean-loop"  # already on the loop: awaited directly
+    lt.close()
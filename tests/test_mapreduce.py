@@ -0,0 +1,47 @@
+import json
+
+import pytest
+
+from empyrean_ai.curator.mapreduce import reduce_outputs
+from test_engine import FakeClient, _engine
+
+
+def test_reducers_merge_deterministically():
+    parts = [{"items": [{"key": "a", "value": "1"}]}, {"items": [{"key": "a", "value": "1"}, {"key": "b", "value": "2"}]}]
+    assert reduce_outputs("extraction", parts) == {"items": [{"key": "a", "value": "1"}, {"key": "b", "value": "2"}]}
+    rfc = reduce_outputs("design_rfc", [
+        {"title": "T", "summary": "s1", "pros": ["p"], "cons": [], "decision": "go"},
+        {"title": "T2", "summary": "s2", "pros": ["p", "q"], "cons": ["c"], "decision": "wait"},
+        {"title": "", "summary": "s1", "pros": [], "cons": [], "decision": "wait"},
+    ])
+    assert rfc == {"title": "T", "summary": "s1\n\ns2", "pros": ["p", "q"], "cons": ["c"], "decision": "wait"}
+    triage = reduce_outputs("bug_triage", [{"confidence": 0.2, "bug_summary": "x"}, {"confidence": 0.9, "bug_summary": "y"}])
+    assert triage["bug_summary"] == "y"
+    with pytest.raises(ValueError):
+        reduce_outputs("extraction", [])
+
+
+@pytest.mark.asyncio
+async def test_map_reduce_merges_chunks_and_reports_latency():
+    def reply(prompt):
+        key = "alpha" if "alpha" in prompt else "beta"
+        return json.dumps({"items": [{"key": key, "value": "v"}]}), 0.05
+
+    client = FakeClient(reply=reply)
+    eng = _engine(client, max_concurrency=2)
+    out = await eng.curate_map_reduce("extraction", ["alpha doc", "beta doc", "alpha again"], "m")
+    assert out["validation"]["ok"]
+    assert json.loads(out["text"])["items"] == [{"key": "alpha", "value": "v"}, {"key": "beta", "value": "v"}]
+    meta = out["meta"]
+    assert [c["index"] for c in meta["chunks"]] == [0, 1, 2]
+    assert all(c["elapsed"] >= 0.05 for c in meta["chunks"])
+    assert client.peak == 2
+    assert meta["merged"] == 3 and meta["chunk_latency"]["max"] >= 0.05
+
+
+@pytest.mark.asyncio
+async def test_map_reduce_skips_invalid_chunks():
+    client = FakeClient(reply=lambda p: ("nope", 0) if "bad" in p or "previous output" in p else (json.dumps({"items": []}), 0))
+    out = await _engine(client).curate_map_reduce("extraction", ["good", "bad"], "m")
+    assert out["validation"]["ok"]
+    assert [c["merged"] for c in out["meta"]["chunks"]] == [True, False]
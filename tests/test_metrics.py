@@ -0,0 +1,62 @@
+import pytest
+
+from empyrean_ai import metrics
+from empyrean_ai.curator.inference.retries import with_retry
+from empyrean_ai.metrics import Registry
+
+from test_engine import FakeClient, _engine
+
+
+def test_histogram_renders_cumulative_buckets():
+    reg = Registry()
+    h = reg.histogram("lat_seconds", "latency", ("stage",), buckets=(0.1, 1.0))
+    c = reg.counter("calls", "calls", ("op",))
+    for v in (0.05, 0.5, 0.5, 3.0):
+        h.observe(v, "gen")
+    c.inc('a"b')
+    text = reg.render()
+    assert '# TYPE lat_seconds histogram' in text
+    assert 'lat_seconds_bucket{stage="gen",le="0.1"} 1' in text
+    assert 'lat_seconds_bucket{stage="gen",le="1"} 3' in text
+    assert 'lat_seconds_bucket{stage="gen",le="+Inf"} 4' in text
+    assert 'lat_seconds_count{stage="gen"} 4' in text
+    assert 'calls_total{op="a\\"b"} 1' in text
+    with pytest.raises(ValueError):
+        h.observe(1.0)
+
+
+@pytest.mark.asyncio
+async def test_engine_records_stage_latency_and_token_rates():
+    class CountingClient(FakeClient):
+        async def generate(self, model, prompt, options=None):
+            res = await super().generate(model, prompt, options)
+            return {**res, "raw": {"prompt_eval_count": 100, "prompt_eval_duration": 50_000_000,
+                                   "eval_count": 40, "eval_duration": 1_000_000_000}}
+
+    eng = _engine(CountingClient(delay=0.01))
+    tokens = metrics.TOKENS.value("metrics-m", "completion")
+    generated, _ = metrics.STAGE_SECONDS.snapshot("generate", "extraction", "metrics-m")
+    rates, rate_sum = metrics.TOKENS_PER_SECOND.snapshot("metrics-m", "completion")
+
+    await eng.curate("extraction", "key: value", "metrics-m", n_candidates=2, early_stop=False)
+
+    assert metrics.TOKENS.value("metrics-m", "completion") - tokens == 80
+    assert metrics.STAGE_SECONDS.snapshot("generate", "extraction", "metrics-m")[0] - generated == 2
+    n, total = metrics.TOKENS_PER_SECOND.snapshot("metrics-m", "completion")
+    assert n - rates == 2 and total - rate_sum == pytest.approx(80.0)
+    assert 'empyrean_queue_wait_seconds_count{model="metrics-m",priority="initial"}' in metrics.render()
+
+
+@pytest.mark.asyncio
+async def test_retries_are_counted_by_exception():
+    calls = []
+
+    async def flaky():
+        calls.append(1)
+        if len(calls) < 3:
+            raise ConnectionError("down")
+        return "ok"
+
+    before = metrics.RETRIES.value("ConnectionError")
+    assert await with_retry(flaky, retries=3, backoff=0.0, retry_on=(ConnectionError,)) == "ok"
+    assert metrics.RETRIES.value("ConnectionError") - before == 2
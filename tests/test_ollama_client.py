@@ -0,0 +1,118 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from empyrean_ai.curator.inference.ollama_client import OllamaClient
+
+
+def _mock_client(delay: float = 0.0) -> httpx.AsyncClient:
+    async def handler(request: httpx.Request) -> httpx.Response:
+        await asyncio.sleep(delay)
+        return httpx.Response(200, json={"response": "{}", "eval_count": 1})
+
+    return httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+
+@pytest.mark.asyncio
+async def test_owned_pool_is_created_once_and_closed():
+    c = OllamaClient(base_url="http://ollama.test", max_connections=3, max_keepalive=2)
+    await c.start()
+    pool = c._client
+    await c.start()
+    assert c._client is pool
+    await c.aclose()
+    assert pool is not None and pool.is_closed
+    assert c._client is None
+
+
+@pytest.mark.asyncio
+async def test_injected_client_is_reused_and_left_open():
+    inner = _mock_client()
+    async with OllamaClient(base_url="http://ollama.test", client=inner) as c:
+        for _ in range(3):
+            res = await c.generate("m", "p")
+            assert res["text"] == "{}"
+    assert not inner.is_closed
+    assert c.pool_stats()["requests"] == 3
+    await inner.aclose()
+
+
+@pytest.mark.asyncio
+async def test_pool_stats_count_in_flight_and_waits():
+    c = OllamaClient(base_url="http://ollama.test", client=_mock_client(delay=0.05), max_connections=2)
+    task = asyncio.gather(*(c.generate("m", "p") for _ in range(3)))
+    await asyncio.sleep(0.01)
+    assert c.pool_stats()["in_flight"] == 3
+    await task
+    stats = c.pool_stats()
+    assert stats["in_flight"] == 0
+    assert stats["pool_waits"] == 1
+
+
+def test_from_config_reads_runtime_section():
+    c = OllamaClient.from_config({"ollama": {"max_connections": 7, "timeout": 5, "http2": False}})
+    assert c.max_connections == 7
+    assert c.timeout == 5.0
+    c = OllamaClient.from_config({"ollama": {"keep_alive": "10m", "keep_alive_models": {"hot": -1}}})
+    assert c._body("hot", "p", None, False, [1, 2])["keep_alive"] == -1
+    assert c._body("cold", "p", None, False, None) == {"model": "cold", "prompt": "p", "stream": False,
+                                                       "keep_alive": "10m"}
+
+
+def _ndjson_client(pieces: list[str]) -> httpx.AsyncClient:
+    async def handler(request: httpx.Request) -> httpx.Response:
+        assert json.loads(request.content)["stream"] is True
+        lines = [json.dumps({"response": p, "done": False}) for p in pieces]
+        lines.append(json.dumps({"response": "", "done": True, "eval_count": len(pieces)}))
+        return httpx.Response(200, content="\n".join(lines).encode())
+
+    return httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+
+@pytest.mark.asyncio
+async def test_generate_stream_collects_chunks_and_final_stats():
+    seen: list[str] = []
+    c = OllamaClient(base_url="http://ollama.test", client=_ndjson_client(['{"a"', ": 1", "}"]))
+    res = await c.generate_stream("m", "p", on_chunk=seen.append)
+    assert res["text"] == '{"a": 1}'
+    assert seen == ['{"a"', ": 1", "}"]
+    assert res["aborted"] is None
+    assert res["raw"]["eval_count"] == 3
+
+
+@pytest.mark.asyncio
+async def test_generate_stream_stops_when_check_objects():
+    c = OllamaClient(base_url="http://ollama.test", client=_ndjson_client(["Sure", "!", " {", "}"]))
+    res = await c.generate_stream("m", "p", check=lambda piece: "invalid_json" if "Sure" in piece else None)
+    assert res["aborted"] == "invalid_json"
+    assert res["text"] == "Sure"
+
+
+@pytest.mark.asyncio
+async def test_embed_posts_batch():
+    seen = []
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        seen.append(json.loads(request.content))
+        return httpx.Response(200, json={"embeddings": [[0.1, 0.2], [0.3, 0.4]]})
+
+    inner = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    async with OllamaClient(base_url="http://ollama.test", client=inner) as c:
+        assert await c.embed("nomic-embed-text", ["a", "b"]) == [[0.1, 0.2], [0.3, 0.4]]
+    assert seen == [{"model": "nomic-embed-text", "input": ["a", "b"]}]
+    await inner.aclose()
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("body", [{}, {"embeddings": [[0.1]]}, {"embeddings": None, "error": "not an embedding model"}])
+async def test_embed_rejects_replies_without_one_vector_per_input(body):
+    async def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200, json=body)
+
+    inner = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    async with OllamaClient(base_url="http://ollama.test", client=inner) as c:
+        with pytest.raises(ValueError, match="for 2 inputs"):
+            await c.embed("m", ["a", "b"])
+    await inner.aclose()
@@ -0,0 +1,82 @@
+import pytest
+
+from empyrean_ai.post_validators import IncrementalJSONValidator, parse_json_strict, salvage_json
+
+
+def _feed(text: str, step: int = 3) -> IncrementalJSONValidator:
+    v = IncrementalJSONValidator()
+    for i in range(0, len(text), step):
+        if v.feed(text[i : i + step]):
+            break
+    return v
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        '{"a": [1, -2.5e3, true, null, {}], "b": "x\\"y"}',
+        "{}",
+        '``` {"items": []} ```',
+        '```json\n{"items": []}\n```',
+        'Sure! {"a": 1}',
+        '<think>plan {a} and [b]</think>\n{"a": 1}',
+    ],
+)
+def test_incremental_accepts_valid_json(text):
+    v = _feed(text)
+    assert v.signal is None
+    assert v.complete
+
+
+@pytest.mark.parametrize(
+    "text",
+    ['{"a" 1}', '{"a": 1,}', "[1,]", '{"a": tru}', '{"a": 1}}', '{"a": 01}'],
+)
+def test_incremental_flags_invalid_json_early(text):
+    v = _feed(text)
+    assert v.signal == "invalid_json"
+    assert v.error
+
+
+def test_incremental_flags_refusal_inside_strings():
+    v = _feed('{"answer": "Sorry, I cannot comply with this request", "more": "...')
+    assert v.signal == "refusal_detected"
+
+
+def test_incremental_flags_refusal_in_preamble_and_endless_prose():
+    assert _feed("I'm sorry, but I cannot comply with that.").signal == "refusal_detected"
+    assert _feed("<think>they asked me to refuse nothing</think>").signal is None
+    v = IncrementalJSONValidator(max_preamble=20)
+    v.feed("Let me explain the whole thing first.")
+    assert v.signal == "invalid_json"
+
+
+def test_incremental_partial_output_is_not_complete():
+    v = _feed('{"items": [{"key": "a"')
+    assert v.signal is None
+    assert not v.complete
+
+
+def test_parse_json_strict_strips_tagged_fences():
+    assert parse_json_strict('```json\n{"a": 1}\n```') == ({"a": 1}, None)
+
+
+@pytest.mark.parametrize(
+    ("text", "expected", "fix"),
+    [
+        ('Here you go:\n```json\n{"a": [1, 2,],}\n```\nDone.', {"a": [1, 2]}, "syntax"),
+        (r"""{'answer': 'it\'s "x"', 'ok': True, 'n': None}""", {"answer": "it's \"x\"", "ok": True, "n": None}, "syntax"),
+        ('<think>plan {a}</think><json>{"a": "two\nlines"}</json>', {"a": "two\nlines"}, "syntax"),
+        ('{"items": [{"key": "a", "value": "b"}, {"key": "c", "val', {"items": [{"key": "a", "value": "b"}, {"key": "c"}]}, "truncated"),
+        ('{"a": {"b": [1, 2', {"a": {"b": [1, 2]}}, "closed"),
+        ('{"a": "x}y"} and then {"b": 1}', {"a": "x}y"}, "extract"),
+    ],
+)
+def test_salvage_json_fixes_mechanical_errors(text, expected, fix):
+    data, fixes = salvage_json(text)
+    assert data == expected
+    assert fix in fixes
+
+
+def test_salvage_json_gives_up_without_json():
+    assert salvage_json("I could not find anything to extract.")[0] is None
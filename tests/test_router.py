@@ -7,3 +7,24 @@ def test_classify_and_alias():
     assert r.classify("Please implement a function") == "code_assist"
     assert r.classify("Design an architecture") == "design_rfc"
     assert r.alias("quen3:30b") == "qwen3:30b"
+
+
+def test_weighted_scoring_and_word_start_matching():
+    r = Router(load_configs(None)["routing"])
+    # first-match would stop at "code"; design keywords outweigh it
+    assert r.classify("Design an architecture and RFC for the code review service") == "design_rfc"
+    assert r.classify("Please debug nothing here") == "analytical"  # "bug" only at a word start
+    assert r.classify("IMPLEMENTATION of the parser") == "code_assist"
+    assert r.classify("Traceback: foo", hint="creative") == "creative"
+
+
+def test_large_inputs_scan_bounded_windows():
+    from empyrean_ai.curator.classifier import KeywordClassifier
+
+    clf = KeywordClassifier({"bug_triage": {"keywords": {"traceback": 1}}}, window_chars=100,
+                            sample_blocks=2, sample_chars=10)
+    filler = "x " * 50_000
+    assert sum(e - s for s, e in clf.spans(len(filler))) == 220
+    assert clf.classify(filler + " traceback") == "bug_triage"  # tail window
+    assert clf.classify(filler[:1000] + " traceback " + filler) == "analytical"  # unsampled middle
+    assert KeywordClassifier.from_config(None).classify("a stack trace") == "bug_triage"
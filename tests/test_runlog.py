@@ -0,0 +1,93 @@
+import asyncio
+import json
+from pathlib import Path
+
+import pytest
+
+from empyrean_ai.evaluators import log_run
+from empyrean_ai.runlog import RunLogWriter, iter_runs, run_dir_from_config
+
+
+@pytest.mark.asyncio
+async def test_records_are_batched_into_a_daily_segment(tmp_path: Path):
+    w = RunLogWriter(tmp_path, flush_interval=10, batch_size=3)
+    for i in range(7):
+        await w.log({"i": i})
+    await asyncio.sleep(0.05)
+    assert w.written == 6  # two full batches flushed without waiting for the interval
+    await w.aclose()
+    assert w.stats() == {"queued": 0, "written": 7, "dropped": 0, "batches": 3}
+    seg = w.segment_path()
+    assert seg.name.startswith("runs-") and seg.suffix == ".jsonl"
+    assert [json.loads(x)["i"] for x in seg.read_text().splitlines()] == list(range(7))
+
+
+@pytest.mark.asyncio
+async def test_drop_policies_when_queue_is_full(tmp_path: Path):
+    newest = RunLogWriter(tmp_path / "n", max_queue=2, when_full="drop_newest", flush_interval=10)
+    await newest.start()
+    # the writer task has not run yet, so the queue fills up
+    results = [await newest.log({"i": i}) for i in range(4)]
+    assert results == [True, True, False, False]
+    await newest.aclose()
+    assert [r["i"] for r in iter_runs(tmp_path / "n")] == [0, 1]
+
+    oldest = RunLogWriter(tmp_path / "o", max_queue=2, when_full="drop_oldest", flush_interval=10)
+    await oldest.start()
+    for i in range(4):
+        await oldest.log({"i": i})
+    await oldest.aclose()
+    assert [r["i"] for r in iter_runs(tmp_path / "o")] == [2, 3]
+    assert oldest.dropped == 2
+
+
+@pytest.mark.asyncio
+async def test_gzip_segments_round_trip(tmp_path: Path):
+    w = RunLogWriter(tmp_path, batch_size=2, flush_interval=0.01, compression="gzip")
+    for i in range(5):
+        await w.log({"i": i})
+        await asyncio.sleep(0.02)
+    await w.aclose()
+    assert w.segment_path().name.endswith(".jsonl.gz")
+    assert w.batches > 1  # several gzip members appended to the same file
+    assert [r["i"] for r in iter_runs(tmp_path)] == list(range(5))
+
+
+def test_iter_runs_reads_legacy_files_and_filters_days(tmp_path: Path):
+    log_run(tmp_path, {"legacy": True})
+    (tmp_path / "runs-19990101.jsonl").write_text('{"old": 1}\n{"torn', encoding="utf-8")
+    assert list(iter_runs(tmp_path)) == [{"old": 1}, {"legacy": True}]
+    assert list(iter_runs(tmp_path, days={"19990101"})) == [{"old": 1}]
+
+
+@pytest.mark.asyncio
+async def test_engine_logs_input_prefix_only_when_enabled(tmp_path: Path):
+    from test_engine import FakeClient, _engine
+
+    w = RunLogWriter(tmp_path, flush_interval=0.01)
+    eng = _engine(FakeClient(), run_log=w)
+    eng.log_input_chars = 5
+    out = await eng.curate("extraction", "key: value", "m", n_candidates=1, use_cache=False,
+                           run_dir=tmp_path)
+    await w.aclose()
+    assert "input" not in out["meta"]
+    assert [r["input"] for r in iter_runs(tmp_path)] == ["key: "]
+
+
+@pytest.mark.asyncio
+async def test_records_go_to_the_callers_run_dir(tmp_path: Path):
+    w = RunLogWriter(tmp_path / "default", flush_interval=0.01)
+    await w.log({"i": 0})
+    await w.log({"i": 1}, tmp_path / "other")
+    await w.aclose()
+    assert list(iter_runs(tmp_path / "default")) == [{"i": 0}]
+    assert list(iter_runs(tmp_path / "other")) == [{"i": 1}]
+    assert w.stats()["written"] == 2
+
+
+def test_run_dir_comes_from_config_even_when_the_writer_is_off(tmp_path: Path):
+    cfg = {"run_log": {"enabled": False, "dir": "logs/runs"}}
+    assert RunLogWriter.from_config(cfg, tmp_path) is None
+    assert run_dir_from_config(cfg, tmp_path) == tmp_path / "logs" / "runs"
+    assert run_dir_from_config({"run_log": {"dir": str(tmp_path / "abs")}}, Path("/elsewhere")) == tmp_path / "abs"
+    assert run_dir_from_config(None, tmp_path) == tmp_path / "data" / "runs"
@@ -0,0 +1,133 @@
+import asyncio
+import time
+
+import pytest
+
+from empyrean_ai.config import load_configs
+from empyrean_ai.curator.scheduler import DeadlineExceeded, ModelScheduler, Priority, QueueFull
+
+
+@pytest.mark.asyncio
+async def test_limit_is_per_model():
+    s = ModelScheduler({"big": 1, "small": 2})
+    peak = {"big": 0, "small": 0}
+    active = {"big": 0, "small": 0}
+
+    async def job(model):
+        async with s.slot(model):
+            active[model] += 1
+            peak[model] = max(peak[model], active[model])
+            await asyncio.sleep(0.01)
+            active[model] -= 1
+
+    await asyncio.gather(*(job("big") for _ in range(3)), *(job("small") for _ in range(4)))
+    assert peak == {"big": 1, "small": 2}
+    assert s.stats()["models"]["big"]["admitted"] == 3
+
+
+@pytest.mark.asyncio
+async def test_queue_is_served_by_priority_then_arrival():
+    s = ModelScheduler({"m": 1})
+    order: list[str] = []
+    await s.acquire("m")
+
+    async def job(name, prio):
+        async with s.slot("m", prio):
+            order.append(name)
+
+    tasks = [asyncio.create_task(job("init", Priority.INITIAL)),
+             asyncio.create_task(job("esc", Priority.ESCALATION)),
+             asyncio.create_task(job("repair", Priority.REPAIR)),
+             asyncio.create_task(job("init2", Priority.INITIAL))]
+    await asyncio.sleep(0.01)
+    s.release("m")
+    await asyncio.gather(*tasks)
+    assert order == ["repair", "esc", "init", "init2"]
+
+
+@pytest.mark.asyncio
+async def test_full_queue_and_deadline_are_shed():
+    s = ModelScheduler({"m": 1}, max_queue=1)
+    await s.acquire("m")
+    waiter = asyncio.create_task(s.acquire("m", deadline=time.monotonic() + 0.05))
+    await asyncio.sleep(0)
+    with pytest.raises(QueueFull) as full:
+        await s.acquire("m")
+    assert full.value.status_code == 429
+    with pytest.raises(DeadlineExceeded) as late:
+        await waiter
+    assert late.value.status_code == 503
+    stats = s.stats()["models"]["m"]
+    assert stats["shed"] == 1 and stats["rejected"] == 1 and stats["queued"] == 0
+
+
+@pytest.mark.asyncio
+async def test_cancelled_waiter_gives_up_its_place():
+    s = ModelScheduler({"m": 1})
+    await s.acquire("m")
+    waiter = asyncio.create_task(s.acquire("m"))
+    await asyncio.sleep(0)
+    waiter.cancel()
+    await asyncio.gather(waiter, return_exceptions=True)
+    s.release("m")
+    assert s.stats()["models"]["m"]["active"] == 0
+    await asyncio.wait_for(s.acquire("m"), 0.1)
+
+
+def test_limits_come_from_models_yml():
+    s = ModelScheduler.from_config(load_configs(None)["models"])
+    assert s.limits["curated/nemotron-70b:curated"] == 1
+    assert s.max_queue == 64 and s.default_deadline_s == 120
+
+
+@pytest.mark.asyncio
+async def test_affinity_batches_the_running_model():
+    s = ModelScheduler({"a": 1, "b": 1}, affinity=True, max_resident=1, max_wait_s=60)
+    order: list[str] = []
+    await s.acquire("a")
+
+    async def job(model, name):
+        async with s.slot(model):
+            order.append(name)
+
+    tasks = [asyncio.create_task(job("b", "b1")), asyncio.create_task(job("a", "a1")),
+             asyncio.create_task(job("a", "a2"))]
+    await asyncio.sleep(0.01)
+    s.release("a")
+    await asyncio.gather(*tasks)
+    # b arrived first but "a" is loaded: drain it before swapping
+    assert order == ["a1", "a2", "b1"]
+    assert s.stats()["swaps"] == 2
+
+
+@pytest.mark.asyncio
+async def test_affinity_switches_when_another_model_is_overdue():
+    s = ModelScheduler({"a": 2, "b": 1}, affinity=True, max_resident=1, max_wait_s=0.02)
+    order: list[str] = []
+    await s.acquire("a")
+
+    async def job(model, name):
+        async with s.slot(model):
+            order.append(name)
+
+    b = asyncio.create_task(job("b", "b1"))
+    await asyncio.sleep(0.05)
+    # "a" has a free slot, but b has waited too long: a stops taking new work
+    a = asyncio.create_task(job("a", "a1"))
+    await asyncio.sleep(0)
+    assert order == []
+    s.release("a")
+    await asyncio.gather(a, b)
+    assert order == ["b1", "a1"]
+
+
+def test_resident_preference_and_load_accounting():
+    s = ModelScheduler(affinity=True)
+    s.set_resident(["qwen3:30b"])
+    assert s.prefer_resident(["devstral:24b", "qwen3:30b"]) == 1
+    assert s.prefer_resident(["devstral:24b"]) == 0
+    s.record_load("qwen3:30b", 2_000_000_000)
+    s.record_load("qwen3:30b", 10_000)  # warm call, below the threshold
+    stats = s.stats()
+    assert stats["models"]["qwen3:30b"]["loads"] == 1
+    assert stats["load_seconds"] == pytest.approx(2.0)
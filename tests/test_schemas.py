@@ -0,0 +1,44 @@
+import json
+import os
+from pathlib import Path
+
+from empyrean_ai.post_validators import SchemaRegistry, marker_signals, validate_output
+
+SCHEMAS = Path(__file__).resolve().parents[1] / "schemas" / "outputs"
+
+
+def test_registry_compiles_every_repo_schema_once():
+    reg = SchemaRegistry(SCHEMAS)
+    families = reg.load_all()
+    assert {"extraction", "bug_triage", "code_assist", "creative", "design_rfc", "analytical"} <= set(families)
+    assert reg.validator("extraction") is reg.validator("extraction")
+
+
+def test_registry_recompiles_on_mtime_change_and_explicit_reload(tmp_path: Path):
+    path = tmp_path / "fam.schema.json"
+    path.write_text(json.dumps({"type": "object", "required": ["a"]}), encoding="utf-8")
+    reg = SchemaRegistry(tmp_path, check_interval=0.0)
+    assert not reg.validator("fam").is_valid({})
+
+    path.write_text(json.dumps({"type": "object"}), encoding="utf-8")
+    st = path.stat()
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+    assert reg.validator("fam").is_valid({})
+
+    first = reg.validator("fam")
+    reg.reload()
+    assert reg.validator("fam") is not first
+
+
+def test_marker_signals_scan_parsed_strings():
+    data = {"items": [{"key": "ünsure?", "value": "I'm not sure about this"}], "n": 3}
+    assert marker_signals(data) == ["uncertainty_markers"]
+    assert marker_signals({"a": ["fine", {"b": "We refuse"}]}) == ["refusal_detected"]
+    assert marker_signals({"a": 1}) == []
+
+
+def test_validate_output_uses_compiled_schema():
+    ok = validate_output("extraction", json.dumps({"items": [{"key": "a", "value": "maybe"}]}), SCHEMAS)
+    assert ok.ok and ok.signals == ["uncertainty_markers"]
+    bad = validate_output("extraction", json.dumps({"items": [{"key": 1}]}), SCHEMAS)
+    assert not bad.ok and "schema_fail" in bad.signals
@@ -0,0 +1,70 @@
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from empyrean_ai import server
+from test_engine import VALID, FakeClient
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr(server.engine, "client", FakeClient(delay=0.01))
+    monkeypatch.setattr(server.engine, "run_log", None)
+    monkeypatch.setattr(server.service, "run_dir", tmp_path)
+    with TestClient(server.app) as c:
+        yield c
+
+
+def _post_batch(client, lines, **params):
+    def upload():  # sent chunked, as a streaming upload would be
+        for line in lines:
+            yield (line + "\n").encode()
+
+    r = client.post("/v1/curate/batch", params=params, content=upload())
+    assert r.status_code == 200
+    return [json.loads(ln) for ln in r.text.splitlines()]
+
+
+def test_batch_endpoint_streams_results_and_reports_bad_lines(client):
+    item = {"task_family": "extraction", "bypass_cache": True}
+    out = _post_batch(client, [json.dumps({**item, "id": "a", "input": "key: value"}),
+                               "{not json",
+                               json.dumps({**item, "id": "c", "input": "x", "escalation": "bogus"})])
+    by_id = {ln["id"]: ln for ln in out if ln["event"] in ("result", "error")}
+    assert by_id["a"]["event"] == "result"
+    assert by_id["a"]["output"] == VALID and by_id["a"]["validation"]["ok"]
+    assert "meta" not in by_id["a"]
+    assert by_id[2]["error"].startswith("line 2: invalid JSON")
+    assert by_id["c"]["event"] == "error" and "bogus" in by_id["c"]["error"]
+    done = out[-1]
+    assert done["event"] == "done" and (done["done"], done["failed"]) == (1, 2)
+    assert "total" not in done  # unknown unless the client says
+
+
+def test_batch_endpoint_reports_total_when_given(client):
+    line = json.dumps({"task_family": "extraction", "input": "key: value", "bypass_cache": True})
+    out = _post_batch(client, [line, line], total=2, meta=True)
+    assert [ln["event"] for ln in out] == ["result", "result", "done"]
+    assert "meta" in out[0]
+    assert (out[-1]["total"], out[-1]["remaining"]) == (2, 0)
+
+
+def test_batch_endpoint_rejects_bad_job_id(client):
+    assert client.post("/v1/curate/batch", params={"job_id": "../x"}, content=b"").status_code == 400
+
+
+def test_deadline_applies_to_each_escalation_step(client, monkeypatch):
+    calls = []
+
+    def reply(prompt):  # the first model (and its repair) is slow and wrong, the escalation is quick
+        calls.append(prompt)
+        return ("not json", 0.15) if len(calls) <= 2 else (VALID, 0.0)
+
+    monkeypatch.setattr(server.engine, "client", FakeClient(reply=reply))
+    r = client.post("/v1/curate", json={"task_family": "extraction", "input": "key: value", "n_candidates": 1,
+                                        "bypass_cache": True, "escalation": "sequential", "deadline_s": 0.2})
+    assert r.status_code == 200
+    body = r.json()
+    assert body["validation"]["ok"]
+    assert [step["status"] for step in body["meta"]["escalation"]][:2] == ["rejected", "accepted"]
@@ -0,0 +1,62 @@
+import asyncio
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "benchmarks"))
+
+from fake_ollama import FakeOllama  # noqa: E402
+
+from empyrean_ai.loop_thread import shared_loop  # noqa: E402
+from services.gateway import infer  # noqa: E402
+from services.router import routerd  # noqa: E402
+
+
+@pytest.fixture
+def fake(monkeypatch):
+    fake = FakeOllama()
+    monkeypatch.setenv("OLLAMA_HOST", fake.start())
+    monkeypatch.setattr(infer, "_client", None)
+    yield fake
+    client = infer._client
+    if client is not None:
+        shared_loop().run(client.aclose())
+    fake.close()
+
+
+def test_handle_and_ahandle_share_the_loop_bound_client(fake):
+    text = "Traceback: the parser crashes on empty input"
+    first = asyncio.run(routerd.ahandle(text))  # a short-lived loop of its own
+    second = routerd.handle(text)
+    third = asyncio.run(routerd.ahandle(text))
+    assert first == {**second, "model": first["model"]} == third
+    chain = 1 + len(routerd.CFG["routing"]["task_map"]["bug_triage"]["chain"])
+    assert len(fake.requests) == 3 * chain  # the library prompt fails the schema, so every call escalates
+    assert {r["prompt_chars"] for r in fake.requests} == {len(routerd.craft_prompt(
+        "bug_triage", text, {"prompt_id": "bug_triage_v1.yml"}))}
+    assert infer.client().timeout == 120.0  # services do not stream: ollama.service_timeout
+
+
+@pytest.mark.parametrize(("rationale", "ok"), [("the cache is stale", True), ("not sure, maybe the cache", False)])
+def test_handle_escalates_on_signals(fake, monkeypatch, rationale, ok):
+    calls = []
+
+    async def llm(model, prompt, options=None):
+        calls.append(model)
+        return json.dumps({"bug_summary": "s", "suspected_cause": "c", "fix_strategy": "f", "confidence": 0.9,
+                           "rationale": rationale})
+
+    monkeypatch.setattr(routerd, "llm", llm)
+    out = routerd.handle("Traceback: crash")
+    assert out["validation"]["ok"] is ok
+    assert len(calls) == (1 if ok else 3)
+
+
+def test_gateway_run_and_arun(fake):
+    prompt = '{"items": [{"key": "string", "value": "string"}]}'
+    assert infer.run("m", prompt) == asyncio.run(infer.arun("m", prompt))
+    assert len(fake.requests) == 2
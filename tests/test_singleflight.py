@@ -0,0 +1,109 @@
+import asyncio
+
+import pytest
+
+from empyrean_ai.config import load_configs
+from empyrean_ai.curator.engine import CuratorEngine
+from empyrean_ai.curator.scheduler import DeadlineExceeded, ModelScheduler
+from empyrean_ai.curator.singleflight import SingleFlight
+from test_engine import BASE, VALID, FakeClient
+
+
+@pytest.mark.asyncio
+async def test_concurrent_callers_share_one_call():
+    sf = SingleFlight()
+    calls = 0
+
+    async def work():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.02)
+        return "v"
+
+    results = await asyncio.gather(*(sf.do("k", work) for _ in range(5)))
+    assert calls == 1
+    assert [r for r, _ in results] == ["v"] * 5
+    assert sum(joined for _, joined in results) == 4
+    assert sf.stats() == {"in_flight": 0, "leaders": 1, "coalesced": 4, "abandoned": 0}
+
+
+@pytest.mark.asyncio
+async def test_waiters_receive_the_same_exception():
+    sf = SingleFlight()
+
+    async def boom():
+        await asyncio.sleep(0.01)
+        raise ValueError("x")
+
+    results = await asyncio.gather(sf.do("k", boom), sf.do("k", boom), return_exceptions=True)
+    assert all(isinstance(r, ValueError) for r in results)
+    assert results[0] is results[1]
+
+
+@pytest.mark.asyncio
+async def test_cancelled_waiter_does_not_affect_others():
+    sf = SingleFlight()
+
+    async def work():
+        await asyncio.sleep(0.05)
+        return 42
+
+    first = asyncio.create_task(sf.do("k", work))
+    second = asyncio.create_task(sf.do("k", work))
+    await asyncio.sleep(0.01)
+    first.cancel()
+    assert (await second) == (42, True)
+    with pytest.raises(asyncio.CancelledError):
+        await first
+
+
+@pytest.mark.asyncio
+async def test_last_waiter_leaving_cancels_the_call():
+    sf = SingleFlight()
+    cancelled = asyncio.Event()
+
+    async def work():
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    t = asyncio.create_task(sf.do("k", work))
+    await asyncio.sleep(0.01)
+    t.cancel()
+    await asyncio.wait_for(cancelled.wait(), 1)
+    assert sf.stats()["abandoned"] == 1 and len(sf) == 0
+
+
+@pytest.mark.asyncio
+async def test_engine_coalesces_identical_deterministic_requests():
+    client = FakeClient(delay=0.05)
+    eng = CuratorEngine(load_configs(None), BASE, client=client)
+    outs = await asyncio.gather(*(eng.curate("extraction", "key: value", "m", n_candidates=1) for _ in range(3)))
+    assert len(client.calls) == 1
+    assert sorted(o["meta"]["coalesced"] for o in outs) == [False, True, True]
+    assert eng.stats()["coalescing"]["coalesced"] == 2
+
+
+@pytest.mark.asyncio
+async def test_engine_followers_get_events_and_outlive_the_leaders_deadline():
+    client = FakeClient(reply=lambda p: ("not json", 0.05) if "previous output" not in p else (VALID, 0.05))
+    eng = CuratorEngine(load_configs(None), BASE, client=client, scheduler=ModelScheduler(default_limit=1))
+    events: dict[str, list] = {"a": [], "b": []}
+    outs = await asyncio.gather(*(eng.curate("extraction", "key: value", "m", n_candidates=1,
+                                             on_event=lambda ev, k=k: events[k].append(ev["event"]))
+                                  for k in events))
+    assert [o["meta"]["coalesced"] for o in outs] == [False, True]
+    assert events["a"] == events["b"] and "repair" in events["b"]  # the follower sees the leader's events
+
+    blocker = asyncio.create_task(eng.curate("extraction", "other", "m", n_candidates=1, use_cache=False))
+    await asyncio.sleep(0.01)
+    leader = asyncio.create_task(eng.curate("extraction", "k: v", "m", n_candidates=1,
+                                            deadline=eng.scheduler.deadline_in(0.02)))
+    await asyncio.sleep(0)
+    follower = await eng.curate("extraction", "k: v", "m", n_candidates=1)
+    with pytest.raises(DeadlineExceeded):
+        await leader
+    assert follower["validation"]["ok"] and not follower["meta"]["coalesced"]
+    await blocker
@@ -50,3 +50,45 @@ def test_load_from_subdir(tmp_path: Path) -> None:
     p.write_text("ok", encoding="utf-8")
     lib = TemplateLibrary(tmp_path)
     assert lib.load("x/t") == "ok"
+
+
+def test_compiled_render_matches_substitution() -> None:
+    import re
+
+    base = Path(__file__).resolve().parents[1]
+    lib = TemplateLibrary(base / "prompt_library")
+    names = lib.preload()
+    assert "analytical_v1" in names
+    user = "Q: x {input} y <user-content>drop</USER-CONTENT> z"
+    for name in names:
+        source = lib.load(name)
+        expected = re.sub(r"\{\{input\}\}|\[\[input\]\]|\{input\}", "Q: x {input} y  z", source)
+        assert lib.get(name).render(user) == expected
+
+
+def test_sections_and_variant_directives(tmp_path: Path) -> None:
+    (tmp_path / "t.yml").write_text(
+        'system: |\n  Be exact.\n  Be brief.\ninstructions: "Answer."\n[USER]\n{input}\n'
+        "variants: |\n  Constraint: cite sources.\n",
+        encoding="utf-8",
+    )
+    tmpl = TemplateLibrary(tmp_path).get("t")
+    assert tmpl.sections["system"] == "Be exact.\nBe brief."
+    assert tmpl.sections["instructions"] == "Answer."
+    assert tmpl.sections["body"] == "[USER]\n{input}"
+    assert tmpl.variants("P", 5) == ["P", "P\nConstraint: be concise yet complete.", "P\nConstraint: cite sources."]
+    assert tmpl.variants("P", 1) == ["P"]
+
+
+def test_reload_on_mtime_change(tmp_path: Path) -> None:
+    import os
+
+    p = tmp_path / "t.yml"
+    p.write_text("v1 {input}", encoding="utf-8")
+    lib = TemplateLibrary(tmp_path, reload_interval=0)
+    first = lib.get("t")
+    assert lib.get("t") is first
+    p.write_text("v2 {input}", encoding="utf-8")
+    os.utime(p, ns=(first.mtime_ns + 10**9, first.mtime_ns + 10**9))
+    assert lib.render(lib.get("t"), "x") == "v2 x"
+    assert lib.reloads == 1